@@ -0,0 +1,93 @@
+"""Generate a realistic synthetic tasks.json for benchmarking.
+
+    python benchmarks/generate_tasks.py 100000 /tmp/tasks-100k.json [--seed 1]
+
+Tasks are skewed the way real calendars are: most fall within a few weeks of
+today, a handful of "crunch" days carry many tasks each, a few categories
+dominate, past tasks are mostly completed, due times cluster around the
+working day, and about 1% are recurring rules. The file is written date by
+date, so even a million tasks are generated in constant memory.
+"""
+import argparse
+import json
+import random
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+CATEGORIES = ["Work", "Personal", "Errands", "Health", "Study", "Finance", "Home",
+              "Family", "Travel", "Hobby", "Admin", "Misc"]
+CATEGORY_WEIGHTS = [1 / rank for rank in range(1, len(CATEGORIES) + 1)]  # Zipf-like
+
+STATUSES = ["Unfinished", "Work in Progress", "Completed"]
+
+# Share of tasks stored as recurring rules, and the rules offered by the UI
+RECURRING_SHARE = 0.01
+FREQUENCIES = [("daily", 1), ("daily", 2), ("weekly", 1), ("weekly", 2), ("monthly", 1)]
+
+# Due times (hour, minute) that real tasks cluster on
+COMMON_TIMES = [(9, 0), (12, 0), (17, 0), (23, 59)]
+
+
+def date_offsets(count, rng):
+    """Return a Counter of day offsets from today, one per task."""
+    crunch_days = [int(rng.gauss(0, 30)) for _ in range(20)]
+    offsets = Counter()
+    for _ in range(count):
+        pick = rng.random()
+        if pick < 0.1:
+            offsets[rng.choice(crunch_days)] += 1  # Deadline crunches
+        elif pick < 0.8:
+            offsets[int(rng.gauss(0, 45))] += 1  # The weeks around today
+        else:
+            offsets[rng.randint(-3 * 365, 3 * 365)] += 1  # Long tail of history and plans
+    return offsets
+
+
+def make_task(day, today, rng):
+    hour, minute = rng.choice(COMMON_TIMES) if rng.random() < 0.5 else (rng.randrange(24), rng.randrange(0, 60, 15))
+    if day < today:
+        status = rng.choices(STATUSES, weights=[0.15, 0.05, 0.8])[0]
+    else:
+        status = rng.choices(STATUSES, weights=[0.7, 0.25, 0.05])[0]
+    task = {
+        "name": f"Task {rng.getrandbits(32):08x}",
+        "category": rng.choices(CATEGORIES, weights=CATEGORY_WEIGHTS)[0],
+        "status": status,
+        "due": int(datetime.combine(day, time(hour, minute)).timestamp()),
+        "id": f"{rng.getrandbits(128):032x}",
+    }
+    if rng.random() < RECURRING_SHARE:
+        frequency, interval = rng.choice(FREQUENCIES)
+        rule = {"frequency": frequency, "interval": interval, "exceptions": {}}
+        if rng.random() < 0.5:
+            rule["end"] = (day + timedelta(days=rng.randint(30, 365))).isoformat()
+        else:
+            rule["count"] = rng.randint(2, 52)
+        task.update(series=f"{rng.getrandbits(128):032x}", recurrence=rule)
+    return task
+
+
+def generate(count, path, seed=1, today=None):
+    """Write `count` synthetic tasks to `path` in the current tasks.json schema (version 2)."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    offsets = date_offsets(count, rng)
+
+    with open(path, 'w') as f:
+        f.write('{\n"schema_version": 2')
+        for offset in sorted(offsets):
+            day = today + timedelta(days=offset)
+            tasks = [make_task(day, today, rng) for _ in range(offsets[offset])]
+            f.write(f",\n{json.dumps(day.isoformat())}: {json.dumps(tasks)}")
+        f.write("\n}\n")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic tasks.json.")
+    parser.add_argument('count', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    generate(args.count, args.path, args.seed)
+    print(f"Wrote {args.count} tasks to {args.path}")
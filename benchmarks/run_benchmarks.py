@@ -0,0 +1,383 @@
+"""Time the load, save, render, notify and startup hot paths on synthetic calendars.
+
+    python benchmarks/run_benchmarks.py                      # 1k, 10k and 100k tasks
+    python benchmarks/run_benchmarks.py --sizes 1000000 --repeat 3
+    xvfb-run python benchmarks/run_benchmarks.py --real-tk   # real widgets on a virtual display
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/OLD.json
+
+Results are written as JSON (benchmarks/results/<commit>.json by default), one
+entry per benchmark and size with min/median/mean seconds (or, for the memory_*
+entries, the bytes the loaded tasks occupy), so two commits can be compared
+with --compare. Tk code runs against tk_stub unless --real-tk is
+given; the stub also counts the widget calls each render made.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from generate_tasks import generate  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# A median this much slower than the baseline is reported as a regression
+REGRESSION_RATIO = 1.2
+
+# What `main.py --daemon` does before it first sleeps: open the store and plan the first window
+DAEMON_STARTUP_SCRIPT = """
+import sys
+from datetime import datetime
+sys.path.insert(0, {repo_dir!r})
+import main
+store = main.open_task_store(owner=False)  # As main.py --daemon opens it
+main.make_scheduler(store, main.NotificationDispatcher([]))._advance_window(datetime.now())
+store.close()
+if 'tkinter' in sys.modules:
+    sys.exit("the notifier-only start imported tkinter")
+"""
+
+
+def measure(name, size, function, repeat, setup=None):
+    """Run `function(setup())` `repeat` times and return a result entry."""
+    import tk_stub
+    times, tk_calls = [], []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        calls_before = sum(tk_stub.calls.values())
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+        tk_calls.append(sum(tk_stub.calls.values()) - calls_before)
+    result = {
+        "name": name,
+        "tasks": size,
+        "repeat": repeat,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+    }
+    if any(tk_calls):
+        result["tk_calls"] = tk_calls[-1]
+    print(f"{name:<28} {size:>9} tasks  median {result['median_s'] * 1000:10.3f} ms")
+    return result
+
+
+def bench_storage(path, size, repeat, work_dir):
+    from sharded_storage import ShardedStorage, migrate_json_to_shards
+    from sqlite_storage import SqliteStorage, migrate_json_to_sqlite
+    from task_storage import JournalStorage, JsonFileStorage
+    from task_store import TaskStore
+
+    def decode(_):
+        with open(path) as f:
+            json.load(f)
+
+    results = [
+        measure("json_decode", size, decode, repeat),
+        measure("store_load", size, lambda _: TaskStore(path), repeat),
+    ]
+
+    store = TaskStore(path)
+    busiest = max(store.snapshot().items(), key=lambda item: len(item[1]))
+    changed = {busiest[0]: busiest[1] + [dict(busiest[1][0], id="benchmark")]}
+
+    copy = os.path.join(work_dir, "save.json")
+    shutil.copy(path, copy)
+    storage = JsonFileStorage(copy)
+    results.append(measure("save_full_rewrite", size, lambda _: storage.write(store.snapshot(), changed), repeat))
+
+    journal = JournalStorage(copy)
+    results.append(measure("save_journal_append", size, lambda _: journal.write(store.snapshot(), changed), repeat))
+    journal.close()
+
+    # Undoing and redoing an edit on the busiest day: a diff, a revert and a journal append each
+    journal_store = TaskStore(storage=JournalStorage(copy))
+    task = journal_store.get_tasks(busiest[0])[0]
+    journal_store.update_task(busiest[0], task, dict(task, name="benchmark"))
+
+    def undo_redo(_):
+        journal_store.undo()
+        journal_store.redo()
+
+    results.append(measure("undo_redo", size, undo_redo, repeat))
+    journal_store.close()
+
+    db_path = os.path.join(work_dir, "tasks.db")
+    start = time.perf_counter()
+    migrate_json_to_sqlite(path, db_path)
+    print(f"(migrated {size} tasks to SQLite in {time.perf_counter() - start:.2f} s)")
+    first, last = date.today().replace(day=1), date.today().replace(day=28)
+    lazy_store = TaskStore(storage=SqliteStorage(db_path))
+    results.append(measure("sqlite_month_summaries", size,
+                           lambda _: lazy_store.day_summaries(first.isoformat(), last.isoformat()), repeat))
+    lazy_store.close()
+
+    shard_dir = os.path.join(work_dir, "shards")
+    start = time.perf_counter()
+    migrate_json_to_shards(path, shard_dir)
+    print(f"(split {size} tasks into month shards in {time.perf_counter() - start:.2f} s)")
+    results.append(measure("sharded_open", size, lambda _: TaskStore(storage=ShardedStorage(shard_dir)), repeat))
+    # A month view on a fresh store reads only the shards it shows; later views hit the month cache
+    results.append(measure("sharded_month_summaries", size,
+                           lambda s: s.day_summaries(first.isoformat(), last.isoformat()), repeat,
+                           setup=lambda: TaskStore(storage=ShardedStorage(shard_dir))))
+    sharded = ShardedStorage(shard_dir)
+    results.append(measure("save_shard", size, lambda _: sharded.write(None, changed), repeat))
+    return results, store
+
+
+def loaded_bytes(path, convert):
+    """Return the bytes still allocated for the tasks of `path` once `convert` has run on the decoded dicts."""
+    tracemalloc.start()
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        data.pop("schema_version", None)
+        convert(data)
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(path, size):
+    """Compare the memory held by the tasks as plain dicts and as compact task_model.Task records."""
+    from task_model import compact_list
+
+    def compact_all(data):
+        for date_key, tasks in data.items():
+            data[date_key] = compact_list(tasks)
+
+    results = []
+    for name, convert in (("memory_tasks_dict", lambda data: None), ("memory_tasks_compact", compact_all)):
+        result = {"name": name, "tasks": size, "bytes": loaded_bytes(path, convert)}
+        print(f"{name:<28} {size:>9} tasks  {result['bytes'] / 1024:10.0f} KiB")
+        results.append(result)
+    print(f"(compact tasks use {results[1]['bytes'] / results[0]['bytes']:.0%} of the dict form)")
+    return results
+
+
+def bench_recurrence(store, size, repeat):
+    import recurrence
+
+    first = (date.today() - timedelta(days=182)).isoformat()
+    last = (date.today() + timedelta(days=182)).isoformat()
+    rules = [(key, task) for key, tasks in store.snapshot().items() for task in tasks if recurrence.is_rule(task)]
+
+    def expand_all(_):
+        for start_key, task in rules:
+            for _ in recurrence.expand(start_key, task, first, last):
+                pass
+
+    return [
+        measure("recurrence_expand_year", size, expand_all, repeat),
+        measure("range_query_year", size, lambda _: store.tasks_between(first, last), repeat),
+    ]
+
+
+def bench_search(store, size, repeat):
+    from task_search import TaskSearchIndex
+
+    def build(_):
+        TaskSearchIndex().build(store.iter_stored())
+
+    index = store.search_index()
+    index.ready.wait()
+    month_start = date.today().replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    rarest = min(index._words, key=lambda word: len(index._words[word]))
+    return [
+        measure("search_index_build", size, build, repeat),
+        measure("search_word", size, lambda _: index.search(rarest), repeat),
+        measure("search_prefix", size, lambda _: index.search("ta"), repeat),
+        measure("search_filter_month", size, lambda _: index.search(
+            status="Unfinished", first_key=month_start.isoformat(), last_key=month_end.isoformat()), repeat),
+    ]
+
+
+def bench_agenda(store, size, repeat):
+    from due_index import DueIndex, due_key
+
+    def build(_):
+        DueIndex().build(store.iter_stored())
+
+    store.due_index().ready.wait()
+    first_page = store.upcoming(50)
+    after = due_key(*first_page[-1]) if first_page else None
+    return [
+        measure("due_index_build", size, build, repeat),
+        measure("agenda_first_page", size, lambda _: store.upcoming(50), repeat),
+        measure("agenda_next_page", size, lambda _: store.upcoming(50, after=after), repeat),
+    ]
+
+
+def bench_tk(store, size, repeat, root):
+    from task_calendar import TaskCalendar
+    from task_window import TaskWindow
+    from year_overview import YearOverview
+
+    app = TaskCalendar(root, store)
+    today = date.today()
+
+    def show_twelve_months(_):
+        for offset in range(12):
+            month = (today.month - 1 + offset) % 12 + 1
+            app.show_calendar(today.year + (today.month - 1 + offset) // 12, month)
+
+    busiest = max(store.snapshot().items(), key=lambda item: len(item[1]))[0]
+    year, month, day = map(int, busiest.split("-"))
+
+    def open_and_close_window(_):
+        window = TaskWindow(root, year, month, day, app)
+        store.unsubscribe(window.on_store_change)
+        window.top.destroy()
+
+    results = [
+        measure("show_calendar", size, lambda _: app.show_calendar(today.year, today.month), repeat,
+                setup=lambda: app.show_calendar(today.year - 1, today.month)),
+        measure("show_calendar_12_months", size, show_twelve_months, repeat),
+    ]
+    app.show_calendar(today.year, today.month)
+    results.append(measure("update_date_boxes", size, lambda _: app.update_date_boxes(), repeat))
+    results.append(measure("task_window_load", size, open_and_close_window, repeat))
+
+    # Each repeat moves the overview to the next year
+    overview = YearOverview(root, app)
+    results.append(measure("overview_next_year", size, lambda _: overview.step(1), repeat))
+    store.unsubscribe(overview.on_store_change)
+    return results
+
+
+def bench_notify(store, size, repeat):
+    from deadline_scheduler import DeadlineScheduler
+
+    def new_scheduler():
+        return DeadlineScheduler(lambda name, hours: None, load_window=lambda first, last: store.tasks_between(
+            first.isoformat(), last.isoformat()))
+
+    # One planning pass: load the window and plan every reminder in it
+    results = [measure("notify_plan_window", size, lambda s: s._advance_window(datetime.now()), repeat,
+                       setup=new_scheduler)]
+
+    scheduler = new_scheduler()
+    scheduler._advance_window(datetime.now())
+    window = store.tasks_between(date.today().isoformat(), (date.today() + timedelta(days=7)).isoformat())
+    if window:
+        busiest = max(window.items(), key=lambda item: len(item[1]))
+        results.append(measure("notify_sync_date", size, lambda _: scheduler.sync(dict([busiest])), repeat))
+    return results
+
+
+def bench_startup(path, size, repeat, work_dir):
+    """Time a fresh `main.py --daemon` process up to its first planned reminder window."""
+    app_dir = os.path.join(work_dir, "startup")
+    os.makedirs(app_dir, exist_ok=True)
+    shutil.copy(path, os.path.join(app_dir, "tasks.json"))
+    script = DAEMON_STARTUP_SCRIPT.format(repo_dir=os.path.dirname(BENCHMARK_DIR))
+    return [measure("daemon_startup", size,
+                    lambda _: subprocess.run([sys.executable, "-c", script], cwd=app_dir, check=True),
+                    repeat)]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCHMARK_DIR, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, cwd=BENCHMARK_DIR, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline_path, results):
+    """Print the median (or bytes) ratio of each benchmark against a baseline; return the regressions."""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["tasks"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get((result["name"], result["tasks"]))
+        measure_key = "bytes" if "bytes" in result else "median_s"
+        if not old or not old.get(measure_key):
+            continue
+        ratio = result[measure_key] / old[measure_key]
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        print(f"{result['name']:<28} {result['tasks']:>9} tasks  x{ratio:6.2f}{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SuperScheduler hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", help="keep generated tasks files here and reuse them")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--real-tk", action="store_true", help="use real Tk widgets (needs a display)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    args = parser.parse_args()
+
+    if args.real_tk:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+    else:
+        import tk_stub
+        tk_stub.install()
+        root = tk_stub.Widget()
+
+    work_dir = tempfile.mkdtemp(prefix="superscheduler-bench-")
+    data_dir = args.data_dir or work_dir
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    try:
+        for size in args.sizes:
+            path = os.path.join(data_dir, f"tasks-{size}-seed{args.seed}.json")
+            if not os.path.exists(path):
+                generate(size, path, args.seed)
+            storage_results, store = bench_storage(path, size, args.repeat, work_dir)
+            results += storage_results
+            results += bench_memory(path, size)
+            results += bench_recurrence(store, size, args.repeat)
+            results += bench_search(store, size, args.repeat)
+            results += bench_agenda(store, size, args.repeat)
+            results += bench_tk(store, size, args.repeat, root)
+            results += bench_notify(store, size, args.repeat)
+            results += bench_startup(path, size, args.repeat, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit = git_commit()
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tk": "real" if args.real_tk else "stub",
+            "seed": args.seed,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare and compare(args.compare, results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
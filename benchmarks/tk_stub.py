@@ -0,0 +1,131 @@
+"""A stand-in widget layer so the Tk code paths can be timed without a display.
+
+`install()` puts fake tkinter, tkinter.messagebox, tkinter.font, pystray and
+PIL modules into sys.modules. Widgets accept any call and do nothing, except
+that option changes are counted in `calls`, which shows how much work a
+render asked Tk to do. Run with --real-tk under a (virtual) display to time
+real widgets instead.
+"""
+import sys
+import types
+from collections import Counter
+
+calls = Counter()  # "config", "insert", "delete" -> number of widget calls
+
+
+class Widget:
+    def __init__(self, *args, **options):
+        self.options = options
+        calls["create"] += 1
+
+    def config(self, **options):
+        calls["config"] += 1
+        self.options.update(options)
+
+    configure = config
+
+    def cget(self, key):
+        return self.options.get(key, "SystemButtonFace")
+
+    def winfo_exists(self):
+        return True
+
+    def insert(self, *args):
+        calls["insert"] += 1
+
+    def delete(self, *args):
+        calls["delete"] += 1
+
+    def curselection(self):
+        return ()
+
+    def __getattr__(self, name):
+        # pack, grid, bind, title, after, ... are all no-ops
+        return lambda *args, **kwargs: None
+
+
+class Canvas(Widget):
+    """Numbers its items like Tk does; item changes are counted as "itemconfig"."""
+
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.items = 0
+
+    def _create(self, *args, **options):
+        calls["create_item"] += 1
+        self.items += 1
+        return self.items
+
+    create_rectangle = create_text = create_line = create_oval = _create
+
+    def itemconfig(self, item, **options):
+        calls["itemconfig"] += 1
+
+    def canvasx(self, x):
+        return float(x)
+
+    canvasy = canvasx
+
+
+class Variable:
+    default = None
+
+    def __init__(self, master=None, value=None):
+        self.value = self.default if value is None else value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def trace_add(self, mode, callback):
+        pass
+
+
+class StringVar(Variable):
+    default = ""
+
+
+class Font:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def metrics(self, *args):
+        return 15
+
+
+def _constant(name):
+    # Constants such as tk.END or tk.LEFT only need to be distinct strings
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return name.lower()
+
+
+def _dialog(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return lambda *args, **kwargs: None
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install():
+    widgets = {name: Widget for name in ("Tk", "Toplevel", "Frame", "Button", "Label", "Listbox", "Scrollbar",
+                                         "Entry", "Radiobutton", "Checkbutton", "OptionMenu", "Spinbox", "Menu")}
+    widgets["Canvas"] = Canvas
+    variables = {"StringVar": StringVar, "IntVar": Variable, "BooleanVar": Variable}
+    font = _module("tkinter.font", Font=Font)
+    messagebox = _module("tkinter.messagebox", __getattr__=_dialog)
+    tkinter = _module("tkinter", font=font, messagebox=messagebox, **widgets, **variables, __getattr__=_constant)
+    sys.modules.update({
+        "tkinter": tkinter,
+        "tkinter.font": font,
+        "tkinter.messagebox": messagebox,
+        "pystray": _module("pystray", Icon=Widget, MenuItem=Widget),
+        "PIL": _module("PIL", Image=_module("PIL.Image", open=lambda *args: None)),
+    })
@@ -0,0 +1,50 @@
+import bisect
+from collections import Counter, namedtuple
+from datetime import date
+
+# What the calendar needs to know about one day: its parsed date, how many
+# tasks it has and how many of them are in each status
+DaySummary = namedtuple('DaySummary', 'date count statuses')
+
+
+def summarize(date_key, tasks, day=None):
+    return DaySummary(day or date.fromisoformat(date_key), len(tasks), Counter(task.get('status') for task in tasks))
+
+
+def merge_summaries(summary, tasks):
+    """Add extra tasks (e.g. recurring occurrences) to a day's summary."""
+    statuses = summary.statuses + Counter(task.get('status') for task in tasks)
+    return DaySummary(summary.date, summary.count + len(tasks), statuses)
+
+
+class DateIndex:
+    """Sorted index of the dates that have tasks, with parsed dates and summaries cached.
+
+    Dates are parsed once, when they are first indexed, and a range of dates
+    is found with two binary searches, so a query costs O(log n + k).
+    """
+
+    def __init__(self, tasks_by_date=None):
+        self._summaries = {}
+        for date_key, tasks in (tasks_by_date or {}).items():
+            if tasks:
+                self._summaries[date_key] = summarize(date_key, tasks)
+        self._keys = sorted(self._summaries)
+
+    def update(self, date_key, tasks):
+        """Re-index one date after its task list changed."""
+        old = self._summaries.pop(date_key, None)
+        if tasks:
+            self._summaries[date_key] = summarize(date_key, tasks, old.date if old else None)
+            if old is None:
+                bisect.insort(self._keys, date_key)
+        elif old is not None:
+            del self._keys[bisect.bisect_left(self._keys, date_key)]
+
+    def keys_between(self, first_key, last_key):
+        """Return the sorted date keys with tasks in [first_key, last_key]."""
+        return self._keys[bisect.bisect_left(self._keys, first_key):bisect.bisect_right(self._keys, last_key)]
+
+    def summaries_between(self, first_key, last_key):
+        """Return {date_key: DaySummary} for the dates with tasks in [first_key, last_key]."""
+        return {key: self._summaries[key] for key in self.keys_between(first_key, last_key)}
@@ -0,0 +1,81 @@
+import calendar
+from datetime import datetime
+import tkinter as tk
+
+from widget_util import configure_changed
+
+
+class DatePicker:
+    """A small month grid for picking a date, e.g. where to move tasks to.
+
+    Days are colored like the calendar, from the store's in-memory index, so
+    opening a picker reads nothing from disk. Its 42 day buttons are built
+    once; moving between months only reconfigures the options that changed.
+    Clicking a day calls `on_pick(date_key)`. Callers may add their own
+    controls to `footer`.
+    """
+
+    def __init__(self, parent, calendar_app, on_pick, title="Select Date", year=None, month=None):
+        self.calendar_app = calendar_app
+        self.on_pick = on_pick
+        self.year = year or calendar_app.current_year
+        self.month = month or calendar_app.current_month
+
+        self.top = tk.Toplevel(parent)
+        self.top.title(title)
+
+        nav_frame = tk.Frame(self.top)
+        nav_frame.pack(fill=tk.X, pady=5)
+        tk.Button(nav_frame, text="<<", command=lambda: self.step(-1)).pack(side=tk.LEFT, padx=5)
+        self.label = tk.Label(nav_frame, text="", font=("Arial", 12))
+        self.label.pack(side=tk.LEFT, expand=True)
+        tk.Button(nav_frame, text=">>", command=lambda: self.step(1)).pack(side=tk.RIGHT, padx=5)
+
+        grid = tk.Frame(self.top)
+        grid.pack(padx=5, pady=5)
+        for column, day in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]):
+            tk.Label(grid, text=day).grid(row=0, column=column)
+
+        self.cells = []
+        self.cell_dates = [None] * 42  # Date key shown in each cell, None if blank
+        self.cell_config = [{} for _ in range(42)]  # Last options applied to each cell
+        for index in range(42):
+            cell = tk.Button(grid, text="", width=3, command=lambda i=index: self.pick(i))
+            cell.grid(row=index // 7 + 1, column=index % 7, padx=1, pady=1)
+            self.cells.append(cell)
+        self.blank_bg = grid.cget("bg")
+
+        self.footer = tk.Frame(self.top)
+        self.footer.pack(fill=tk.X, padx=5, pady=5)
+
+        self.show()
+
+    def step(self, direction):
+        months = self.year * 12 + self.month - 1 + direction
+        self.year, self.month = months // 12, months % 12 + 1
+        self.show()
+
+    def show(self):
+        self.label.config(text=f"{calendar.month_name[self.month]} {self.year}")
+        summaries = self.calendar_app.month_summaries(self.year, self.month)
+        today = datetime.today().date()
+
+        days = list(calendar.Calendar(firstweekday=0).itermonthdays(self.year, self.month))
+        days += [0] * (42 - len(days))
+        for index, day in enumerate(days):
+            if day == 0:
+                self.cell_dates[index] = None
+                self.configure_cell(index, text="", bg=self.blank_bg, state=tk.DISABLED)
+                continue
+            date_key = f"{self.year}-{self.month:02d}-{day:02d}"
+            summary = summaries.get(date_key)
+            bg = self.calendar_app.date_color(summary.date, today) if summary else "white"
+            self.cell_dates[index] = date_key
+            self.configure_cell(index, text=str(day), bg=bg, state=tk.NORMAL)
+
+    def configure_cell(self, index, **options):
+        configure_changed(self.cells[index], self.cell_config[index], **options)
+
+    def pick(self, index):
+        if self.cell_dates[index]:
+            self.on_pick(self.cell_dates[index])
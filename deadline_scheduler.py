@@ -0,0 +1,207 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+import metrics
+from reminder_state import ReminderState
+
+# Reminder thresholds in hours before a task is due, largest first
+REMINDER_HOURS = (48, 24, 12, 6, 1)
+
+# Longest single sleep. Waits are measured on the monotonic clock, so cap them
+# to notice wall clock jumps (suspend, DST, manual changes) without polling.
+MAX_SLEEP_SECONDS = 300
+
+# How far ahead tasks are loaded for planning when the scheduler loads its own
+# window; the window slides forward once the largest threshold reaches its end
+PLANNING_HORIZON = timedelta(days=7)
+
+
+class DeadlineScheduler:
+    """Fire task reminders exactly when a task crosses a reminder threshold.
+
+    Upcoming crossings are kept in a heap ordered by fire time, so the
+    notifier thread sleeps until the next one instead of rescanning every task.
+
+    With `load_window(first_date, last_date) -> {date_key: tasks}` the scheduler
+    only plans the dates in a sliding window of PLANNING_HORIZON, loaded with a
+    range query, and ignores changes to dates outside it.
+
+    Tasks are tracked by id, and the thresholds already announced are kept in
+    `state` (a ReminderState), so a restart with a persistent state does not
+    repeat them. Completed tasks get no reminders.
+    """
+
+    def __init__(self, notify, thresholds=REMINDER_HOURS, load_window=None, state=None):
+        self.notify = notify
+        self.thresholds = sorted(thresholds, reverse=True)
+        self.load_window = load_window
+        self.state = state if state is not None else ReminderState()
+
+        self._heap = []  # (fire_at, seq, key, generation, hours)
+        self._plans = {}  # task key -> (name, due_date, generation)
+        self._groups = {}  # date key -> task keys planned for that date
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._window = None  # (first_key, last_key) of the planned dates
+        self._changed_while_loading = None
+        self._reload_requested = False
+
+    @staticmethod
+    def due_date(date_key, task):
+        return datetime.fromtimestamp(task['due'])  # Pre-parsed, see task_schema
+
+    def task_keys(self, date_key, tasks):
+        """Yield (key, name, due_date) per task that still needs reminders.
+
+        The key is the task's id (occurrences of recurring tasks have their own);
+        tasks without one are told apart by name, due time and a counter.
+        """
+        seen = {}
+        for task in tasks:
+            if task.get('status') == "Completed":
+                continue
+            try:
+                name, due_date = task['name'], self.due_date(date_key, task)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping reminders for a task on {date_key}: {e}")
+                continue
+            key = task.get('id')
+            if key is None:
+                count = seen.get((name, due_date), 0)
+                seen[(name, due_date)] = count + 1
+                key = f"{name}@{due_date:%Y-%m-%dT%H:%M}#{count}"
+            yield key, name, due_date
+
+    def window(self, due_date, now):
+        """Return the threshold window `now` falls in for `due_date`, or None."""
+        time_to_due = due_date - now
+        if time_to_due <= timedelta(0):
+            return None
+        current = None
+        for hours in self.thresholds:
+            if time_to_due <= timedelta(hours=hours):
+                current = hours
+        return current
+
+    @metrics.timed('notifier.sync')
+    def sync(self, changed_dates):
+        """Re-plan the tasks of the given {date_key: tasks} groups; other dates are untouched.
+
+        None means any date may have changed (e.g. a recurring task was edited),
+        so the whole planning window is reloaded.
+        """
+        with self._cond:
+            if changed_dates is None:
+                self._reload_requested = True
+                self._cond.notify_all()
+                return
+
+            now = datetime.now()
+            if self._changed_while_loading is not None:
+                self._changed_while_loading.update(changed_dates)
+
+            for date_key, tasks in changed_dates.items():
+                if self._window and not self._window[0] <= date_key <= self._window[1]:
+                    continue
+                old_keys = self._groups.pop(date_key, set())
+                wanted = {key: (name, due_date) for key, name, due_date in self.task_keys(date_key, tasks)}
+
+                for key in old_keys - wanted.keys():
+                    del self._plans[key]  # Heap entries go stale and are skipped
+                    self.state.discard(key)  # Removed or completed
+
+                for key, (name, due_date) in wanted.items():
+                    plan = self._plans.get(key)
+                    if plan is None or plan[:2] != (name, due_date):
+                        self._plan(key, name, due_date, now)
+
+                if wanted:
+                    self._groups[date_key] = set(wanted)
+
+            self._cond.notify_all()
+
+    def _drop_group(self, date_key):
+        for key in self._groups.pop(date_key, ()):
+            del self._plans[key]
+
+    @metrics.timed('notifier.plan_window')
+    def _advance_window(self, now):
+        """Slide the planning window forward and plan the dates that entered it."""
+        first_date, last_date = now.date(), (now + PLANNING_HORIZON).date()
+        with self._cond:
+            self._reload_requested = False
+            self._changed_while_loading = {}
+        self.state.prune(now.timestamp())
+        # Loaded without holding our lock: the store calls sync() under its own lock
+        loaded = self.load_window(first_date, last_date)
+
+        with self._cond:
+            # Changes that raced with the load are newer than what it returned
+            loaded.update(self._changed_while_loading or {})
+            self._changed_while_loading = None
+
+            self._window = (first_date.isoformat(), last_date.isoformat())
+            for date_key in list(self._groups):
+                if date_key not in loaded:
+                    self._drop_group(date_key)
+            self.sync(loaded)
+
+    def _window_expired(self, now):
+        if self.load_window is None:
+            return False
+        if self._window is None or self._reload_requested:
+            return True
+        last_planned = datetime.fromisoformat(self._window[1]) + timedelta(days=1)
+        return now + timedelta(hours=self.thresholds[0]) >= last_planned
+
+    def _plan(self, key, name, due_date, now):
+        generation = next(self._seq)
+        self._plans[key] = (name, due_date, generation)
+
+        current = self.window(due_date, now)
+        if current is not None and self.state.notified(key, due_date) != current:
+            heapq.heappush(self._heap, (now, next(self._seq), key, generation, current))
+
+        for hours in self.thresholds:
+            fire_at = due_date - timedelta(hours=hours)
+            if fire_at > now:
+                heapq.heappush(self._heap, (fire_at, next(self._seq), key, generation, hours))
+
+    def run(self):
+        """Sleep until the next crossing and fire its reminders, forever.
+
+        sync() wakes the loop so newly planned crossings are picked up at once.
+        """
+        while True:
+            if self._window_expired(datetime.now()):
+                self._advance_window(datetime.now())
+
+            fired = []
+            with self._cond:
+                now = datetime.now()
+                while self._heap and self._heap[0][0] <= now:
+                    fire_at, _, key, generation, hours = heapq.heappop(self._heap)
+                    plan = self._plans.get(key)
+                    if plan is None or plan[2] != generation:
+                        continue  # Task changed or was removed since this was planned
+
+                    name, due_date, _ = plan
+                    # A late wakeup (e.g. after suspend) skips windows already left behind
+                    if self.window(due_date, now) != hours or self.state.notified(key, due_date) == hours:
+                        continue
+
+                    self.state.record(key, due_date, hours)
+                    fired.append((name, hours))
+
+                if not fired:
+                    timeout = MAX_SLEEP_SECONDS
+                    if self._heap:
+                        timeout = min(timeout, max((self._heap[0][0] - now).total_seconds(), 0))
+                    self._cond.wait(timeout)
+                    continue
+
+            metrics.count('notifier.reminders', len(fired))
+            for name, hours in fired:
+                self.notify(name, hours)
@@ -0,0 +1,100 @@
+import bisect
+import threading
+
+from task_schema import ALL_DAY, due_timestamp
+
+
+def due_key(date_key, task):
+    """Sort key of a task in the agenda: (due timestamp, date key, id).
+
+    Tasks without a due time sort at the end of their day (see ALL_DAY).
+    """
+    due = task.get('due')
+    if due is None:
+        due = due_timestamp(date_key, *ALL_DAY)
+    return due, date_key, task.get('id') or ''
+
+
+def is_pending(task):
+    return task.get('status') != "Completed"
+
+
+class DueIndex:
+    """Unfinished tasks ordered by due time, for the agenda.
+
+    Every unfinished task with an id has a due_key() in one sorted list, so
+    the tasks due from a given time, or the page after the last task shown,
+    are found with a binary search: a query costs O(log n + k). A changed
+    date re-indexes only its own tasks.
+
+    Recurring rules are not indexed; the store expands their occurrences
+    for the range a query covers (see TaskStore.upcoming).
+
+    build() and update() follow TaskSearchIndex: the build may run on any
+    thread, changes reported while it runs are applied once it finishes, and
+    until then `ready` is unset and page() returns None.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = {}  # Changes reported during the build; None once built
+        self._keys = []  # Sorted due_key() of every indexed task
+        self._tasks = {}  # due_key -> task
+        self._date_keys = {}  # date_key -> due keys of the tasks indexed on that date
+
+    def build(self, dated_tasks):
+        """Index (date_key, task) pairs, e.g. from TaskStore.iter_stored()."""
+        by_date = {}
+        for date_key, task in dated_tasks:
+            by_date.setdefault(date_key, []).append(task)
+        for date_key, tasks in by_date.items():
+            self._date_keys[date_key] = keys = self._entries(date_key, tasks)
+            self._tasks.update(keys)
+        self._keys = sorted(self._tasks)
+        with self._lock:
+            pending, self._pending = self._pending, None
+            for date_key, tasks in pending.items():
+                self._index_date(date_key, tasks)
+            self.ready.set()
+
+    def update(self, changed):
+        """Re-index the dates in {date_key: stored tasks} after they changed."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.update(changed)
+                return
+            for date_key, tasks in changed.items():
+                self._index_date(date_key, tasks)
+
+    @staticmethod
+    def _entries(date_key, tasks):
+        """Return {due_key: task} of the tasks of one date that belong in the agenda."""
+        return {due_key(date_key, task): task for task in tasks
+                if is_pending(task) and 'id' in task and 'recurrence' not in task}
+
+    def _index_date(self, date_key, tasks):
+        old = self._date_keys.pop(date_key, {})
+        new = self._entries(date_key, tasks)
+        for key in old.keys() - new.keys():
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            del self._tasks[key]
+        for key, task in new.items():
+            if key not in old:
+                bisect.insort(self._keys, key)
+            self._tasks[key] = task  # An edit that keeps the due time keeps its key
+        if new:
+            self._date_keys[date_key] = new
+
+    def page(self, after, limit):
+        """Return up to `limit` (due_key, task) pairs after `after`, soonest first.
+
+        `after` is the due_key of the last task already shown, or (timestamp,)
+        to start with the first task due at or after that time. Return None
+        while the index is still being built.
+        """
+        with self._lock:
+            if self._pending is not None:
+                return None
+            start = bisect.bisect_right(self._keys, after)
+            return [(key, self._tasks[key]) for key in self._keys[start:start + limit]]
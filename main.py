@@ -1,102 +1,124 @@
-import tkinter as tk
-from task_calendar import TaskCalendar
-import time
+import argparse
+import os
 import threading
-from plyer import notification
-from datetime import datetime, timedelta
-import json
+import time
+from deadline_scheduler import DeadlineScheduler
+from process_lock import ProcessLock
+from task_file_watcher import POLL_INTERVAL, TaskFileWatcher
+from task_store import lock_task_store, open_task_store
+from notification_dispatch import NotificationDispatcher, make_sink
+from reminder_state import ReminderState
+import metrics
+
+# Where reminders go: "desktop", "log" or "file:PATH"; comma separated for several
+NOTIFICATION_SINKS = os.environ.get('SUPERSCHEDULER_NOTIFY', 'desktop')
+
+# Reminders already shown, so a restart does not repeat them
+REMINDER_STATE_FILE = 'reminders.state'
+
+# Held by the one process sending reminders, so the calendar and a --daemon notifier never both do
+NOTIFIER_LOCK_FILE = 'notifier.lock'
+notifier_lock = ProcessLock(NOTIFIER_LOCK_FILE)
+
+
+def make_scheduler(store, dispatcher):
+    # Only the next few days are loaded, with a date range query; reminders are
+    # handed to the dispatcher so a slow notification backend never stalls the scheduler
+    return DeadlineScheduler(
+        dispatcher.remind,
+        load_window=lambda first, last: store.tasks_between(first.isoformat(), last.isoformat()),
+        state=ReminderState(REMINDER_STATE_FILE)
+    )
 
 
-def initial_load_tasks():
-    """Load tasks from tasks.json file."""
-    tasks = []
-    try:
-        with open('tasks.json', 'r') as file:
-            data = json.load(file)
-            print("Loaded data:", data)  # Debugging output
-
-            # Flatten the tasks from the JSON structure
-            for date, task_list in data.items():
-                for task in task_list:
-                    due_date_str = f"{date} {task['due_time']}"
-                    due_date = datetime.strptime(due_date_str, "%Y-%m-%d %I:%M %p")  # Convert to datetime
-                    task['due_date'] = due_date  # Add due_date to task
-                    tasks.append(task)  # Add the task to the main list
-
-            return tasks
-
-    except FileNotFoundError:
-        print("tasks.json not found. Returning empty task list.")
-        return []
-    except json.JSONDecodeError:
-        print("Error decoding JSON. Returning empty task list.")
-        return []
-    except Exception as e:
-        print(f"An error occurred: {e}. Returning empty task list.")
-        return []
-
-
-def send_notification(task_name, time_remaining):
-    notification.notify(
-        title=f"Task Reminder: {task_name}",
-        message=f"{task_name} is due in {time_remaining} hours!",
-        timeout=10
-    )
+def check_task_deadlines(store, dispatcher):
+    scheduler = make_scheduler(store, dispatcher)
+
+    # Edits made through the store re-plan only the dates they touched
+    store.subscribe(scheduler.sync)
 
+    scheduler.run()  # Sleeps until the next reminder is due
 
-def check_task_deadlines():
-    last_notification_time = {}  # Dictionary to track last notification time for each task
 
+def make_dispatcher():
+    return NotificationDispatcher([make_sink(spec) for spec in NOTIFICATION_SINKS.split(',')])
+
+
+def poll_store(store):
     while True:
-        tasks = initial_load_tasks()  # Load tasks every iteration
-        current_time = datetime.now()
-
-        for task in tasks:
-            print("Current task being processed:", task)  # Debugging output
-
-            if isinstance(task, dict):
-                task_name = task['name']
-                due_date = task['due_date']  # This should be a datetime object
-                time_to_due = due_date - current_time
-
-                # Determine the time interval for notifications
-                if time_to_due <= timedelta(hours=1) and time_to_due > timedelta(hours=0):
-                    interval = 1
-                elif time_to_due <= timedelta(hours=6) and time_to_due > timedelta(hours=1):
-                    interval = 6
-                elif time_to_due <= timedelta(hours=12) and time_to_due > timedelta(hours=6):
-                    interval = 12
-                elif time_to_due <= timedelta(hours=24) and time_to_due > timedelta(hours=12):
-                    interval = 24
-                elif time_to_due <= timedelta(hours=48) and time_to_due > timedelta(hours=24):
-                    interval = 48
-                else:
-                    continue  # Skip if no notification should be sent
-
-                # Check if notification has already been sent for this interval
-                if (task_name not in last_notification_time) or (
-                        current_time - last_notification_time[task_name] >= timedelta(hours=interval)):
-                    send_notification(task_name, interval)
-                    last_notification_time[task_name] = current_time  # Update last notification time
-            else:
-                print(f"Unexpected task format: {task}")  # Debugging output
-
-        time.sleep(30)  # Check every 30 seconds
-
-
-def start_notification_service():
-    notification_thread = threading.Thread(target=check_task_deadlines)
+        time.sleep(POLL_INTERVAL)
+        store.reload_if_changed()
+
+
+def watch_tasks_file(store):
+    if store.lazy:
+        # A database or shard directory has no one file to watch; its storage tells whether another process saved
+        threading.Thread(target=poll_store, args=(store,), daemon=True).start()
+        return
+    # Edits made to tasks.json, or appended to its journal, by another process are merged into the shared store
+    journal_path = getattr(store.storage, 'journal_path', None)
+    TaskFileWatcher(store.path, store.reload_if_changed,
+                    companions=[journal_path] if journal_path else []).start()
+
+
+def start_notification_service(store):
+    watch_tasks_file(store)
+    if not notifier_lock.acquire():
+        return  # A --daemon notifier is running and sends the reminders
+    dispatcher = make_dispatcher()
+    notification_thread = threading.Thread(target=check_task_deadlines, args=(store, dispatcher))
     notification_thread.daemon = True
     notification_thread.start()
 
 
+def run_notifier(store):
+    """Run only the deadline notifier, in the foreground and without a window, until Ctrl+C."""
+    watch_tasks_file(store)
+    dispatcher = make_dispatcher()
+    try:
+        if not notifier_lock.acquire():
+            print("Reminders are being sent by an open calendar or another notifier; waiting until it exits")
+            notifier_lock.acquire(wait=True)
+        check_task_deadlines(store, dispatcher)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.close()
+
+
 def main():
-    start_notification_service()  # Start the notification service
+    parser = argparse.ArgumentParser(description="SuperScheduler task calendar and deadline notifier.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="only send deadline reminders, without opening the calendar (e.g. on login)")
+    args = parser.parse_args()
+
+    metrics.start()  # Opt-in metrics and profiling, see metrics.py
+    if args.daemon:
+        # Only reads the tasks, following the edits the calendar or an import append to the journal
+        store = open_task_store(owner=False)
+        run_notifier(store)
+        store.close()
+        return
+
+    # Only one process may edit the tasks; a second window, or an import, would lose the other's changes
+    store_lock = lock_task_store()
+    if store_lock is None:
+        print("SuperScheduler is already open, or tasks are being imported")
+        return
+    store = open_task_store()  # The one copy of the tasks, shared by the GUI and the notifier
+
+    start_notification_service(store)  # Start the notification service
+
+    # Tk and the calendar are only loaded when a window is wanted
+    import tkinter as tk
+    from task_calendar import TaskCalendar
 
     # Initialize the Tkinter app
     root = tk.Tk()
-    app = TaskCalendar(root)
+    app = TaskCalendar(root, store)
     root.mainloop()
+    store.close()
+    store_lock.release()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+"""Opt-in timing and counters for the app's hot paths.
+
+Everything is off unless the app is started with SUPERSCHEDULER_METRICS=1.
+`timed` then returns the function it decorates unchanged and `timer` and
+`count` are no-ops, so an ordinary run pays nothing. When enabled, each named
+operation keeps a call count, total and maximum time and a latency histogram.
+The numbers can be watched live in the debug window (Ctrl+Shift+D in the
+calendar) and are written to SUPERSCHEDULER_METRICS_FILE (default
+metrics.json) when the app exits.
+
+Two heavier captures can be switched on independently:
+    SUPERSCHEDULER_PROFILE=app.prof   profile the GUI thread with cProfile
+    SUPERSCHEDULER_TRACEMALLOC=25     record allocations; the top 25 lines go in the dump
+"""
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('SUPERSCHEDULER_METRICS', '') not in ('', '0')
+METRICS_FILE = os.environ.get('SUPERSCHEDULER_METRICS_FILE', 'metrics.json')
+PROFILE_FILE = os.environ.get('SUPERSCHEDULER_PROFILE')
+TRACEMALLOC_TOP = int(os.environ.get('SUPERSCHEDULER_TRACEMALLOC') or 0)
+
+# Upper bounds of the latency histogram buckets, in milliseconds; the last bucket is open
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_timings = {}  # name -> [calls, total seconds, max seconds, bucket counts]
+_counters = {}
+_profiler = None
+
+
+def record(name, seconds):
+    milliseconds = seconds * 1000
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            timing = _timings[name] = [0, 0.0, 0.0, [0] * (len(BUCKETS_MS) + 1)]
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+        timing[3][bisect.bisect_left(BUCKETS_MS, milliseconds)] += 1
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """Context manager timing a block under `name`."""
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def timed(name):
+    """Decorator timing every call under `name`; returns the function untouched when disabled."""
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1):
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    """Return the current counters and timings as plain data."""
+    with _lock:
+        timings = {
+            name: {
+                "calls": calls,
+                "total_ms": total * 1000,
+                "mean_ms": total * 1000 / calls,
+                "max_ms": maximum * 1000,
+                "histogram_ms": {f"<={bound}": n for bound, n in zip(BUCKETS_MS, buckets)} | {
+                    f">{BUCKETS_MS[-1]}": buckets[-1]},
+            }
+            for name, (calls, total, maximum, buckets) in sorted(_timings.items())
+        }
+        return {"counters": dict(sorted(_counters.items())), "timings": timings}
+
+
+def dump(path=METRICS_FILE):
+    data = snapshot()
+    if TRACEMALLOC_TOP:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_TOP]
+            data["allocations"] = [
+                {"where": str(stat.traceback), "size_kib": stat.size / 1024, "blocks": stat.count}
+                for stat in statistics
+            ]
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def start():
+    """Start the opt-in captures; called once at startup. The results are written at exit."""
+    global _profiler
+    if TRACEMALLOC_TOP:
+        import tracemalloc
+        tracemalloc.start()
+    if PROFILE_FILE:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if ENABLED or TRACEMALLOC_TOP or PROFILE_FILE:
+        atexit.register(stop)
+
+
+def stop():
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(PROFILE_FILE)
+        print(f"Profile written to {PROFILE_FILE}")
+    if ENABLED or TRACEMALLOC_TOP:
+        dump()
+        print(f"Metrics written to {METRICS_FILE}")
@@ -0,0 +1,41 @@
+import tkinter as tk
+
+import metrics
+
+# How often the window re-reads the metrics, in milliseconds
+REFRESH_MS = 1000
+
+
+class MetricsWindow:
+    """Debug window listing the live counters and timings from metrics."""
+
+    def __init__(self, parent):
+        self.top = tk.Toplevel(parent)
+        self.top.title("Metrics")
+        self.top.geometry("700x400")
+
+        self.text = tk.Text(self.top, font=("Courier", 10), wrap=tk.NONE)
+        self.text.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+
+        self.dump_button = tk.Button(self.top, text="Write metrics file", command=self.write_file)
+        self.dump_button.pack(pady=5)
+
+        self.refresh()
+
+    def refresh(self):
+        if not self.top.winfo_exists():
+            return
+        data = metrics.snapshot()
+        lines = [f"{'operation':<28}{'calls':>8}{'mean ms':>10}{'max ms':>10}{'total ms':>12}"]
+        for name, timing in data["timings"].items():
+            lines.append(f"{name:<28}{timing['calls']:>8}{timing['mean_ms']:>10.2f}"
+                         f"{timing['max_ms']:>10.2f}{timing['total_ms']:>12.1f}")
+        lines.append("")
+        lines.extend(f"{name:<28}{value:>8}" for name, value in data["counters"].items())
+
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, "\n".join(lines))
+        self.top.after(REFRESH_MS, self.refresh)
+
+    def write_file(self):
+        metrics.dump()
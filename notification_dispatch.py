@@ -0,0 +1,218 @@
+import collections
+import logging
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+# Reminders arriving within this many seconds of the first one are delivered together
+COALESCE_SECONDS = 1.0
+
+# More reminders than this in one batch become a single summary notification
+SUMMARY_AFTER = 3
+
+# How long one sink may take to show a notification before it is given up on
+SINK_TIMEOUT = 10.0
+
+# Notifications a sink may have queued; the oldest are dropped beyond this
+SINK_QUEUE_SIZE = 100
+
+# Longest summary message; desktop notification backends truncate or reject longer ones
+MAX_MESSAGE_LENGTH = 250
+
+
+class DesktopSink:
+    """Show notifications on the desktop through plyer."""
+
+    name = "desktop"
+
+    def send(self, title, message):
+        from plyer import notification  # Only loaded once a notification is actually shown
+        notification.notify(title=title, message=message, timeout=10)
+
+
+class FileSink:
+    """Append notifications to a text file, one line each."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, title, message):
+        with open(self.path, 'a') as f:
+            message = message.replace("\n", " | ")  # Summaries span several lines
+            f.write(f"{datetime.now().isoformat(timespec='seconds')}\t{title}\t{message}\n")
+
+
+class LogSink:
+    """Send notifications to the `logging` module."""
+
+    name = "log"
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("superscheduler.notifications")
+
+    def send(self, title, message):
+        self.logger.info("%s: %s", title, message)
+
+
+def make_sink(spec):
+    """Build a sink from "desktop", "log" or "file:PATH"."""
+    if spec == "desktop":
+        return DesktopSink()
+    if spec == "log":
+        return LogSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    raise ValueError(f"Unknown notification sink {spec!r}")
+
+
+def reminder_notification(task_name, hours):
+    return f"Task Reminder: {task_name}", f"{task_name} is due in {hours} hours!"
+
+
+def summary_notification(reminders):
+    """Fold many (task_name, hours) reminders into one (title, message), soonest first."""
+    by_hours = collections.defaultdict(list)
+    for task_name, hours in reminders:
+        by_hours[hours].append(task_name)
+    lines = [f"Due in {hours} hours: {', '.join(names)}" for hours, names in sorted(by_hours.items())]
+    message = "\n".join(lines)
+    if len(message) > MAX_MESSAGE_LENGTH:
+        message = message[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return f"Task Reminders: {len(reminders)} tasks due soon", message
+
+
+class SinkWorker:
+    """Deliver notifications to one sink on its own thread, so a stalled backend delays nobody else.
+
+    A call that takes longer than `timeout` is abandoned (it keeps running on
+    a daemon thread) and reported; later notifications wait for it at most one
+    more timeout before they are dropped.
+    """
+
+    def __init__(self, sink, timeout=SINK_TIMEOUT, queue_size=SINK_QUEUE_SIZE):
+        self.sink = sink
+        self.timeout = timeout
+        self._queue = collections.deque(maxlen=queue_size)
+        self._cond = threading.Condition()
+        self._closing = False
+        self._stalled = None  # Thread still stuck in an abandoned send
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, title, message):
+        with self._cond:
+            self._queue.append((title, message))
+            self._cond.notify()
+
+    def close(self):
+        """Stop after delivering what is queued (each send still bounded by the timeout)."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                title, message = self._queue.popleft()
+            self._deliver(title, message)
+
+    def _deliver(self, title, message):
+        if self._stalled is not None:
+            self._stalled.join(self.timeout)
+            if self._stalled.is_alive():
+                metrics.count(f"notifications.dropped.{self.sink.name}")
+                print(f"Notification backend '{self.sink.name}' is not responding; dropped: {title}")
+                return
+            self._stalled = None
+
+        errors = []
+        call = threading.Thread(target=self._send, args=(title, message, errors), daemon=True)
+        call.start()
+        call.join(self.timeout)
+        if call.is_alive():
+            self._stalled = call
+            metrics.count(f"notifications.timeouts.{self.sink.name}")
+            print(f"Notification backend '{self.sink.name}' timed out after {self.timeout}s")
+        elif errors:
+            print(f"Failed to send notification via '{self.sink.name}': {errors[0]}")
+        else:
+            metrics.count(f"notifications.sent.{self.sink.name}")
+
+    def _send(self, title, message, errors):
+        try:
+            with metrics.timer(f"notifications.send.{self.sink.name}"):
+                self.sink.send(title, message)
+        except Exception as e:
+            errors.append(e)
+
+
+class NotificationDispatcher:
+    """Queue reminders without blocking the caller and deliver them to every sink.
+
+    `remind(task_name, hours)` only records the reminder, so it can be handed to
+    DeadlineScheduler as its notify callback. Reminders that arrive within
+    `coalesce_seconds` of each other are delivered together: a few as separate
+    notifications, more than `summary_after` as one summary.
+    """
+
+    def __init__(self, sinks, timeout=SINK_TIMEOUT, coalesce_seconds=COALESCE_SECONDS, summary_after=SUMMARY_AFTER):
+        self.coalesce_seconds = coalesce_seconds
+        self.summary_after = summary_after
+        self.workers = [SinkWorker(sink, timeout) for sink in sinks]
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._first_reminder = None
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def remind(self, task_name, hours):
+        with self._cond:
+            if not self._pending:
+                self._first_reminder = time.monotonic()
+            self._pending.append((task_name, hours))
+            self._cond.notify()
+
+    def close(self):
+        """Deliver what is pending, then stop the workers."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        for worker in self.workers:
+            worker.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Let the rest of a burst arrive before deciding how to show it
+                while not self._closing:
+                    remaining = self._first_reminder + self.coalesce_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                reminders, self._pending = self._pending, []
+
+            if len(reminders) > self.summary_after:
+                metrics.count('notifications.coalesced', len(reminders))
+                notifications = [summary_notification(reminders)]
+            else:
+                notifications = [reminder_notification(name, hours) for name, hours in reminders]
+
+            for title, message in notifications:
+                for worker in self.workers:
+                    worker.submit(title, message)
@@ -0,0 +1,51 @@
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Seconds between attempts while waiting for a lock
+WAIT_INTERVAL = 5.0
+
+
+class ProcessLock:
+    """An exclusive lock on a file, shared by the processes of the app.
+
+    The operating system releases it when its holder exits, even if it
+    crashes, so a stale lock file never blocks anyone. The lock is advisory:
+    only processes that take it are kept out.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, wait=False):
+        """Take the lock; return False if another process holds it, or with `wait`, wait until it does not."""
+        while self._file is None:
+            f = open(self.path, 'a+')
+            try:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                f.close()
+                if not wait:
+                    return False
+                time.sleep(WAIT_INTERVAL)
+                continue
+            self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if not fcntl:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()  # Also releases a flock
+        self._file = None
@@ -0,0 +1,236 @@
+import calendar
+import itertools
+import uuid
+from datetime import date, timedelta
+
+from task_schema import due_clock, due_timestamp
+
+# Recurrence choices offered in the UI, as (frequency, interval)
+RECURRENCE_OPTIONS = {
+    "Daily": ("daily", 1),
+    "Every Other Day": ("daily", 2),
+    "Weekly": ("weekly", 1),
+    "Every Other Week": ("weekly", 2),
+    "Monthly": ("monthly", 1),
+}
+
+# Fields a recurring task shares with all of its occurrences
+OCCURRENCE_FIELDS = ('name', 'category', 'status', 'due')
+
+
+def make_rule_task(task, frequency, interval=1, end=None, count=None):
+    """Turn a plain task into a recurring one, stored once on its start date.
+
+    `end` is an inclusive "YYYY-MM-DD" key and `count` a number of occurrences;
+    either or both may be omitted. Per-occurrence changes are recorded later in
+    the sparse `exceptions` map keyed by the occurrence's original date.
+    """
+    rule = {"frequency": frequency, "interval": interval, "exceptions": {}}
+    if end is not None:
+        rule["end"] = end
+    if count is not None:
+        rule["count"] = count
+    return dict(task, series=uuid.uuid4().hex, recurrence=rule)
+
+
+def is_rule(task):
+    return 'recurrence' in task
+
+
+def _months_between(start, day):
+    return (day.year - start.year) * 12 + day.month - start.month
+
+
+def _add_months(start, months):
+    """Return start shifted by `months`, or None if that month lacks start's day."""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    if start.day > calendar.monthrange(year, month + 1)[1]:
+        return None
+    return date(year, month + 1, start.day)
+
+
+def occurrence_dates(start, rule, first=None):
+    """Lazily yield the dates of a rule from `first` (or its start) onward.
+
+    Monthly rules skip months that do not have the start's day of month.
+    The generator is unbounded for rules without an end or count.
+    """
+    frequency, interval = rule["frequency"], rule.get("interval", 1)
+    end = date.fromisoformat(rule["end"]) if "end" in rule else None
+    count = rule.get("count")
+    first = max(first or start, start)
+
+    if frequency == "monthly":
+        months = _months_between(start, first)
+        months -= months % interval
+        if count is not None:
+            # Occurrences skipped in short months still count against the limit
+            index = sum(1 for m in range(0, months, interval) if _add_months(start, m))
+        while True:
+            day = _add_months(start, months)
+            months += interval
+            if day is None:
+                continue
+            if end and day > end or count is not None and index >= count:
+                return
+            if count is not None:
+                index += 1
+            if day >= first:
+                yield day
+    else:
+        step = interval * (7 if frequency == "weekly" else 1)
+        index = -(-(first - start).days // step)  # Round up to the first date >= first
+        while True:
+            if count is not None and index >= count:
+                return
+            day = start + timedelta(days=index * step)
+            if end and day > end:
+                return
+            yield day
+            index += 1
+
+
+def expand(start_key, task, first_key, last_key):
+    """Yield (date_key, occurrence) for the occurrences of a rule task in [first_key, last_key].
+
+    Occurrences are new dicts with the shared fields, any per-occurrence
+    overrides, the `series` id and the original date under `occurrence`. Their
+    `id` combines the two, so it is stable across expansions. Each is due at
+    the rule's time of day (or its overridden one) on the date it appears on.
+    Deleted occurrences are skipped and moved ones appear on their new date.
+    """
+    rule = task["recurrence"]
+    exceptions = rule.get("exceptions", {})
+    base = {key: value for key, value in task.items() if key != 'recurrence'}
+    clock = due_clock(task.get('due'))
+    start = date.fromisoformat(start_key)
+    last = date.fromisoformat(last_key)
+
+    for day in occurrence_dates(start, rule, date.fromisoformat(first_key)):
+        if day > last:
+            break
+        date_key = day.isoformat()
+        if date_key in exceptions:
+            continue  # Deleted, overridden or moved; handled below
+        occurrence = dict(base, id=occurrence_id(task, date_key), occurrence=date_key)
+        if clock:
+            occurrence['due'] = due_timestamp(day, *clock)
+        yield date_key, occurrence
+
+    for original_key, override in exceptions.items():
+        if override is None:
+            continue
+        date_key = override.get("date", original_key)
+        if first_key <= date_key <= last_key and occurs_on(start, rule, date.fromisoformat(original_key)):
+            occurrence = dict(base, **override, id=occurrence_id(task, original_key), occurrence=original_key)
+            occurrence.pop("date", None)
+            override_clock = due_clock(occurrence.get('due'))
+            if override_clock:
+                occurrence['due'] = due_timestamp(date_key, *override_clock)
+            yield date_key, occurrence
+
+
+def occurrence_id(task, original_key):
+    return f"{task['series']}@{original_key}"
+
+
+def occurs_on(start, rule, day):
+    """Tell whether the rule (ignoring exceptions) has an occurrence on `day`."""
+    for occurrence in occurrence_dates(start, rule, day):
+        return occurrence == day
+    return False
+
+
+def override_for(task, occurrence):
+    """Return the fields of `occurrence` that differ from its rule task, for an exception."""
+    override = {key: occurrence[key] for key in OCCURRENCE_FIELDS
+                if key != 'due' and key in occurrence and occurrence[key] != task.get(key)}
+    # Occurrences fall on other dates than the rule, so only the time of day can differ
+    if 'due' in occurrence and due_clock(occurrence['due']) != due_clock(task.get('due')):
+        override['due'] = occurrence['due']
+    return override
+
+
+def with_exception(task, original_key, override):
+    """Return a copy of a rule task with the exception for one occurrence replaced.
+
+    An override of None deletes the occurrence; an empty one restores it.
+    """
+    rule = dict(task["recurrence"])
+    exceptions = dict(rule.get("exceptions", {}))
+    if override == {}:
+        exceptions.pop(original_key, None)
+    else:
+        exceptions[original_key] = override
+    rule["exceptions"] = exceptions
+    return dict(task, recurrence=rule)
+
+
+def shifted(task, days):
+    """Return a copy of a rule task with its end and exceptions moved `days` days, for moving its series.
+
+    The caller moves the rule itself to its new start date.
+    """
+    def shift(date_key):
+        return (date.fromisoformat(date_key) + timedelta(days=days)).isoformat()
+
+    rule = dict(task["recurrence"])
+    if "end" in rule:
+        rule["end"] = shift(rule["end"])
+    exceptions = {}
+    for original_key, override in rule.get("exceptions", {}).items():
+        if override and "date" in override:
+            override = dict(override, date=shift(override["date"]))
+        exceptions[shift(original_key)] = override
+    rule["exceptions"] = exceptions
+    return dict(task, recurrence=rule)
+
+
+def with_changes(start_key, task, changes):
+    """Return a copy of a rule task with `changes` to its shared fields applied to every occurrence.
+
+    Per-occurrence overrides of the changed fields are dropped so the change
+    shows everywhere; other overrides, moves and deletions are kept. A `due`
+    change keeps only its time of day.
+    """
+    changes = dict(changes)
+    clock = due_clock(changes.get('due'))
+    if clock:
+        changes['due'] = due_timestamp(start_key, *clock)
+    rule = dict(task["recurrence"])
+    exceptions = {}
+    for original_key, override in rule.get("exceptions", {}).items():
+        if override:
+            override = {key: value for key, value in override.items() if key not in changes}
+            if not override:
+                continue  # Nothing left that differs from the series
+        exceptions[original_key] = override
+    rule["exceptions"] = exceptions
+    return dict(task, **changes, recurrence=rule)
+
+
+def split(start_key, task, original_key):
+    """Split a rule task at one of its occurrences.
+
+    Return (head, tail): the rule ending the day before `original_key`, and
+    a copy of it starting there with the remaining occurrences, as a new
+    series. Each keeps the exceptions of its own occurrences. The tail keeps
+    the task's id; the caller gives it a new one.
+    """
+    rule = task["recurrence"]
+    cut = date.fromisoformat(original_key)
+    exceptions = rule.get("exceptions", {})
+    head_rule = dict(rule, end=(cut - timedelta(days=1)).isoformat(),
+                     exceptions={key: value for key, value in exceptions.items() if key < original_key})
+    tail_rule = dict(rule, exceptions={key: value for key, value in exceptions.items() if key >= original_key})
+    if "count" in rule:
+        before = sum(1 for _ in itertools.takewhile(lambda day: day < cut,
+                                                    occurrence_dates(date.fromisoformat(start_key), rule)))
+        tail_rule["count"] = rule["count"] - before
+
+    tail = dict(task, series=uuid.uuid4().hex, recurrence=tail_rule)
+    clock = due_clock(task.get('due'))
+    if clock:
+        tail['due'] = due_timestamp(cut, *clock)
+    return dict(task, recurrence=head_rule), tail
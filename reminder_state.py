@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+# Rewrite the state file once it holds this many more records than live entries
+COMPACT_AFTER_RECORDS = 1000
+
+
+class ReminderState:
+    """Remember which reminder threshold was last announced for each task, across restarts.
+
+    Entries are keyed by task id (or occurrence id) and remember the due time
+    they were announced for, so a task whose due time changes starts over.
+    The file is an append-only log of "key<TAB>due<TAB>hours" lines (hours 0
+    forgets the key), read once at startup. Entries for tasks that are past due
+    are pruned, and the log is rewritten once it is mostly dead records.
+    Without a path the state is kept in memory only.
+    """
+
+    def __init__(self, path=None, compact_after=COMPACT_AFTER_RECORDS):
+        self.path = path
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (due timestamp, hours)
+        self._records = 0  # Lines in the file, live or dead
+        self._file = None
+        if path:
+            self._load()
+            self.prune(time.time())
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 3 or not line.endswith('\n'):
+                        continue  # Torn or foreign line
+                    try:
+                        key, due, hours = parts[0], int(parts[1]), int(parts[2])
+                    except ValueError:
+                        continue  # Corrupt line; the others still count
+                    self._records += 1
+                    if hours:
+                        self._entries[key] = (due, hours)
+                    else:
+                        self._entries.pop(key, None)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Ignoring unreadable reminder state {self.path}: {e}")
+            self._entries = {}
+
+    def _append(self, key, due, hours):
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(f"{key}\t{due}\t{hours}\n")
+        self._file.flush()
+        self._records += 1
+
+    def notified(self, key, due_date):
+        """Return the last threshold announced for `key` at this due time, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] == int(due_date.timestamp()):
+            return entry[1]
+        return None
+
+    def record(self, key, due_date, hours):
+        due = int(due_date.timestamp())
+        with self._lock:
+            if self._entries.get(key) != (due, hours):
+                self._entries[key] = (due, hours)
+                self._append(key, due, hours)
+
+    def discard(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._append(key, 0, 0)
+
+    def prune(self, now):
+        """Forget tasks that are past due, compacting the file when it is mostly dead records."""
+        with self._lock:
+            for key in [key for key, (due, _) in self._entries.items() if due <= now]:
+                del self._entries[key]
+            if self.path and self._records - len(self._entries) >= self.compact_after:
+                self._compact()
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.writelines(f"{key}\t{due}\t{hours}\n" for key, (due, hours) in self._entries.items())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self._records = len(self._entries)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import metrics
+import recurrence
+from task_file_watcher import file_signature
+from task_model import compact_list
+from task_schema import SCHEMA_KEY, SCHEMA_VERSION, upgrade_task
+from task_storage import fsync_directory, write_atomically
+
+MANIFEST_FILE = 'manifest.json'
+
+# Recurring rule tasks of every month, kept resident (the store indexes them all at startup)
+RECURRING_FILE = 'recurring.json'
+
+# Months kept parsed in memory
+CACHED_MONTHS = 12
+
+
+def month_of(date_key):
+    return date_key[:7]
+
+
+class ShardedStorage:
+    """Keep tasks in one JSON file per month, loading months on demand.
+
+    The directory holds "YYYY-MM.json" shards of the plain (non-recurring)
+    tasks, RECURRING_FILE with the rule tasks, and a manifest listing the
+    months that have a shard. A save rewrites only the shards of the months
+    that changed, plus RECURRING_FILE if a rule changed. The manifest is only
+    rewritten when a month gains its first task or loses its last one.
+    Viewing a month reads only the shards it shows, and the most recently
+    used `cached_months` stay parsed in memory.
+
+    Rules are kept apart from the plain tasks of their date. The store never
+    shows rule tasks themselves, so their order relative to plain tasks does
+    not matter.
+
+    Every shard is replaced atomically. A new month is added to the manifest
+    before its shard is written, and a month is removed from the manifest
+    after its shard is deleted. The manifest may therefore list a month with
+    no shard, but never misses one.
+
+    changed_on_disk() compares the signature of every file in the directory
+    with the one we last read or wrote, so a save by another process is seen;
+    refresh() then drops what was read before it.
+    """
+
+    lazy = True
+
+    def __init__(self, path, cached_months=CACHED_MONTHS):
+        self.path = path
+        self.cached_months = cached_months
+        self._lock = threading.RLock()
+        self._months = OrderedDict()  # month -> {date_key: tasks}, least recently used first
+        os.makedirs(path, exist_ok=True)
+        self.refresh()
+
+    def refresh(self):
+        """Forget the months and rules read so far, and read the manifest and the rules again."""
+        with self._lock:
+            self._signatures = self._signature()  # Taken first, so a save while reading counts as a change
+            self._months.clear()
+            manifest = self._read(MANIFEST_FILE, None)
+            if manifest is None:
+                manifest = {SCHEMA_KEY: SCHEMA_VERSION, 'months': []}
+            elif manifest.get(SCHEMA_KEY, 1) > SCHEMA_VERSION:
+                print(f"{self.path} was written by a newer version; unknown fields may be lost")
+            self._month_keys = set(manifest['months'])
+            self._rules = self._read_tasks(RECURRING_FILE)  # date_key -> rule tasks
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _signature(self):
+        """Return {file name: file_signature()} of the manifest, the rules and every shard."""
+        with os.scandir(self.path) as entries:
+            return {entry.name: file_signature(entry.path) for entry in entries if entry.name.endswith('.json')}
+
+    def _wrote(self, name):
+        """Record the signature of a file we just wrote or removed, so it is not taken for a change."""
+        signature = file_signature(self._file(name))
+        if signature is None:
+            self._signatures.pop(name, None)
+        else:
+            self._signatures[name] = signature
+
+    def _read(self, name, default):
+        try:
+            with open(self._file(name), 'r') as f, metrics.timer('storage.json_decode'):
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _read_tasks(self, name):
+        return {date_key: compact_list(tasks) for date_key, tasks in self._read(name, {}).items()}
+
+    def _month(self, month):
+        """Return {date_key: tasks} of one month, reading its shard unless it is cached."""
+        tasks = self._months.get(month)
+        if tasks is None:
+            tasks = self._read_tasks(f"{month}.json") if month in self._month_keys else {}
+            self._months[month] = tasks
+            while len(self._months) > self.cached_months:
+                self._months.popitem(last=False)
+        else:
+            self._months.move_to_end(month)
+        return tasks
+
+    def _stored(self, date_key, plain):
+        rules = self._rules.get(date_key)
+        return plain + rules if rules else plain
+
+    def _months_between(self, first_key, last_key):
+        return sorted(month for month in self._month_keys if month_of(first_key) <= month <= month_of(last_key))
+
+    def load(self):
+        return self.load_range('', '9999-12-31')
+
+    def load_date(self, date_key):
+        with self._lock:
+            return self._stored(date_key, self._month(month_of(date_key)).get(date_key, []))
+
+    def load_range(self, first_key, last_key):
+        """Return {date_key: tasks} for every date with tasks in [first_key, last_key]."""
+        with self._lock:
+            tasks = {}
+            for month in self._months_between(first_key, last_key):
+                for date_key, plain in self._month(month).items():
+                    if first_key <= date_key <= last_key:
+                        tasks[date_key] = plain
+            for date_key, rules in self._rules.items():
+                if first_key <= date_key <= last_key:
+                    tasks[date_key] = tasks.get(date_key, []) + rules
+            return tasks
+
+    def load_recurring(self):
+        """Return {date_key: tasks} holding every recurring rule task (see recurrence)."""
+        with self._lock:
+            return dict(self._rules)
+
+    def iter_tasks(self, first_key='', last_key='9999-12-31'):
+        """Yield (date_key, task) in date order, one month at a time.
+
+        Months that are not cached are read without being cached, so a long
+        export does not push the months being viewed out of the cache.
+        """
+        with self._lock:
+            months = set(self._months_between(first_key, last_key))
+            rules = dict(self._rules)
+        rule_dates = {}  # month -> dates holding rules
+        for date_key in rules:
+            if first_key <= date_key <= last_key:
+                rule_dates.setdefault(month_of(date_key), set()).add(date_key)
+
+        for month in sorted(months | set(rule_dates)):
+            with self._lock:
+                tasks = self._months.get(month)
+                if tasks is None:
+                    tasks = self._read_tasks(f"{month}.json") if month in self._month_keys else {}
+            for date_key in sorted(set(tasks) | rule_dates.get(month, set())):
+                if first_key <= date_key <= last_key:
+                    for task in tasks.get(date_key, []) + rules.get(date_key, []):
+                        yield date_key, task
+
+    def changed_on_disk(self):
+        with self._lock:
+            return self._signature() != self._signatures
+
+    def write(self, tasks, changed):
+        with self._lock:
+            months = {}  # month -> its {date_key: tasks}, with the changed dates applied
+            rules_changed = False
+            for date_key, task_list in changed.items():
+                month = month_of(date_key)
+                if month not in months:
+                    months[month] = self._month(month)
+                plain = [task for task in task_list if not recurrence.is_rule(task)]
+                if plain:
+                    months[month][date_key] = plain
+                else:
+                    months[month].pop(date_key, None)
+
+                rules = [task for task in task_list if recurrence.is_rule(task)]
+                if rules != self._rules.get(date_key, []):
+                    rules_changed = True
+                    if rules:
+                        self._rules[date_key] = rules
+                    else:
+                        del self._rules[date_key]
+
+            added = {month for month, dates in months.items() if dates and month not in self._month_keys}
+            removed = {month for month, dates in months.items() if not dates and month in self._month_keys}
+            if added:
+                self._write_manifest(self._month_keys | added)
+            for month, dates in months.items():
+                shard = self._file(f"{month}.json")
+                if dates:
+                    write_atomically(shard, dict(sorted(dates.items())), indent=None)
+                elif month in removed:
+                    try:
+                        os.remove(shard)
+                    except FileNotFoundError:
+                        pass
+                self._wrote(f"{month}.json")
+            if removed:
+                fsync_directory(self._file(MANIFEST_FILE))
+                self._write_manifest(self._month_keys - removed)
+            if rules_changed:
+                write_atomically(self._file(RECURRING_FILE), self._rules, indent=None)
+                self._wrote(RECURRING_FILE)
+
+    def _write_manifest(self, month_keys):
+        write_atomically(self._file(MANIFEST_FILE), {SCHEMA_KEY: SCHEMA_VERSION, 'months': sorted(month_keys)})
+        self._wrote(MANIFEST_FILE)
+        self._month_keys = set(month_keys)
+
+    def close(self):
+        pass
+
+
+def migrate_json_to_shards(json_path, directory):
+    """One-shot split of a tasks.json file into a sharded directory."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    data.pop(SCHEMA_KEY, None)
+    # Ids are assigned by the store when the tasks are first read
+    data = {date_key: [upgrade_task(date_key, task) for task in tasks] for date_key, tasks in data.items()}
+    storage = ShardedStorage(directory, cached_months=0)
+    storage.write(None, data)
+    return sum(len(task_list) for task_list in data.values())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} TASKS_JSON TASKS_DIR")
+        sys.exit(2)
+    count = migrate_json_to_shards(sys.argv[1], sys.argv[2])
+    print(f"Migrated {count} tasks into {sys.argv[2]}")
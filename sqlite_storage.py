@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import sys
+import threading
+
+from task_schema import SCHEMA_KEY, SCHEMA_VERSION, upgrade_task
+
+# Columns stored natively; any other task fields round-trip through `extra`.
+# The due_time column held version 1 display text and is no longer written.
+TASK_FIELDS = ('name', 'category', 'status', 'due')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    due INTEGER,
+    name TEXT,
+    category TEXT,
+    status TEXT,
+    due_time TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_date ON tasks (date, position);
+CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+CREATE INDEX IF NOT EXISTS tasks_category ON tasks (category);
+"""
+
+
+def task_row(date_key, position, task):
+    extra = {key: value for key, value in task.items() if key not in TASK_FIELDS}
+    return (
+        date_key, position,
+        *(task.get(field) for field in TASK_FIELDS),
+        json.dumps(extra, separators=(',', ':')) if extra else None,
+    )
+
+
+def row_task(row):
+    """Rebuild a task dict from (name, category, status, due, extra)."""
+    task = {field: value for field, value in zip(TASK_FIELDS, row) if value is not None}
+    if row[-1]:
+        task.update(json.loads(row[-1]))
+    return task
+
+
+class SqliteStorage:
+    """Keep tasks as indexed rows in a SQLite database and load them on demand.
+
+    The store asks for single dates or date ranges instead of loading every
+    task, so only the dates being shown or planned are ever read. Commits by
+    other connections, such as another process, show up in PRAGMA
+    data_version, which changed_on_disk() compares with refresh()'s reading.
+    """
+
+    lazy = True
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Shared by the Tk thread and the notifier thread; access is serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._upgrade()
+        self.refresh()
+
+    def _upgrade(self):
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self._db:
+            # Version 1 kept the due time as text next to its parsed `due`; text that
+            # never parsed is kept for display
+            self._db.execute(
+                "UPDATE tasks SET extra = json_set(coalesce(extra, '{}'), '$.due_text', due_time) "
+                "WHERE due IS NULL AND due_time IS NOT NULL"
+            )
+            self._db.execute("UPDATE tasks SET due_time = NULL")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _select(self, where, params):
+        rows = self._db.execute(
+            f"SELECT date, name, category, status, due, extra FROM tasks WHERE {where} "
+            "ORDER BY date, position",
+            params,
+        )
+        tasks = {}
+        for row in rows:
+            tasks.setdefault(row[0], []).append(row_task(row[1:]))
+        return tasks
+
+    def load(self):
+        with self._lock:
+            return self._select("1", ())
+
+    def load_date(self, date_key):
+        with self._lock:
+            return self._select("date = ?", (date_key,)).get(date_key, [])
+
+    def load_range(self, first_key, last_key):
+        """Return {date_key: tasks} for every date with tasks in [first_key, last_key]."""
+        with self._lock:
+            return self._select("date BETWEEN ? AND ?", (first_key, last_key))
+
+    def load_recurring(self):
+        """Return {date_key: tasks} holding every recurring rule task (see recurrence)."""
+        with self._lock:
+            tasks = self._select("extra LIKE ?", ('%"recurrence":%',))
+        return {key: [task for task in task_list if 'recurrence' in task] for key, task_list in tasks.items()}
+
+    def iter_tasks(self, first_key='', last_key='9999-12-31', batch_size=1000):
+        """Yield (date_key, task) in date order, reading `batch_size` rows at a time."""
+        after = (first_key, -1)
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT date, position, name, category, status, due, extra FROM tasks "
+                    "WHERE (date, position) > (?, ?) AND date <= ? ORDER BY date, position LIMIT ?",
+                    (*after, last_key, batch_size),
+                ).fetchall()
+            for row in rows:
+                yield row[0], row_task(row[2:])
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][:2]
+
+    def changed_on_disk(self):
+        with self._lock:
+            return self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def refresh(self):
+        """Note that everything committed so far has been seen; the store re-reads what it needs."""
+        with self._lock:
+            self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def write(self, tasks, changed):
+        with self._lock, self._db:
+            for date_key, task_list in changed.items():
+                self._db.execute("DELETE FROM tasks WHERE date = ?", (date_key,))
+                self._db.executemany(
+                    "INSERT INTO tasks (date, position, name, category, status, due, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (task_row(date_key, position, task) for position, task in enumerate(task_list)),
+                )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """One-shot import of a tasks.json file into a new or existing SQLite database."""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    data.pop(SCHEMA_KEY, None)
+    # Ids are assigned by the store when the tasks are first read
+    data = {date_key: [upgrade_task(date_key, task) for task in tasks] for date_key, tasks in data.items()}
+    storage = SqliteStorage(db_path)
+    try:
+        storage.write(None, data)
+    finally:
+        storage.close()
+    return sum(len(task_list) for task_list in data.values())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} TASKS_JSON TASKS_DB")
+        sys.exit(2)
+    count = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"Migrated {count} tasks into {sys.argv[2]}")
@@ -1,18 +1,37 @@
-import os, json, calendar, threading
-from datetime import datetime, timedelta
+import calendar, threading
+from datetime import date, datetime, timedelta
 import tkinter as tk
 from tkinter import messagebox
 from task_window import TaskWindow
-from pystray import Icon, MenuItem as item
-from PIL import Image
-
-
-# File to store tasks
-TASKS_FILE = 'tasks.json'
+from task_list_view import TaskListView
+from task_schema import display_due_time
+from task_store import TaskStore
+from due_index import due_key
+from year_overview import YearOverview
+import metrics
+import recurrence
+from metrics_window import MetricsWindow
+from widget_util import SHIFT_MASK, TEXT_WIDGETS, UNDO_KEYS, configure_changed
+
+# Tray icon image, read the first time the window is hidden to the tray
+ICON_FILE = "icon.png"
+
+# Search: wait this long after the last keystroke, list at most this many matches,
+# and mark the matching days in this color
+SEARCH_DELAY_MS = 200
+SEARCH_LIMIT = 500
+SEARCH_HIGHLIGHT = "blue"
+ANY_STATUS = "Any status"
+STATUSES = ("Unfinished", "Work in Progress", "Completed")
+
+# Upcoming tasks listed per page of the agenda panel, and how long it waits
+# after a change before listing them again
+AGENDA_PAGE = 50
+AGENDA_REFRESH_MS = 200
 
 
 class TaskCalendar:
-    def __init__(self, root):
+    def __init__(self, root, store=None):
         self.root = root
         self.root.title("Task Calendar")
 
@@ -20,7 +39,11 @@ class TaskCalendar:
         self.root.geometry("900x600")
         self.root.minsize(800, 600)
 
-        self.tasks = self.load_tasks()
+        # Shared with the notifier, so edits reach it without a round trip through the file
+        self.store = store if store is not None else TaskStore()
+        if self.store.on_write_error is None:
+            # Saves happen on a writer thread; report failures back on the Tk thread
+            self.store.on_write_error = lambda error: self.root.after(0, self.show_save_error, error)
 
         self.current_year = datetime.now().year
         self.current_month = datetime.now().month
@@ -28,6 +51,8 @@ class TaskCalendar:
         # Store button references in a dictionary
         self.date_buttons = {}
 
+        self.tray_image = None  # Loaded on first use, see create_tray_icon
+
         # Create a frame for navigation and label
         self.nav_frame = tk.Frame(self.root)
         self.nav_frame.pack(fill=tk.X, pady=10)
@@ -41,6 +66,15 @@ class TaskCalendar:
         self.next_button = tk.Button(self.nav_frame, text="Next >>", command=self.next_month)
         self.next_button.pack(side=tk.RIGHT, padx=10)
 
+        self.agenda_button = tk.Button(self.nav_frame, text="Upcoming", command=self.toggle_agenda)
+        self.agenda_button.pack(side=tk.RIGHT)
+
+        self.overview_button = tk.Button(self.nav_frame, text="Year", command=lambda: YearOverview(self.root, self))
+        self.overview_button.pack(side=tk.RIGHT, padx=10)
+
+        self.build_search_bar()
+        self.build_agenda_panel()
+
         # Create a frame for the calendar
         self.calendar_frame = tk.Frame(self.root)
         self.calendar_frame.pack(expand=True, fill=tk.BOTH)
@@ -50,84 +84,324 @@ class TaskCalendar:
             self.calendar_frame.grid_columnconfigure(i, weight=1, uniform="day")
         self.root.grid_rowconfigure(1, weight=1)  # Make the calendar area expandable
 
+        self.build_calendar_grid()
         self.show_calendar(self.current_year, self.current_month)
 
+        # Search results, listed below the calendar; double-click one to open its day
+        self.results_label = tk.Label(self.root, text="", anchor="w")
+        self.results_label.pack(fill=tk.X, padx=10)
+        self.result_list = TaskListView(self.root, self.format_search_result)
+        self.result_list.listbox.config(height=6)
+        self.result_list.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.result_list.listbox.bind("<Double-Button-1>", self.open_search_result)
+        self.result_list.listbox.bind("<Return>", self.open_search_result)
+
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Keep search results and the agenda current while the tasks change
+        self.store.subscribe(self.on_store_change)
+        # Index the due times in the background once the window is drawn, so the agenda opens without a scan
+        self.root.after_idle(self.store.due_index)
+        self.root.bind("<Destroy>", self.on_destroy, add="+")
+
+        # Ctrl+Z undoes the last change to the tasks; Ctrl+Y or Ctrl+Shift+Z redoes it
+        for sequence in UNDO_KEYS:
+            self.root.bind(sequence, self.on_undo_key)
+
+        if metrics.ENABLED:
+            # Ctrl+Shift+D opens the live metrics window
+            self.root.bind("<Control-D>", lambda event: MetricsWindow(self.root))
+
+    def build_search_bar(self):
+        """Search box and filters; matching days are marked in the calendar as you type."""
+        self.search_job = None
+        self.search_results = None  # SearchResults of the current search, None when not searching
+        self.result_dates = {}  # Task id -> date key of the listed results
+        self.search_range = None  # (first_key, last_key) of the current search
+
+        self.search_frame = tk.Frame(self.root)
+        self.search_frame.pack(fill=tk.X, padx=10)
+
+        self.search_var = tk.StringVar()
+        self.category_filter_var = tk.StringVar()
+        self.status_filter_var = tk.StringVar(value=ANY_STATUS)
+        self.from_var = tk.StringVar()
+        self.to_var = tk.StringVar()
+
+        tk.Label(self.search_frame, text="Search:").pack(side=tk.LEFT)
+        tk.Entry(self.search_frame, textvariable=self.search_var).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+        tk.Label(self.search_frame, text="Category:").pack(side=tk.LEFT)
+        tk.Entry(self.search_frame, textvariable=self.category_filter_var, width=12).pack(side=tk.LEFT, padx=5)
+        tk.OptionMenu(self.search_frame, self.status_filter_var, ANY_STATUS, *STATUSES).pack(side=tk.LEFT, padx=5)
+        tk.Label(self.search_frame, text="From:").pack(side=tk.LEFT)
+        tk.Entry(self.search_frame, textvariable=self.from_var, width=10).pack(side=tk.LEFT, padx=5)
+        tk.Label(self.search_frame, text="To:").pack(side=tk.LEFT)
+        tk.Entry(self.search_frame, textvariable=self.to_var, width=10).pack(side=tk.LEFT, padx=5)
+
+        for var in (self.search_var, self.category_filter_var, self.status_filter_var, self.from_var, self.to_var):
+            var.trace_add("write", lambda *args: self.schedule_search())
+
+    def schedule_search(self):
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def search_query(self):
+        """Return the search() arguments for the search bar, or None if it is empty."""
+        text = self.search_var.get().strip()
+        category = self.category_filter_var.get().strip()
+        status = self.status_filter_var.get()
+        first_key, last_key = self.from_var.get().strip(), self.to_var.get().strip()
+        if not (text or category or status != ANY_STATUS or first_key or last_key):
+            return None
+        for key in (first_key, last_key):
+            if key:
+                date.fromisoformat(key)  # ValueError for anything but YYYY-MM-DD
+        return {
+            'text': text,
+            'category': category or None,
+            'status': None if status == ANY_STATUS else status,
+            'first_key': first_key,
+            'last_key': last_key or '9999-12-31',
+        }
+
+    def run_search(self):
+        self.search_job = None
+        try:
+            query = self.search_query()
+        except ValueError:
+            self.results_label.config(text="Dates must be written as YYYY-MM-DD")
+            return
+
+        if query is None:
+            results = None
+        else:
+            results = self.store.search_index().search(limit=SEARCH_LIMIT, **query)
+            if results is None:
+                self.results_label.config(text="Indexing tasks...")
+                self.search_job = self.root.after(SEARCH_DELAY_MS, self.run_search)
+                return
+
+        self.search_results = results
+        self.search_range = None if query is None else (query['first_key'], query['last_key'])
+        if results is None:
+            self.results_label.config(text="")
+            matches = []
+        else:
+            matches = results.matches
+            shown = f", showing the first {len(matches)}" if results.total > len(matches) else ""
+            self.results_label.config(text=f"{results.total} matching tasks on {len(results.dates)} days{shown}")
+        self.result_dates = {task['id']: date_key for date_key, task in matches}
+        self.result_list.set_tasks([task for _, task in matches])
+        self.show_calendar(self.current_year, self.current_month)
+
+    def build_agenda_panel(self):
+        """The next unfinished tasks across all dates, soonest first; hidden until "Upcoming" is pressed."""
+        self.agenda_job = None
+        self.agenda_shown = False
+        self.agenda_dates = {}  # Task id -> date key of the listed tasks
+        self.agenda_entries = []  # (date_key, task) in the order listed
+
+        self.agenda_frame = tk.Frame(self.root)
+        tk.Label(self.agenda_frame, text="Upcoming", font=("Arial", 12, "bold")).pack(fill=tk.X)
+        self.agenda_list = TaskListView(self.agenda_frame, self.format_agenda_entry)
+        self.agenda_list.listbox.config(width=40)
+        self.agenda_list.pack(expand=True, fill=tk.BOTH)
+        self.agenda_list.listbox.bind("<Double-Button-1>", self.open_agenda_entry)
+        self.agenda_list.listbox.bind("<Return>", self.open_agenda_entry)
+        self.agenda_more = tk.Button(self.agenda_frame, text="More", command=self.load_more_agenda)
+        self.agenda_more.pack(fill=tk.X, pady=(0, 10))
+
+    def toggle_agenda(self):
+        self.agenda_shown = not self.agenda_shown
+        if not self.agenda_shown:
+            self.agenda_frame.pack_forget()
+            if self.agenda_job is not None:
+                self.root.after_cancel(self.agenda_job)
+                self.agenda_job = None
+        else:
+            self.agenda_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=10, before=self.calendar_frame)
+            self.refresh_agenda()
+
+    def refresh_agenda(self):
+        """List the first tasks due from now, as many as are listed already (at least a page)."""
+        self.agenda_job = None
+        limit = max(len(self.agenda_entries), AGENDA_PAGE)
+        entries = self.store.upcoming(limit)
+        if entries is None:
+            self.agenda_list.set_tasks([])
+            self.agenda_more.config(text="Indexing tasks...", state=tk.DISABLED)
+            self.agenda_job = self.root.after(AGENDA_REFRESH_MS, self.refresh_agenda)
+            return
+        self.show_agenda(entries, len(entries) == limit)
+
+    def load_more_agenda(self):
+        if not self.agenda_entries:
+            return
+        entries = self.store.upcoming(AGENDA_PAGE, after=due_key(*self.agenda_entries[-1]))
+        if entries is not None:
+            self.show_agenda(self.agenda_entries + entries, len(entries) == AGENDA_PAGE)
+
+    def show_agenda(self, entries, more):
+        self.agenda_entries = entries
+        self.agenda_dates = {task['id']: date_key for date_key, task in entries}
+        self.agenda_list.set_tasks([task for _, task in entries])
+        self.agenda_more.config(text="More" if more else "No more tasks", state=tk.NORMAL if more else tk.DISABLED)
+
+    def format_agenda_entry(self, index, task):
+        day = date.fromisoformat(self.agenda_dates[task['id']])
+        return f"{day:%a %d %b} {display_due_time(task)}  {task['name']} - {task['category']}"
+
+    def open_agenda_entry(self, event=None):
+        task = self.agenda_list.selected_task()
+        if task is not None:
+            self.open_day(self.agenda_dates[task['id']])
+
+    def open_day(self, date_key):
+        """Show the month of a date and open its task window."""
+        year, month, day = map(int, date_key.split("-"))
+        self.current_year, self.current_month = year, month
+        self.show_calendar(year, month)
+        self.open_task_window(year, month, day)
+
+    def format_search_result(self, index, task):
+        repeats = " (repeats)" if 'recurrence' in task else ""
+        return f"{self.result_dates.get(task['id'], '')}  {task['name']} - {task['category']} - {task['status']}{repeats}"
+
+    def open_search_result(self, event=None):
+        task = self.result_list.selected_task()
+        if task is not None:
+            self.open_day(self.result_dates[task['id']])
+
+    def on_store_change(self, changed):
+        # May be called from another thread; refresh on the Tk thread
+        if self.search_results is not None:
+            self.root.after(0, self.schedule_search)
+        if self.agenda_shown:
+            self.root.after(0, self.schedule_agenda_refresh)
+
+    def schedule_agenda_refresh(self):
+        if self.agenda_job is not None:
+            self.root.after_cancel(self.agenda_job)
+        self.agenda_job = self.root.after(AGENDA_REFRESH_MS, self.refresh_agenda)
+
+    def on_destroy(self, event):
+        if event.widget is self.root:
+            self.store.unsubscribe(self.on_store_change)
+
+    def on_undo_key(self, event):
+        if isinstance(self.root.focus_get(), TEXT_WIDGETS):
+            return None  # Leave the key to the text being typed, e.g. in the search box
+        # Caps Lock also makes the keysym upper case, so Shift is read from the state
+        if event.keysym.lower() == 'y' or event.state & SHIFT_MASK:
+            return self.redo()
+        return self.undo()
+
+    def undo(self, event=None):
+        if not self.store.undo():
+            self.root.bell()  # Nothing to undo
+        # Open task windows, search results and the agenda follow the store's change notification
+        self.show_calendar(self.current_year, self.current_month)
+        return "break"
+
+    def redo(self, event=None):
+        if not self.store.redo():
+            self.root.bell()
+        self.show_calendar(self.current_year, self.current_month)
+        return "break"
+
     def reset_application(self):
         """Reset the application state and reload everything."""
-        self.tasks = self.load_tasks()
+        self.store.reload_if_changed()
         self.show_calendar(self.current_year, self.current_month)
 
-    def load_tasks(self):
-        if os.path.exists(TASKS_FILE):
-            with open(TASKS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-
-    def save_tasks(self):
-        with open(TASKS_FILE, 'w') as f:
-            json.dump(self.tasks, f, indent=4)
+    def build_calendar_grid(self):
+        """Create the day headers and a fixed 6x7 grid of day cells, once."""
+        # Add day headers (Mon, Tue, etc.)
+        headers = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        for col, day in enumerate(headers):
+            header_label = tk.Label(self.calendar_frame, text=day, font=("Arial", 12, "bold"), padx=10, pady=5)
+            header_label.grid(row=0, column=col, sticky="nsew", padx=5, pady=5)
+
+        self.blank_bg = self.calendar_frame.cget("bg")
+        self.cell_fg = None  # Default text color of a day cell, read once the cells exist
+        self.cells = []  # Day buttons in grid order
+        self.cell_dates = [None] * 42  # (year, month, day) shown in each cell, None if blank
+        self.cell_config = [{} for _ in range(42)]  # Last options applied, so unchanged ones cost nothing
+
+        for index in range(42):
+            # The command looks the date up at click time, so it never needs rebinding
+            cell = tk.Button(self.calendar_frame, text="", width=5, height=2,
+                             command=lambda i=index: self.on_cell_click(i))
+            cell.grid(row=index // 7 + 1, column=index % 7, sticky="nsew", padx=5, pady=5)
+            self.cells.append(cell)
+
+        # Rows grow proportionally with window resizing
+        for i in range(7):
+            self.calendar_frame.grid_rowconfigure(i, weight=1, uniform="day")
+        self.cell_fg = self.cells[0].cget("fg")
 
-    def show_calendar(self, year, month):
-        # Clear previous widgets in the calendar frame
-        for widget in self.calendar_frame.winfo_children():
-            widget.destroy()
+    def configure_cell(self, index, **options):
+        """Apply only the options of a day cell that changed, skipping the Tk call if none did."""
+        configure_changed(self.cells[index], self.cell_config[index], **options)
 
-        # Clear the date_buttons dictionary
-        self.date_buttons.clear()
+    def on_cell_click(self, index):
+        if self.cell_dates[index]:
+            self.open_task_window(*self.cell_dates[index])
 
+    @metrics.timed('calendar.show')
+    def show_calendar(self, year, month):
         # Update the label with the current month and year
         self.label.config(text=f"{calendar.month_name[month]} {year}")
 
         cal = calendar.Calendar(firstweekday=0)
-        days = cal.itermonthdays(year, month)
+        days = list(cal.itermonthdays(year, month))
+        days += [0] * (42 - len(days))
 
-        row, col = 0, 0
-        # Add day headers (Mon, Tue, etc.)
-        headers = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        for day in headers:
-            header_label = tk.Label(self.calendar_frame, text=day, font=("Arial", 12, "bold"), padx=10, pady=5)
-            header_label.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
-            col += 1
+        # One indexed range query for the whole month
+        month_summaries = self.month_summaries(year, month)
+        today = datetime.today().date()
 
-        row += 1
-        col = 0
+        # Reuse the date_buttons dictionary for the month being shown
+        self.date_buttons.clear()
+
+        # Days with search matches are marked, including occurrences of matching recurring tasks
+        search_dates = occurrence_dates = ()
+        if self.search_results:
+            search_dates = self.search_results.dates
+            occurrence_dates = self.matching_occurrence_dates(year, month)
 
-        # Create buttons for each day of the current month
-        for day in days:
+        for index, day in enumerate(days):
             if day == 0:
-                col += 1
-                if col > 6:
-                    col = 0
-                    row += 1
+                self.cell_dates[index] = None
+                self.configure_cell(index, text="", bg=self.blank_bg, state=tk.DISABLED, relief=tk.FLAT)
                 continue
 
             date_key = f"{year}-{month:02d}-{day:02d}"
-            has_tasks = date_key in self.tasks and len(self.tasks[date_key]) > 0
-
-            # Create a button for the day number
-            day_button = tk.Button(
-                self.calendar_frame, text=str(day), width=5, height=2,
-                bg="lightgrey" if has_tasks else "white",
-                command=lambda d=day, y=year, m=month: self.open_task_window(y, m, d)
-            )
-            day_button.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
+            if date_key in month_summaries:
+                bg = self.date_color(month_summaries[date_key].date, today)
+            else:
+                bg = "white"
+
+            self.cell_dates[index] = (year, month, day)
+            if date_key in search_dates or date_key in occurrence_dates:
+                self.configure_cell(index, text=f"{day} \u2022", fg=SEARCH_HIGHLIGHT, bg=bg, state=tk.NORMAL,
+                                    relief=tk.RAISED)
+            else:
+                self.configure_cell(index, text=str(day), fg=self.cell_fg, bg=bg, state=tk.NORMAL, relief=tk.RAISED)
 
             # Store the button in the date_buttons dictionary
-            self.date_buttons[date_key] = day_button
-
-            col += 1
-            if col > 6:
-                col = 0
-                row += 1
-
-        # Adjust the grid row configuration so that rows grow proportionally with window resizing
-        for i in range(row + 1):
-            self.calendar_frame.grid_rowconfigure(i, weight=1, uniform="day")
-
-        # Update the colors of the date boxes based on task due dates
-        self.update_date_boxes()
+            self.date_buttons[date_key] = self.cells[index]
+
+    def matching_occurrence_dates(self, year, month):
+        """Return the dates of a month, within the searched range, with occurrences of the matching recurring tasks."""
+        first_key = max(f"{year}-{month:02d}-01", self.search_range[0])
+        last_key = min(f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}", self.search_range[1])
+        dates = set()
+        if first_key <= last_key:
+            for start_key, rule in self.search_results.rules:
+                dates.update(date_key for date_key, _ in recurrence.expand(start_key, rule, first_key, last_key))
+        return dates
 
     def prev_month(self):
         if self.current_month == 1:
@@ -149,26 +423,37 @@ class TaskCalendar:
         """Retrieve the button associated with a specific date."""
         return self.date_buttons.get(date_key)
 
-    def update_date_boxes(self):
+    def month_summaries(self, year, month):
+        """Return {date_key: DaySummary} for the days of a month that have tasks."""
+        last_day = calendar.monthrange(year, month)[1]
+        return self.store.day_summaries(f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}")
+
+    def date_color(self, task_date, today):
+        """Return the color of a day with tasks, based on how far its due date is."""
+        if task_date == today:
+            return "orange"  # Task due today
+        elif task_date == today + timedelta(days=1):
+            return "yellow"  # Task due tomorrow
+        elif task_date < today:
+            return "red"  # Task past due
+        else:
+            return "lightgrey"  # No special color if it's beyond tomorrow
+
+    @metrics.timed('calendar.update_colors')
+    def update_date_boxes(self, month_summaries=None):
         """Update calendar date boxes based on the proximity of tasks' due dates."""
         today = datetime.today().date()
+        if month_summaries is None:
+            month_summaries = self.month_summaries(self.current_year, self.current_month)
 
-        for date_key, tasks in self.tasks.items():
-            task_date = datetime.strptime(date_key, "%Y-%m-%d").date()
+        for date_key, summary in month_summaries.items():
+            task_date = summary.date  # Parsed once, when the date was indexed
 
             # Find the corresponding button for the date
             date_button = self.get_date_button(date_key)
 
             if date_button:
-                # Set colors based on how far the task is
-                if task_date == today:
-                    date_button.config(bg="orange")  # Task due today
-                elif task_date == today + timedelta(days=1):
-                    date_button.config(bg="yellow")  # Task due tomorrow
-                elif task_date < today:
-                    date_button.config(bg="red")  # Task past due
-                else:
-                    date_button.config(bg="lightgrey")  # No special color if it's beyond tomorrow
+                self.configure_cell(self.cells.index(date_button), bg=self.date_color(task_date, today))
 
     def open_task_window(self, year, month, day):
         TaskWindow(self.root, year, month, day, self)
@@ -181,12 +466,23 @@ class TaskCalendar:
             self.root.withdraw()  # Hide the main window
             self.create_tray_icon()  # Start the tray icon
         else:  # No - close completely
-            self.root.quit()
+            self.exit_app()
+
+    def exit_app(self):
+        self.store.flush()  # Never drop edits still waiting to be written
+        self.root.quit()
+
+    def show_save_error(self, error):
+        messagebox.showerror("Save Failed", f"Your changes could not be saved: {error}\nThey will be retried.")
 
     def create_tray_icon(self):
-        icon_image = Image.open("icon.png")
-        menu = (item('Restore', self.restore), item('Exit', self.root.quit))
-        tray_icon = Icon("SuperScheduler", icon_image, menu=menu)
+        # pystray and PIL are slow to import and only needed once the window is hidden
+        from pystray import Icon, MenuItem as item
+        if self.tray_image is None:
+            from PIL import Image
+            self.tray_image = Image.open(ICON_FILE)
+        menu = (item('Restore', self.restore), item('Exit', self.exit_app))
+        tray_icon = Icon("SuperScheduler", self.tray_image, menu=menu)
 
         # Run the icon in a separate thread
         threading.Thread(target=tray_icon.run, args=(self.setup_tray,), daemon=True).start()
@@ -0,0 +1,165 @@
+"""Headless bulk import and export of tasks, without the GUI or the notifier.
+
+    python task_cli.py import tasks.csv
+    python task_cli.py export backup.jsonl
+    python task_cli.py export - --format ics --from 2024-09-01 --to 2024-09-30 --expand
+
+Files are read and written as streams, and imports are committed to the task
+store in batches, one write per batch, without keeping undo history. Memory
+use stays flat only with the SQLite and month-shard stores, which drop each
+batch from memory once it is written; the default JSON store keeps every task
+in memory, as the calendar does (sqlite_storage.py and sharded_storage.py
+migrate it).
+"""
+import argparse
+import contextlib
+import csv
+import json
+import sys
+from datetime import date, timedelta
+
+from task_formats import FORMATS, READERS, WRITERS, guess_format
+from task_schema import ALL_DAY, due_timestamp, needs_upgrade, on_date, upgrade_task
+from task_store import lock_task_store, new_task_id, open_task_store
+
+# Tasks committed to the store per write
+BATCH_SIZE = 1000
+
+# Days expanded at a time by `export --expand`
+EXPAND_DAYS = 31
+
+
+def open_stream(path, mode):
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def checked_task(date_key, task, keep_ids):
+    """Validate an imported task and fill in the fields the GUI expects; raises ValueError."""
+    date.fromisoformat(date_key)
+    if not task.get('name'):
+        raise ValueError("task has no name")
+    task.setdefault('category', '')
+    task.setdefault('status', 'Unfinished')
+    if needs_upgrade(task):
+        task = upgrade_task(date_key, task)  # e.g. a "9:05 PM" due_time column
+    if 'due_text' in task:
+        raise ValueError(f"invalid due time {task['due_text']!r}")
+    if 'due' in task:
+        task = on_date(task, date_key)
+    else:
+        task['due'] = due_timestamp(date_key, *ALL_DAY)
+    if not keep_ids:
+        task.pop('id', None)  # Re-importing a file must not duplicate ids
+    if 'recurrence' in task:
+        if task['recurrence']['frequency'] not in ('daily', 'weekly', 'monthly'):
+            raise ValueError(f"unknown frequency {task['recurrence']['frequency']!r}")
+        task['recurrence'].setdefault('exceptions', {})
+        if not keep_ids or 'series' not in task:
+            task['series'] = new_task_id()
+    else:
+        # An occurrence exported on its own becomes a plain task
+        task.pop('series', None)
+        task.pop('occurrence', None)
+    return task
+
+
+def import_tasks(store, dated_tasks, batch_size=BATCH_SIZE, keep_ids=False):
+    """Add tasks to the store in batches; return (imported, skipped)."""
+    imported = skipped = 0
+    batch = []
+    try:
+        for number, (date_key, task) in enumerate(dated_tasks, 1):
+            try:
+                batch.append((date_key, checked_task(date_key, task, keep_ids)))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Skipping record {number}: {e}", file=sys.stderr)
+                skipped += 1
+                continue
+            if len(batch) >= batch_size:
+                store.add_tasks(batch)
+                store.evict_cache()
+                imported += len(batch)
+                batch = []
+    finally:
+        # Also commit what was read before an unreadable record
+        if batch:
+            store.add_tasks(batch)
+            imported += len(batch)
+    return imported, skipped
+
+
+def expanded_tasks(store, first_key, last_key):
+    """Yield (date_key, task) with recurring occurrences expanded, a few weeks at a time."""
+    first, last = date.fromisoformat(first_key), date.fromisoformat(last_key)
+    while first <= last:
+        chunk_last = min(first + timedelta(days=EXPAND_DAYS - 1), last)
+        tasks_by_date = store.tasks_between(first.isoformat(), chunk_last.isoformat())
+        for date_key in sorted(tasks_by_date):
+            for task in tasks_by_date[date_key]:
+                yield date_key, task
+        store.evict_cache()
+        first = chunk_last + timedelta(days=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export tasks without starting the GUI.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="add the tasks in a file to the task store")
+    import_parser.add_argument('file', help="file to read, or - for standard input")
+    import_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    import_parser.add_argument('--keep-ids', action='store_true', help="keep task ids from the file")
+
+    export_parser = commands.add_parser('export', help="write the tasks in the task store to a file")
+    export_parser.add_argument('file', help="file to write, or - for standard output")
+    export_parser.add_argument('--from', dest='first', default='', metavar='YYYY-MM-DD')
+    export_parser.add_argument('--to', dest='last', default='9999-12-31', metavar='YYYY-MM-DD')
+    export_parser.add_argument('--expand', action='store_true',
+                               help="write each occurrence of recurring tasks (requires --from and --to)")
+
+    for command_parser in (import_parser, export_parser):
+        command_parser.add_argument('--format', choices=FORMATS, help="default: guessed from the file name")
+
+    args = parser.parse_args(argv)
+    file_format = args.format or guess_format(args.file)
+    if file_format is None:
+        parser.error(f"cannot tell the format of {args.file!r}; use --format")
+    if args.command == 'export' and args.expand and not (args.first and args.last != '9999-12-31'):
+        parser.error("--expand requires --from and --to")
+
+    lock = None
+    if args.command == 'import':
+        # The calendar would overwrite imported dates with its own copy of them
+        lock = lock_task_store()
+        if lock is None:
+            print("SuperScheduler or another import is editing the tasks; close it and try again", file=sys.stderr)
+            sys.exit(1)
+    # Each batch is written as it is committed; there is nothing to undo from here
+    store = open_task_store(write_delay=None, owner=lock is not None, undo_depth=0)
+    try:
+        if args.command == 'import':
+            try:
+                with open_stream(args.file, 'r') as f:
+                    imported, skipped = import_tasks(store, READERS[file_format](f), args.batch_size, args.keep_ids)
+            except (csv.Error, json.JSONDecodeError, KeyError, ValueError) as e:
+                # The records before the unreadable one have been imported
+                print(f"Error reading {args.file}: {e}", file=sys.stderr)
+                sys.exit(1)
+            print(f"Imported {imported} tasks" + (f", skipped {skipped}" if skipped else ""), file=sys.stderr)
+        else:
+            if args.expand:
+                dated_tasks = expanded_tasks(store, args.first, args.last)
+            else:
+                dated_tasks = store.iter_stored(args.first, args.last)
+            with open_stream(args.file, 'w') as f:
+                WRITERS[file_format](f, dated_tasks)
+    finally:
+        store.close()
+        if lock is not None:
+            lock.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+import time
+
+# inotify event flags (see inotify(7)); the directory is watched so atomic
+# replace-by-rename of the tasks file is seen as well as in-place writes
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct("iIII")
+
+# Seconds between stat() checks when inotify is not available
+POLL_INTERVAL = 2.0
+
+
+def file_signature(path):
+    """Return a cheap (inode, size, mtime) signature of a file, or None if missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class TaskFileWatcher:
+    """Call `on_change` whenever the tasks file, or one of its `companions`, changes on disk.
+
+    Companions are other files in the same directory, such as the tasks
+    file's journal. Uses inotify on Linux and falls back to polling the file
+    signatures elsewhere.
+    """
+
+    def __init__(self, path, on_change, poll_interval=POLL_INTERVAL, companions=()):
+        self.path = os.path.abspath(path)
+        self.paths = [self.path] + [os.path.abspath(companion) for companion in companions]
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.signature = self._signature()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def run(self):
+        fd = self._inotify_watch()
+        if fd is None:
+            self._poll()
+        else:
+            self._read_events(fd)
+
+    def _signature(self):
+        return [file_signature(path) for path in self.paths]
+
+    def _check(self):
+        signature = self._signature()
+        if signature != self.signature:
+            self.signature = signature
+            self.on_change()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self._check()
+
+    def _inotify_watch(self):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            directory = os.path.dirname(self.path).encode()
+            if libc.inotify_add_watch(fd, directory, WATCH_MASK) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _read_events(self, fd):
+        names = {os.path.basename(path).encode() for path in self.paths}
+        while True:
+            buffer = os.read(fd, 4096)  # Blocks until something in the directory changes
+            offset, relevant = 0, False
+            while offset < len(buffer):
+                _, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                if buffer[offset:offset + length].rstrip(b'\0') in names:
+                    relevant = True
+                offset += length
+            if relevant:
+                self._check()
@@ -0,0 +1,219 @@
+"""Streaming readers and writers for bulk task import and export.
+
+Readers yield (date_key, task) pairs one at a time and writers consume such
+an iterable, so memory use does not grow with the size of the file. Recurring
+tasks travel as rule tasks (see recurrence) in every format.
+"""
+import csv
+import json
+import re
+import sys
+from datetime import date, datetime, time, timezone
+
+from task_schema import ALL_DAY, display_due_time, due_clock, due_timestamp
+
+FORMATS = ('csv', 'ics', 'jsonl')
+
+CSV_COLUMNS = ('date', 'name', 'category', 'status', 'due_time', 'id', 'series', 'recurrence')
+
+ICS_STATUS = {"Completed": "COMPLETED", "Work in Progress": "IN-PROCESS", "Unfinished": "NEEDS-ACTION"}
+TASK_STATUS = {"COMPLETED": "Completed", "IN-PROCESS": "Work in Progress", "NEEDS-ACTION": "Unfinished"}
+
+ICS_FREQUENCY = {"daily": "DAILY", "weekly": "WEEKLY", "monthly": "MONTHLY"}
+
+
+def guess_format(path):
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension == 'ical':
+        return 'ics'
+    if extension in ('json', 'ndjson'):
+        return 'jsonl'
+    return extension if extension in FORMATS else None
+
+
+# JSON Lines: one {"date": ..., **task} object per line
+
+def read_jsonl(lines):
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            yield record.pop('date'), record
+
+
+def write_jsonl(out, dated_tasks):
+    for date_key, task in dated_tasks:
+        out.write(json.dumps(dict(task, date=date_key), separators=(',', ':')) + '\n')
+
+
+# CSV: fixed columns, with the due time as display text ("9:05 PM") for
+# spreadsheets; a recurrence rule is embedded as JSON
+
+def read_csv(lines):
+    for row in csv.DictReader(lines):
+        task = {key: value for key, value in row.items() if key in CSV_COLUMNS and key != 'date' and value}
+        if 'recurrence' in task:
+            task['recurrence'] = json.loads(task['recurrence'])
+        yield row['date'], task
+
+
+def write_csv(out, dated_tasks):
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for date_key, task in dated_tasks:
+        row = dict(task, date=date_key, due_time=display_due_time(task))
+        if 'recurrence' in row:
+            row['recurrence'] = json.dumps(row['recurrence'], separators=(',', ':'))
+        writer.writerow([row.get(column, '') for column in CSV_COLUMNS])
+
+
+# iCalendar: tasks as VTODOs due at their due time; rules as RRULE + EXDATE.
+# Per-occurrence overrides other than deletion are not exported. A category is
+# written as one CATEGORIES item; the items of an imported one are joined with
+# commas.
+
+def _ics_escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_unescape(text):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), text)
+
+
+def _ics_list(value):
+    """Split a list value such as CATEGORIES on its unescaped commas."""
+    return [_ics_unescape(item) for item in re.findall(r'(?:\\.|[^,\\])+', value)]
+
+
+def _ics_fold(line):
+    """Fold a content line to at most 75 characters per physical line."""
+    parts = [line[:75]]
+    line = line[75:]
+    while line:
+        parts.append(' ' + line[:74])
+        line = line[74:]
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def write_ics(out, dated_tasks):
+    out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//SuperScheduler//EN\r\n")
+    for date_key, task in dated_tasks:
+        due = datetime.combine(date.fromisoformat(date_key), time(*(due_clock(task.get('due')) or ALL_DAY)))
+        lines = [
+            "BEGIN:VTODO",
+            f"UID:{task.get('id') or task.get('series') or date_key}",
+            f"DTSTAMP:{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}",
+            f"DUE:{due:%Y%m%dT%H%M%S}",
+            f"SUMMARY:{_ics_escape(task.get('name', ''))}",
+        ]
+        if task.get('category'):
+            lines.append(f"CATEGORIES:{_ics_escape(task['category'])}")
+        if task.get('status'):
+            lines.append(f"STATUS:{ICS_STATUS.get(task['status'], 'NEEDS-ACTION')}")
+            lines.append(f"X-SUPERSCHEDULER-STATUS:{_ics_escape(task['status'])}")
+
+        rule = task.get('recurrence')
+        if rule:
+            parts = [f"FREQ={ICS_FREQUENCY[rule['frequency']]}", f"INTERVAL={rule.get('interval', 1)}"]
+            if 'end' in rule:
+                parts.append(f"UNTIL={rule['end'].replace('-', '')}T235959")
+            if 'count' in rule:
+                parts.append(f"COUNT={rule['count']}")
+            lines.append("RRULE:" + ';'.join(parts))
+            for original_key, override in rule.get('exceptions', {}).items():
+                if override is None:
+                    lines.append(f"EXDATE:{original_key.replace('-', '')}T{due:%H%M%S}")
+        lines.append("END:VTODO")
+        out.write(''.join(_ics_fold(line) for line in lines))
+    out.write("END:VCALENDAR\r\n")
+
+
+def _ics_lines(lines):
+    """Yield unfolded content lines."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _ics_datetime(value):
+    """Parse a DATE or DATE-TIME value; UTC times are converted to local time."""
+    if len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d"), True
+    parsed = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    if value.endswith('Z'):
+        parsed = parsed.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return parsed, False
+
+
+def _ics_rule(value, exdates):
+    parts = dict(part.split('=', 1) for part in value.split(';') if '=' in part)
+    frequency = {v: k for k, v in ICS_FREQUENCY.items()}.get(parts.get('FREQ'))
+    if frequency is None or any(name.startswith('BY') for name in parts):
+        # Not expressible as one of our rules (e.g. BYDAY=MO,WE,FR); import the first occurrence only
+        print(f"Unsupported RRULE {value!r}; importing its first occurrence only", file=sys.stderr)
+        return None
+    rule = {"frequency": frequency, "interval": int(parts.get('INTERVAL', 1)), "exceptions": {}}
+    if 'UNTIL' in parts:
+        rule['end'] = _ics_datetime(parts['UNTIL'])[0].date().isoformat()
+    if 'COUNT' in parts:
+        rule['count'] = int(parts['COUNT'])
+    for exdate in exdates:
+        rule['exceptions'][exdate.date().isoformat()] = None
+    return rule
+
+
+def read_ics(lines):
+    """Yield tasks from the VTODO and VEVENT components of an iCalendar stream.
+
+    Times with a TZID are taken as local times.
+    """
+    component = None
+    for line in _ics_lines(lines):
+        name, _, value = line.partition(':')
+        name = name.partition(';')[0].upper()  # Parameters (TZID, VALUE=DATE) are not needed
+
+        if name == 'BEGIN' and value.upper() in ('VTODO', 'VEVENT'):
+            component = {'exdates': []}
+        elif component is None:
+            continue
+        elif name == 'END' and value.upper() in ('VTODO', 'VEVENT'):
+            task = _ics_task(component)
+            if task:
+                yield task
+            component = None
+        elif name == 'EXDATE':
+            component['exdates'].extend(_ics_datetime(v)[0] for v in value.split(','))
+        elif name == 'CATEGORIES':
+            component.setdefault('categories', []).extend(_ics_list(value))
+        else:
+            component.setdefault(name, value)
+
+
+def _ics_task(component):
+    when = component.get('DUE') or component.get('DTSTART')
+    if not when:
+        return None
+    due, all_day = _ics_datetime(when)
+    task = {
+        "name": _ics_unescape(component.get('SUMMARY', '')),
+        "category": ','.join(component.get('categories', ())),
+        "status": _ics_unescape(component['X-SUPERSCHEDULER-STATUS']) if 'X-SUPERSCHEDULER-STATUS' in component
+        else TASK_STATUS.get(component.get('STATUS', '').upper(), "Unfinished"),
+        "due": due_timestamp(due.date(), *(ALL_DAY if all_day else (due.hour, due.minute))),
+    }
+    if 'RRULE' in component:
+        rule = _ics_rule(component['RRULE'], component['exdates'])
+        if rule:
+            task['recurrence'] = rule
+    return due.date().isoformat(), task
+
+
+READERS = {'csv': read_csv, 'ics': read_ics, 'jsonl': read_jsonl}
+WRITERS = {'csv': write_csv, 'ics': write_ics, 'jsonl': write_jsonl}
@@ -0,0 +1,142 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+
+class TaskListView(tk.Frame):
+    """A scrollable task list that only formats and inserts the rows in view.
+
+    The full list is kept as task ids; the Listbox holds just the visible
+    window of rows and is patched row by row, so a day with thousands of tasks
+    opens instantly and an edit touches only the rows that actually changed.
+    Selection is tracked by task id, never by Listbox position. With
+    `multiple`, several tasks can be selected with Ctrl- and Shift-click.
+    """
+
+    def __init__(self, parent, format_row, multiple=False):
+        super().__init__(parent)
+        self.format_row = format_row  # format_row(position, task) -> str
+
+        self.ids = []  # Task ids in display order
+        self.tasks = {}  # Task id -> task
+        self.rendered = []  # (task id, text) shown in each Listbox row
+        self.offset = 0  # Position of the first visible row
+        self.visible_rows = 1
+        self.selected_id = None  # The task last selected
+        self.selected_ids = set()  # Every selected task, scrolled out of view or not
+        self.extending = False  # Set by a Ctrl- or Shift-click, which adds to the selection
+
+        self.scroll_y = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox = tk.Listbox(self, selectmode=tk.EXTENDED if multiple else tk.SINGLE, activestyle="none",
+                                  exportselection=False)
+        self.listbox.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+        self.row_height = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+
+        self.listbox.bind("<Configure>", self.on_resize)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        if multiple:
+            self.listbox.bind("<Control-Button-1>", self.extend_selection)
+            self.listbox.bind("<Shift-Button-1>", self.extend_selection)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(1))
+        self.listbox.bind("<Up>", lambda e: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda e: self.move_selection(1))
+
+    def set_tasks(self, tasks):
+        """Show `tasks`, re-rendering only the visible rows whose text changed."""
+        self.ids = [task['id'] for task in tasks]
+        self.tasks = {task['id']: task for task in tasks}
+        if self.selected_id not in self.tasks:
+            self.selected_id = None
+        self.selected_ids &= self.tasks.keys()
+        self.offset = max(0, min(self.offset, len(self.ids) - self.visible_rows))
+        self.render()
+
+    def selected_task(self):
+        return self.tasks.get(self.selected_id)
+
+    def selected_tasks(self):
+        """Return every selected task, in display order."""
+        return [self.tasks[task_id] for task_id in self.ids if task_id in self.selected_ids]
+
+    def render(self):
+        wanted = [
+            (task_id, self.format_row(position, self.tasks[task_id]))
+            for position, task_id in enumerate(self.ids[self.offset:self.offset + self.visible_rows], self.offset)
+        ]
+
+        for row, entry in enumerate(wanted):
+            if row < len(self.rendered) and self.rendered[row] == entry:
+                continue
+            if row < len(self.rendered):
+                self.listbox.delete(row)
+            self.listbox.insert(row, entry[1])
+        if len(self.rendered) > len(wanted):
+            self.listbox.delete(len(wanted), tk.END)
+        self.rendered = wanted
+
+        self.listbox.selection_clear(0, tk.END)
+        for row, (task_id, _) in enumerate(self.rendered):
+            if task_id in self.selected_ids:
+                self.listbox.selection_set(row)
+
+        total = max(len(self.ids), 1)
+        self.scroll_y.set(self.offset / total, min(self.offset + self.visible_rows, total) / total)
+
+    def on_resize(self, event):
+        visible_rows = max(1, event.height // self.row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.offset = max(0, min(self.offset, len(self.ids) - self.visible_rows))
+            self.render()
+
+    def extend_selection(self, event):
+        self.extending = True  # The Listbox's own binding runs next and reports the selection
+
+    def on_select(self, event):
+        selection = [row for row in self.listbox.curselection() if row < len(self.rendered)]
+        if not selection and not self.extending:
+            return  # Nothing picked; keep the current selection
+        selected = {self.rendered[row][0] for row in selection}
+        if self.extending:
+            # Rows out of view keep their selection; those in view are as the Listbox shows them
+            self.selected_ids = (self.selected_ids - {task_id for task_id, _ in self.rendered}) | selected
+        else:
+            self.selected_ids = selected
+        self.extending = False
+        if selection and (len(selection) == 1 or self.selected_id not in selected):
+            self.selected_id = self.rendered[selection[0]][0]
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.ids) - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units"|"pages")."""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.ids)))
+        elif args[0] == "scroll":
+            rows = int(args[1]) * (self.visible_rows if args[2] == "pages" else 1)
+            self.scroll(rows)
+
+    def move_selection(self, step):
+        if not self.ids:
+            return "break"
+        position = self.ids.index(self.selected_id) + step if self.selected_id in self.tasks else 0
+        position = max(0, min(position, len(self.ids) - 1))
+        self.selected_id = self.ids[position]
+        self.selected_ids = {self.selected_id}
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.visible_rows:
+            self.offset = position - self.visible_rows + 1
+        self.render()
+        return "break"
@@ -0,0 +1,143 @@
+"""A compact, read-only task record for the store's in-memory copy.
+
+A plain dict per task costs a hash table per task, and every task carries
+its own copy of the same few category and status strings. Task keeps the
+common fields in slots, shares one string object per distinct category and
+status, and puts anything else (recurrence rules, due_text, ...) in a small
+`extra` dict only when present.
+
+Task is a read-only Mapping, so code written for task dicts keeps working:
+task['name'], task.get('status'), 'id' in task, dict(task, status=...) and
+iteration all behave as they do for a dict, and the common fields can also
+be read as attributes (task.name). To change a task, build a new dict with
+dict(task, ...); the store compacts whatever it is given.
+"""
+from collections.abc import Mapping
+
+# Fields kept in slots, in the order they are listed
+FIELDS = ('name', 'category', 'status', 'due', 'id')
+
+# Fields whose values repeat across tasks and are shared instead of copied
+SHARED_FIELDS = ('category', 'status')
+
+_FIELD_SET = frozenset(FIELDS)
+_MISSING = object()
+
+# One object per distinct category or status value
+_shared_values = {}
+
+
+def _shared(value):
+    try:
+        return _shared_values.setdefault(value, value)
+    except TypeError:
+        return value  # Unhashable; nothing to share
+
+
+class Task(Mapping):
+    __slots__ = FIELDS + ('extra',)
+
+    def __init__(self, fields):
+        if fields.keys() == _FIELD_SET:
+            # The usual task: exactly the common fields
+            _set_name(self, fields['name'])
+            _set_category(self, _shared(fields['category']))
+            _set_status(self, _shared(fields['status']))
+            _set_due(self, fields['due'])
+            _set_id(self, fields['id'])
+            _set_extra(self, None)
+            return
+        extra = None
+        for key, value in fields.items():
+            setter = _SETTERS.get(key)
+            if setter is not None:
+                setter(self, _shared(value) if key in SHARED_FIELDS else value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        _set_extra(self, extra)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Task is read-only; build a changed copy with dict(task, ...)")
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for key in FIELDS if hasattr(self, key)) + len(self.extra or ())
+
+    def to_dict(self):
+        try:
+            fields = {'name': self.name, 'category': self.category, 'status': self.status,
+                      'due': self.due, 'id': self.id}
+        except AttributeError:
+            fields = {key: getattr(self, key) for key in FIELDS if hasattr(self, key)}
+        if self.extra is not None:
+            fields.update(self.extra)
+        return fields
+
+    def __eq__(self, other):
+        if type(other) is Task:
+            return self.extra == other.extra and all(
+                getattr(self, key, _MISSING) == getattr(other, key, _MISSING) for key in FIELDS)
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return Task, (self.to_dict(),)
+
+
+# Slot setters that bypass the read-only __setattr__ (faster than object.__setattr__ too)
+_SETTERS = {key: getattr(Task, key).__set__ for key in FIELDS}
+_set_name, _set_category, _set_status, _set_due, _set_id = (_SETTERS[key] for key in FIELDS)
+_set_extra = Task.extra.__set__
+
+
+def compact(task):
+    return task if type(task) is Task else Task(task)
+
+
+def compact_list(tasks):
+    """Return `tasks` with every item a Task (the same list if they already are)."""
+    if all(type(task) is Task for task in tasks):
+        return tasks
+    return [compact(task) for task in tasks]
+
+
+def to_json(value):
+    """`default` hook for json.dump, so Task records serialize as objects."""
+    if type(value) is Task:
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
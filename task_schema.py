@@ -0,0 +1,110 @@
+"""The stored task format, its version and the migration from older versions.
+
+Version 1 tasks kept their due time as display text ("11:30 PM") and had no id.
+Version 2 tasks carry an `id` and `due`, an integer Unix timestamp of the due
+time (local wall clock) on the task's date. Display text is derived from `due`
+only when it is shown, so nothing on a hot path parses time strings. A
+version 1 due time that cannot be parsed is kept as `due_text` for display.
+
+The version is stored under SCHEMA_KEY at the top of tasks.json and as the
+SQLite user_version; tasks are upgraded as they are read.
+"""
+import functools
+import re
+from datetime import date, datetime, time
+
+SCHEMA_VERSION = 2
+
+# Top-level key of tasks.json holding the schema version; every other key is a date
+SCHEMA_KEY = 'schema_version'
+
+# Due time given to tasks that only have a date (e.g. all-day calendar entries)
+ALL_DAY = (23, 59)
+
+_DUE_TIME = re.compile(r'\s*(\d{1,2}):(\d{2})\s*([AaPp])\.?[Mm]\.?\s*')
+
+
+def parse_due_time(due_time):
+    """Return (hour, minute) in 24-hour time for a "9:05 PM" style string; raises ValueError."""
+    match = _DUE_TIME.fullmatch(due_time or '')
+    if not match:
+        raise ValueError(f"Invalid due time {due_time!r}")
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if not 1 <= hour <= 12 or minute > 59:
+        raise ValueError(f"Invalid due time {due_time!r}")
+    return hour % 12 + (12 if match.group(3) in 'Pp' else 0), minute
+
+
+def format_due_time(hour, minute):
+    """Format a 24-hour time the way the task dialogs show it, e.g. "9:05 PM"."""
+    return f"{hour % 12 or 12}:{minute:02d} {'PM' if hour >= 12 else 'AM'}"
+
+
+def due_timestamp(day, hour, minute):
+    """Return the timestamp of hour:minute local time on `day` (a date or "YYYY-MM-DD" key)."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return _local_timestamp(day, hour, minute)
+
+
+# Expanding recurring tasks asks for the same few times of day on the same dates over and over
+@functools.lru_cache(maxsize=1 << 16)
+def _local_timestamp(day, hour, minute):
+    return int(datetime.combine(day, time(hour, minute)).timestamp())
+
+
+def due_clock(due):
+    """Return the (hour, minute) of a due timestamp, or None."""
+    if due is None:
+        return None
+    moment = datetime.fromtimestamp(due)
+    return moment.hour, moment.minute
+
+
+def display_due_time(task):
+    clock = due_clock(task.get('due'))
+    if clock is None:
+        return task.get('due_text', 'No Time')
+    return format_due_time(*clock)
+
+
+def on_date(task, date_key):
+    """Return `task` with its due time moved to the same time of day on `date_key`."""
+    clock = due_clock(task.get('due'))
+    if clock is None:
+        return task
+    return dict(task, due=due_timestamp(date_key, *clock))
+
+
+def _upgrade_due(date_key, fields):
+    """Replace a version 1 `due_time` in a dict of task fields with `due`, in place."""
+    due_time = fields.pop('due_time', None)
+    if due_time is None:
+        return
+    try:
+        fields['due'] = due_timestamp(date_key, *parse_due_time(due_time))
+    except ValueError:
+        fields['due_text'] = due_time
+
+
+def needs_upgrade(task):
+    if 'id' not in task or 'due_time' in task:
+        return True
+    rule = task.get('recurrence')
+    return bool(rule) and any(override and 'due_time' in override for override in rule.get('exceptions', {}).values())
+
+
+def upgrade_task(date_key, task):
+    """Return a copy of a task in the current schema (except for its id, which the store assigns)."""
+    task = dict(task)
+    _upgrade_due(date_key, task)
+    rule = task.get('recurrence')
+    if rule and rule.get('exceptions'):
+        exceptions = {}
+        for original_key, override in rule['exceptions'].items():
+            if override and 'due_time' in override:
+                override = dict(override)
+                _upgrade_due(original_key, override)
+            exceptions[original_key] = override
+        task['recurrence'] = dict(rule, exceptions=exceptions)
+    return task
@@ -0,0 +1,198 @@
+import bisect
+import re
+import threading
+from collections import namedtuple
+
+WORD = re.compile(r'\w+')
+
+# Fields whose words are searched
+SEARCHED_FIELDS = ('name', 'category', 'status')
+
+# Every match of a search is counted and its date reported; only the first `limit` are returned
+# `rules` lists the matching recurring rules that start by the end of the range, as (start_key, rule), so
+# the caller can find their occurrences on the dates it shows
+SearchResults = namedtuple('SearchResults', 'total dates matches rules')  # matches: [(date_key, task)]
+
+
+def words(text):
+    return set(WORD.findall(text.lower()))
+
+
+def task_words(task):
+    return words(' '.join(str(task.get(field) or '') for field in SEARCHED_FIELDS))
+
+
+def category_key(category):
+    """Categories are typed freely, so they are matched regardless of case."""
+    return category.casefold() if isinstance(category, str) else category
+
+
+def _insert(postings, key, task_id, sorted_keys=None):
+    ids = postings.get(key)
+    if ids is None:
+        ids = postings[key] = set()
+        if sorted_keys is not None:
+            bisect.insort(sorted_keys, key)
+    ids.add(task_id)
+
+
+def _discard(postings, key, task_id, sorted_keys=None):
+    ids = postings.get(key)
+    if ids is None:
+        return
+    ids.discard(task_id)
+    if not ids:
+        del postings[key]
+        if sorted_keys is not None:
+            del sorted_keys[bisect.bisect_left(sorted_keys, key)]
+
+
+class TaskSearchIndex:
+    """Inverted index over every stored task, for search and filtering.
+
+    Every word of a task's name, category and status maps to the ids of the
+    tasks containing it, and every category, status and date maps to its task
+    ids. Words and dates are also kept sorted, so a word prefix or a date
+    range costs two binary searches. A query intersects the smallest sets
+    first, so its cost depends on the number of matches, not on the number
+    of tasks.
+
+    Recurring tasks are indexed once, as their rule on its start date.
+
+    build() reads every stored task and may run on any thread. Changes
+    reported through update() while it runs are queued and applied once it
+    finishes. Until then `ready` is unset and search() returns None.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = {}  # Changes reported during the build; None once built
+        self._entries = {}  # task id -> (date_key, task, words)
+        self._words = {}  # word -> task ids
+        self._categories = {}  # category_key(category) -> task ids
+        self._statuses = {}  # status -> task ids
+        self._date_ids = {}  # date_key -> task ids
+        self._rule_ids = set()  # Ids of the recurring rules
+        self._sorted_words = None  # Sorted once the build finishes
+        self._dates = None
+
+    def build(self, dated_tasks):
+        """Index (date_key, task) pairs, e.g. from TaskStore.iter_stored()."""
+        for date_key, task in dated_tasks:
+            task_id = task.get('id')
+            if task_id is not None:
+                self._add(task_id, date_key, task)
+        with self._lock:
+            self._sorted_words = sorted(self._words)
+            self._dates = sorted(self._date_ids)
+            pending, self._pending = self._pending, None
+            for date_key, tasks in pending.items():
+                self._index_date(date_key, tasks)
+            self.ready.set()
+
+    def update(self, changed):
+        """Re-index the dates in {date_key: stored tasks} after they changed."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.update(changed)
+                return
+            for date_key, tasks in changed.items():
+                self._index_date(date_key, tasks)
+
+    def _index_date(self, date_key, tasks):
+        indexed = set()
+        for task in tasks:
+            task_id = task.get('id')
+            if task_id is None:
+                continue
+            indexed.add(task_id)
+            entry = self._entries.get(task_id)
+            if entry is not None:
+                if entry[1] is task and entry[0] == date_key:
+                    continue  # Task lists are copied on write, so an unchanged task is the same object
+                self._remove(task_id)  # Edited, or moved here from another date
+            self._add(task_id, date_key, task)
+        for task_id in self._date_ids.get(date_key, set()) - indexed:
+            self._remove(task_id)
+
+    def _add(self, task_id, date_key, task):
+        entry_words = task_words(task)
+        self._entries[task_id] = (date_key, task, entry_words)
+        for word in entry_words:
+            _insert(self._words, word, task_id, self._sorted_words)
+        _insert(self._categories, category_key(task.get('category')), task_id)
+        _insert(self._statuses, task.get('status'), task_id)
+        _insert(self._date_ids, date_key, task_id, self._dates)
+        if 'recurrence' in task:
+            self._rule_ids.add(task_id)
+
+    def _remove(self, task_id):
+        date_key, task, entry_words = self._entries.pop(task_id)
+        for word in entry_words:
+            _discard(self._words, word, task_id, self._sorted_words)
+        _discard(self._categories, category_key(task.get('category')), task_id)
+        _discard(self._statuses, task.get('status'), task_id)
+        _discard(self._date_ids, date_key, task_id, self._dates)
+        self._rule_ids.discard(task_id)
+
+    def _with_prefix(self, prefix):
+        """Return the ids of the tasks with a word starting with `prefix`."""
+        exact = self._words.get(prefix, set())
+        start = bisect.bisect_right(self._sorted_words, prefix)
+        end = bisect.bisect_left(self._sorted_words, prefix + '\uffff', start)
+        if start == end:
+            return exact
+        return exact.union(*(self._words[word] for word in self._sorted_words[start:end]))
+
+    def search(self, text='', category=None, status=None, first_key='', last_key='9999-12-31', limit=100):
+        """Find the tasks with a word starting with each word of `text`, matching every given filter.
+
+        Return SearchResults with the number of matches, the set of their
+        dates, the first `limit` matches in date and due time order and the
+        matching rules, or None while the index is still being built.
+        """
+        with self._lock:
+            if self._pending is not None:
+                return None
+
+            sets = [self._with_prefix(word) for word in words(text)]
+            if category:
+                sets.append(self._categories.get(category_key(category), set()))
+            if status:
+                sets.append(self._statuses.get(status, set()))
+            sets.sort(key=len)
+            candidates = sets[0].intersection(*sets[1:]) if len(sets) > 1 else (sets[0] if sets else None)
+
+            dates = self._dates[bisect.bisect_left(self._dates, first_key):bisect.bisect_right(self._dates, last_key)]
+            if candidates is not None and len(candidates) < len(dates):
+                # Few matches: look each one up instead of walking the dates
+                by_date = {}
+                for task_id in candidates:
+                    date_key = self._entries[task_id][0]
+                    if first_key <= date_key <= last_key:
+                        by_date.setdefault(date_key, set()).add(task_id)
+                dates = sorted(by_date)
+            else:
+                by_date = None
+
+            total, matched_dates, matches = 0, set(), []
+            for date_key in dates:
+                if by_date is not None:
+                    ids = by_date[date_key]
+                else:
+                    ids = self._date_ids[date_key]
+                    if candidates is not None:
+                        ids = ids & candidates
+                        if not ids:
+                            continue
+                total += len(ids)
+                matched_dates.add(date_key)
+                if len(matches) < limit:
+                    tasks = sorted((self._entries[task_id][1] for task_id in ids),
+                                   key=lambda task: (task.get('due') or 0, task.get('name') or ''))
+                    matches.extend((date_key, task) for task in tasks[:limit - len(matches)])
+
+            rule_ids = self._rule_ids if candidates is None else self._rule_ids & candidates
+            rules = [self._entries[task_id][:2] for task_id in rule_ids if self._entries[task_id][0] <= last_key]
+            return SearchResults(total, matched_dates, matches, rules)
@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+
+import metrics
+from task_file_watcher import file_signature
+from task_model import to_json
+from task_schema import SCHEMA_KEY, SCHEMA_VERSION
+
+# Fold the journal into a fresh snapshot once it grows past this many bytes
+COMPACT_AFTER_BYTES = 1 << 20
+
+
+def write_temp(path, data, indent=4):
+    """Durably write `data` as JSON next to `path` and return the temporary file's path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent, default=to_json)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def write_atomically(path, data, indent=4):
+    """Write `data` as JSON so that `path` always holds either the old or the new content."""
+    os.replace(write_temp(path, data, indent), path)
+    fsync_directory(path)
+
+
+def with_schema_version(tasks):
+    """Return the tasks.json content for {date_key: tasks}: the dates plus the schema version."""
+    return {SCHEMA_KEY: SCHEMA_VERSION, **tasks}
+
+
+def fsync_directory(path):
+    """Make a rename inside the directory of `path` durable (a no-op where unsupported)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JsonFileStorage:
+    """Keep every task in tasks.json, rewriting the whole file on each save."""
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = None  # Signature of the file as we last read or wrote it
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            signature = file_signature(self.path)
+            data = {}
+            if signature is not None:
+                with open(self.path, 'r') as f, metrics.timer('storage.json_decode'):
+                    data = json.load(f)
+            if data.pop(SCHEMA_KEY, 1) > SCHEMA_VERSION:
+                print(f"{self.path} was written by a newer version; unknown fields may be lost")
+            self.signature = signature
+            return data
+
+    def changed_on_disk(self):
+        """Tell whether the file was changed by someone other than us."""
+        with self._lock:
+            return file_signature(self.path) != self.signature
+
+    def write(self, tasks, changed):
+        with self._lock:
+            write_atomically(self.path, with_schema_version(tasks))
+            self.signature = file_signature(self.path)
+
+    def close(self):
+        pass
+
+
+class JournalStorage(JsonFileStorage):
+    """Append one compact record per changed date instead of rewriting tasks.json.
+
+    Each record replaces the whole task list of one date, so replaying a record
+    twice is harmless. That makes compaction crash-safe: the journal is first
+    renamed aside, the snapshot is rewritten atomically from the state at that
+    instant, and only then is the renamed journal deleted. Startup replays the
+    snapshot, any renamed journal left by an interrupted compaction, and the
+    live journal, in that order. A trailing partial record (a crash during an
+    append that was never acknowledged) is ignored.
+
+    Only the `owner`, the process holding the store lock, repairs the files:
+    a process that merely reads them alongside it (owner=False) leaves a
+    partial record, which may be an append in progress, and never compacts.
+    changed_on_disk() also reports records appended by other processes, so
+    such a reader can follow the owner's edits; load_appended() reads just
+    those records, and a full load() is needed only after a compaction.
+    """
+
+    def __init__(self, path, compact_after=COMPACT_AFTER_BYTES, owner=True):
+        super().__init__(path)
+        self.journal_path = f"{path}.journal"
+        self.rotated_path = f"{path}.journal.1"
+        self.compact_after = compact_after
+        self.owner = owner
+        # Inode of the journal we follow and how many of its bytes our data reflects; records
+        # appended after that offset, ours included, are still to be read by load_appended
+        self._journal_id = None
+        self._offset = 0
+        self._journal = None
+        self._compactor = None
+
+    def load(self):
+        data = super().load()
+        with self._lock, metrics.timer('storage.journal_replay'):
+            self._open_journal()
+            self._replay(self.rotated_path, data)
+            self._journal_id, self._offset = self._replay(self.journal_path, data)
+
+        if self.owner and os.path.exists(self.rotated_path):
+            # A compaction was interrupted; finish folding before journaling again
+            self._compact(dict(data))
+        return data
+
+    def load_appended(self):
+        """Return {date_key: tasks} of the journal records appended since they were last read.
+
+        Return None if a full load() is needed instead, because a compaction
+        replaced tasks.json or rotated the journal since then.
+        """
+        with self._lock:
+            if file_signature(self.path) != self.signature:
+                return None
+            appended = {}
+            journal_id, offset = self._replay(self.journal_path, appended, self._offset)
+            if journal_id != self._journal_id:
+                return None
+            self._offset = offset
+            return appended
+
+    def _replay(self, journal_path, data, start=0):
+        """Apply the records from byte `start` on to `data`; return (inode, offset after the last whole record)."""
+        try:
+            with open(journal_path, 'rb+') as f:
+                f.seek(start)
+                good = start
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        record = None
+                    if record is None or not line.endswith(b'\n'):
+                        # Torn final append; it was never acknowledged, so drop it
+                        # before new records are appended after it
+                        if self.owner:
+                            f.truncate(good)
+                        break
+                    data[record['d']] = record['t']
+                    good += len(line)
+                return os.fstat(f.fileno()).st_ino, good
+        except FileNotFoundError:
+            return None, 0
+
+    def changed_on_disk(self):
+        with self._lock:
+            journal = file_signature(self.journal_path) or (None, 0)
+            return file_signature(self.path) != self.signature or journal[:2] != (self._journal_id, self._offset)
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'ab')
+
+    def write(self, tasks, changed):
+        lines = ''.join(
+            json.dumps({'d': date_key, 't': task_list}, separators=(',', ':'), default=to_json) + '\n'
+            for date_key, task_list in changed.items()
+        ).encode()
+        with self._lock:
+            if not self.owner and self._journal is not None:
+                # The owner may have rotated the journal since it was opened
+                self._journal.close()
+                self._journal = None
+            self._open_journal()
+            self._journal.write(lines)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())  # The edit is acknowledged once this returns
+            end = self._journal.tell()
+            if os.fstat(self._journal.fileno()).st_ino == self._journal_id and end - len(lines) == self._offset:
+                self._offset = end  # Nothing was appended by others since we last read
+
+            # A leftover rotated journal means the previous compaction has not finished
+            if self.owner and self._journal.tell() >= self.compact_after and not os.path.exists(self.rotated_path):
+                self._rotate()
+                # Task lists are never modified in place, so a shallow copy is a stable snapshot
+                snapshot = dict(tasks)
+                self._compactor = threading.Thread(target=self._compact, args=(snapshot,), daemon=True)
+                self._compactor.start()
+
+    def _rotate(self):
+        caught_up = self._journal.tell() == self._offset
+        self._journal.close()
+        self._journal = None
+        os.replace(self.journal_path, self.rotated_path)
+        fsync_directory(self.journal_path)
+        self._open_journal()
+        # Records of others not read yet are now in the rotated journal; only a full load picks them up
+        self._journal_id = os.fstat(self._journal.fileno()).st_ino if caught_up else None
+        self._offset = 0
+
+    def _compact(self, snapshot):
+        """Fold everything journaled before the last rotation into tasks.json."""
+        tmp_path = write_temp(self.path, with_schema_version(snapshot))
+        with self._lock:
+            os.replace(tmp_path, self.path)
+            fsync_directory(self.path)
+            self.signature = file_signature(self.path)
+            try:
+                os.remove(self.rotated_path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
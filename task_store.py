@@ -0,0 +1,760 @@
+import collections
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+import metrics
+import recurrence
+import task_schema
+import task_model
+from date_index import DateIndex, merge_summaries, summarize
+from due_index import DueIndex, due_key, is_pending
+from process_lock import ProcessLock
+from task_search import TaskSearchIndex
+from undo_log import UNDO_DEPTH, UndoLog, diff, revert
+
+from sharded_storage import MANIFEST_FILE, ShardedStorage
+from sqlite_storage import SqliteStorage
+from task_storage import JsonFileStorage, JournalStorage
+from task_writer import BackgroundWriter, WRITE_DELAY
+
+# File to store tasks
+TASKS_FILE = 'tasks.json'
+
+# Database used instead of TASKS_FILE once it has been migrated (see sqlite_storage)
+TASKS_DB = 'tasks.db'
+
+# Directory of per-month files used instead of TASKS_FILE once it has been split (see sharded_storage)
+TASKS_DIR = 'tasks'
+
+# Held by the one process that may edit the tasks: the calendar, or a task_cli import
+STORE_LOCK_FILE = 'tasks.lock'
+
+# How far ahead recurring tasks are expanded for an agenda page that runs out of other tasks
+AGENDA_HORIZON = timedelta(days=366)
+
+
+def new_task_id():
+    return uuid.uuid4().hex
+
+
+def migrated_task_id(date_key, position, task):
+    """Return the id given to a stored task that has none.
+
+    It is derived from the task as stored, so every process that upgrades
+    the same data, whether or not it writes it back, picks the same id.
+    """
+    stored = json.dumps(task, sort_keys=True, default=str)
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"superscheduler:{date_key}:{position}:{stored}").hex
+
+
+def open_task_store(write_delay=WRITE_DELAY, owner=True, undo_depth=UNDO_DEPTH):
+    """Open the app's store: SQLite or month shards if tasks.json was migrated, otherwise journaled JSON.
+
+    Pass write_delay=None to write every change synchronously, and
+    owner=False unless this process holds the store lock (see lock_task_store).
+    """
+    options = dict(write_delay=write_delay, undo_depth=undo_depth, owner=owner)
+    if os.path.exists(TASKS_DB):
+        return TaskStore(storage=SqliteStorage(TASKS_DB), **options)
+    if os.path.exists(os.path.join(TASKS_DIR, MANIFEST_FILE)):
+        return TaskStore(storage=ShardedStorage(TASKS_DIR), **options)
+    # Edits are appended to a journal that is folded into tasks.json in the background
+    return TaskStore(storage=JournalStorage(TASKS_FILE, owner=owner), **options)
+
+
+def lock_task_store():
+    """Take the store lock; return the held ProcessLock, or None if another process is editing the tasks.
+
+    Each process keeps its own copy of the tasks in memory and appends its
+    changes to the same journal, so two editing at once would lose changes.
+    """
+    lock = ProcessLock(STORE_LOCK_FILE)
+    return lock if lock.acquire() else None
+
+
+class TaskStore:
+    """The single in-memory copy of the tasks, shared by the GUI and the notifier.
+
+    Tasks are kept as {date_key: [task, ...]}. Mutations never modify a task list
+    in place: the changed date gets a fresh list, so a list handed out by
+    `get_tasks` or `snapshot` is a stable snapshot that other threads may read
+    without holding the lock. Listeners are called with {date_key: tasks} for
+    every date that changed, or with None when a recurring rule changed (then
+    any date may have changed), once the lock has been released. Persistence
+    is delegated to a storage backend from task_storage. A lazy backend
+    (sqlite_storage, sharded_storage) is not loaded up front; dates are then
+    read on demand and kept in `_tasks` as a cache.
+
+    With a `write_delay` the storage is written by a BackgroundWriter instead of
+    on the calling thread; write errors then go to `on_write_error(exception)`.
+
+    A recurring task is stored once, as a rule on its start date (see
+    recurrence). Queries return its occurrences expanded lazily for the dates
+    asked for, and changes to a single occurrence become sparse exceptions.
+
+    Every task carries a stable `id` and a `due` timestamp (see task_schema).
+    Tasks saved in an older schema are upgraded the first time they are read,
+    and the dates involved are written back, unless the store was opened with
+    owner=False: another process then holds the store lock and writes them
+    back, and this one upgrades in memory only. Stored tasks are kept as
+    compact read-only task_model.Task records; callers may pass plain dicts.
+    """
+
+    def __init__(self, path=TASKS_FILE, storage=None, write_delay=None, undo_depth=UNDO_DEPTH, owner=True):
+        self.storage = storage if storage is not None else JsonFileStorage(path)
+        self.path = self.storage.path
+        self.lazy = getattr(self.storage, 'lazy', False)
+        self.owner = owner
+        self.on_write_error = None
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._announcements = collections.deque()  # Changes not yet passed to the listeners, see _announce
+        self._announcing = threading.Lock()  # Held by the thread calling the listeners
+        with metrics.timer('store.load'):
+            self._tasks = {} if self.lazy else self.storage.load()
+        migrated = {} if self.lazy else self._upgrade(self._tasks)
+        # Sorted index of the dates with (non-recurring) tasks; lazy stores query storage instead
+        self._date_index = DateIndex() if self.lazy else DateIndex(
+            {key: self._plain(tasks) for key, tasks in self._tasks.items()})
+
+        self.history = UndoLog(undo_depth)  # Commits made through this store, see undo
+        self._search_index = None  # Built on first use, see search_index
+        self._due_index = None  # Built on first use, see due_index
+        self._live_indexes = []  # Indexes built so far, updated with every change
+        self._rules = {}  # series id -> (start date key, rule task)
+        self._rule_dates = {}  # date key -> series ids starting on that date
+        self.writer = None
+        if write_delay is not None:
+            self.writer = BackgroundWriter(self.storage, self.snapshot_cache, self._write_failed, delay=write_delay)
+
+        if self.lazy:
+            self._load_rules()
+        else:
+            for date_key, tasks in self._tasks.items():
+                self._index_rules(date_key, tasks)
+            self._write_back(migrated)
+
+    def _load_rules(self):
+        """Index every rule of a lazy storage; they are kept cached, unlike the other tasks."""
+        for date_key, tasks in self.storage.load_recurring().items():
+            if any(task_schema.needs_upgrade(task) for task in tasks):
+                tasks = self._stored(date_key)  # Upgraded and written back with the rest of the date
+            self._index_rules(date_key, task_model.compact_list(tasks))
+
+    def _write_failed(self, error):
+        if self.on_write_error:
+            self.on_write_error(error)
+        else:
+            print(f"Failed to save tasks: {error}")
+
+    def flush(self):
+        """Wait until every change made so far has been written."""
+        if self.writer:
+            self.writer.flush()
+
+    def close(self):
+        """Write pending changes and release the storage backend."""
+        if self.writer:
+            self.writer.close()
+        with self._lock:
+            self.storage.close()
+
+    def subscribe(self, listener):
+        """Register `listener(changed)` to be called after every change."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _index_rules(self, date_key, tasks):
+        """Re-index the rules stored on one date; return True if any were added or removed."""
+        old = self._rule_dates.pop(date_key, set())
+        for series in old:
+            # A rule that moved to another date already indexed there is kept
+            if self._rules.get(series, (None,))[0] == date_key:
+                del self._rules[series]
+        new = set()
+        for task in tasks:
+            if recurrence.is_rule(task):
+                series = task['series']
+                previous_key = self._rules.get(series, (date_key,))[0]
+                if previous_key != date_key and previous_key in self._rule_dates:
+                    # Moved here from a date that has not been re-indexed yet
+                    self._rule_dates[previous_key].discard(series)
+                    if not self._rule_dates[previous_key]:
+                        del self._rule_dates[previous_key]
+                self._rules[series] = (date_key, task)
+                new.add(series)
+        if new:
+            self._rule_dates[date_key] = new
+        return bool(old or new)
+
+    @staticmethod
+    def _plain(tasks):
+        """Return the tasks of a stored list that are not recurring rules."""
+        return [task for task in tasks if not recurrence.is_rule(task)]
+
+    def _reindex(self, changed):
+        """Update the rule, date and search indexes; return True if any rules were added or removed."""
+        rules_changed = False
+        for date_key, tasks in changed.items():
+            rules_changed |= self._index_rules(date_key, tasks)
+            if not self.lazy:
+                self._date_index.update(date_key, self._plain(tasks))
+        for index in self._live_indexes:
+            index.update(changed)
+        return rules_changed
+
+    def _notify(self, changed_keys, rules_changed):
+        """Queue a change for the listeners; _announce passes it on once the lock is released."""
+        if rules_changed:
+            changed = None
+        else:
+            changed = {key: self._visible(key) for key in changed_keys}
+        self._announcements.append(changed)
+
+    @contextlib.contextmanager
+    def _mutating(self):
+        """Hold the lock for a mutation, then announce its changes with the lock released.
+
+        Listeners may wait on another thread (a Tk listener posting to the Tk
+        thread does), and that thread may be waiting for the lock.
+        """
+        with self._lock:
+            yield
+        self._announce()
+
+    def _announce(self):
+        """Call the listeners with the queued changes, in commit order, on one thread at a time."""
+        while self._announcements:
+            if not self._announcing.acquire(blocking=False):
+                return  # The thread announcing now also delivers ours
+            try:
+                while True:
+                    with self._lock:
+                        if not self._announcements:
+                            break
+                        changed = self._announcements.popleft()
+                    for listener in list(self._listeners):
+                        listener(changed)
+            finally:
+                self._announcing.release()
+            # Loop in case a change was queued after the last check but found us still announcing
+
+    @staticmethod
+    def _upgrade_task(date_key, task, task_id=None):
+        task = task_schema.upgrade_task(date_key, task)
+        if 'id' not in task:
+            task['id'] = task_id or new_task_id()
+        return task
+
+    @classmethod
+    def _upgrade(cls, tasks_by_date):
+        """Bring every task up to the current schema and compact it, in place.
+
+        Return {date_key: tasks} of the dates whose schema was upgraded.
+        """
+        migrated = {}
+        for date_key, tasks in tasks_by_date.items():
+            upgrade = any(task_schema.needs_upgrade(task) for task in tasks)
+            if upgrade:
+                tasks = [cls._upgrade_task(date_key, task, migrated_task_id(date_key, position, task))
+                         if task_schema.needs_upgrade(task) else task
+                         for position, task in enumerate(tasks)]
+            tasks_by_date[date_key] = tasks = task_model.compact_list(tasks)
+            if upgrade:
+                migrated[date_key] = tasks
+        return migrated
+
+    def _adopt(self, loaded):
+        """Upgrade tasks read from a lazy storage, caching and writing back any that needed it."""
+        migrated = self._upgrade(loaded)
+        if migrated:
+            self._tasks.update(migrated)
+            for index in self._live_indexes:
+                index.update(migrated)  # The upgrade gave tasks ids
+            self._write_back(migrated)
+        return loaded
+
+    def _write_back(self, migrated):
+        """Save dates upgraded to the current schema; only the owner of the store does."""
+        if migrated and self.owner:
+            self._persist(migrated)
+
+    def _persist(self, changed):
+        if self.writer:
+            self.writer.submit(changed)
+        else:
+            with metrics.timer('storage.write'):
+                self.storage.write(self._tasks, changed)
+
+    def _commit(self, changed, log=None):
+        """Install new task lists for the changed dates, persist and notify listeners.
+
+        The commit is logged for undo, or with `log`, passed to log(step) instead.
+        If indexing the new lists fails, the old ones are put back and nothing
+        is logged, saved or announced.
+        """
+        metrics.count('store.commits')
+        changed = {key: task_model.compact_list(tasks) for key, tasks in changed.items()}
+        with self._lock:
+            step = {}
+            for key, tasks in changed.items():
+                change = diff(self._stored(key), tasks)
+                if change is not None:
+                    step[key] = change
+            previous = {key: self._tasks.get(key) for key in changed}
+            self._tasks.update(changed)
+            try:
+                rules_changed = self._reindex(changed)
+            except Exception:
+                for key, tasks in previous.items():
+                    if tasks is None:
+                        del self._tasks[key]
+                    else:
+                        self._tasks[key] = tasks
+                self._reindex({key: tasks or [] for key, tasks in previous.items()})
+                raise
+            if step:
+                (log or self.history.record)(step)
+            self._persist(changed)
+            self._notify(changed, rules_changed)
+
+    # Queries
+
+    def _stored(self, date_key):
+        """Return the task list stored for a date, including rule tasks."""
+        tasks = self._tasks.get(date_key)
+        if tasks is None:
+            if not self.lazy:
+                return []
+            with self._lock:
+                tasks = self._adopt({date_key: self.storage.load_date(date_key)})[date_key]
+                self._tasks[date_key] = tasks
+        return tasks
+
+    def _occurrences(self, first_key, last_key):
+        """Return {date_key: occurrences} of every recurring rule in [first_key, last_key]."""
+        occurrences = {}
+        for start_key, task in list(self._rules.values()):
+            if start_key > last_key:
+                continue
+            for date_key, occurrence in recurrence.expand(start_key, task, first_key, last_key):
+                occurrences.setdefault(date_key, []).append(occurrence)
+        return occurrences
+
+    def _visible(self, date_key):
+        tasks = self._plain(self._stored(date_key))
+        if self._rules:
+            tasks += self._occurrences(date_key, date_key).get(date_key, [])
+        return tasks
+
+    def get_tasks(self, date_key):
+        """Return the tasks on a date, with recurring occurrences expanded (do not modify it)."""
+        if not self._rules:
+            return self._stored(date_key)
+        with self._lock:
+            return self._visible(date_key)
+
+    def has_tasks(self, date_key):
+        return len(self.get_tasks(date_key)) > 0
+
+    def tasks_between(self, first_key, last_key):
+        """Return {date_key: tasks} for the dates in [first_key, last_key] that have tasks."""
+        with self._lock:
+            if self.lazy:
+                cached = {key: tasks for key, tasks in self._tasks.items() if first_key <= key <= last_key}
+                stored = self._overlay(self._adopt(self.storage.load_range(first_key, last_key)), cached)
+                tasks_by_date = {key: self._plain(tasks) for key, tasks in stored.items()}
+            else:
+                tasks_by_date = {key: self._plain(self._tasks[key])
+                                 for key in self._date_index.keys_between(first_key, last_key)}
+
+            for date_key, occurrences in self._occurrences(first_key, last_key).items():
+                tasks_by_date[date_key] = tasks_by_date.get(date_key, []) + occurrences
+            return {key: tasks for key, tasks in tasks_by_date.items() if tasks}
+
+    def day_summaries(self, first_key, last_key):
+        """Return {date_key: DaySummary} for the dates in [first_key, last_key] that have tasks."""
+        with self._lock:
+            if self.lazy:
+                return {key: summarize(key, tasks) for key, tasks in self.tasks_between(first_key, last_key).items()}
+
+            summaries = self._date_index.summaries_between(first_key, last_key)
+            for date_key, occurrences in self._occurrences(first_key, last_key).items():
+                if date_key in summaries:
+                    summaries[date_key] = merge_summaries(summaries[date_key], occurrences)
+                else:
+                    summaries[date_key] = summarize(date_key, occurrences)
+            return summaries
+
+    def snapshot(self):
+        """Return a consistent {date_key: tasks} view of every date as stored (rules unexpanded)."""
+        with self._lock:
+            if self.lazy:
+                return self._overlay(self._adopt(self.storage.load()), self._tasks)
+            return dict(self._tasks)
+
+    def iter_stored(self, first_key='', last_key='9999-12-31'):
+        """Yield (date_key, task) as stored (rules unexpanded), in date order.
+
+        A lazy store streams rows from storage instead of loading every date,
+        upgrading (and writing back) dates saved in an older schema as it goes.
+        """
+        if self.lazy:
+            self.flush()  # Storage must have every change made so far
+            for date_key, rows in itertools.groupby(self.storage.iter_tasks(first_key, last_key),
+                                                    key=lambda row: row[0]):
+                tasks = [task for _, task in rows]
+                if any(task_schema.needs_upgrade(task) for task in tasks):
+                    with self._lock:
+                        tasks = self._adopt({date_key: tasks})[date_key]
+                for task in tasks:
+                    yield date_key, task
+            return
+        with self._lock:
+            tasks_by_date = dict(self._tasks)
+        for date_key in sorted(tasks_by_date):
+            if first_key <= date_key <= last_key:
+                for task in tasks_by_date[date_key]:
+                    yield date_key, task
+
+    def evict_cache(self):
+        """Forget the dates a lazy store has cached, apart from those holding rules.
+
+        Lets a long bulk operation run in bounded memory. Pending writes are
+        flushed first, so call it while no other thread is editing.
+        """
+        if not self.lazy:
+            return
+        self.flush()
+        with self._lock:
+            self._tasks = {key: tasks for key, tasks in self._tasks.items() if key in self._rule_dates}
+
+    def _start_index(self, index):
+        """Build `index` from `iter_stored` on a background thread and keep it up to date with every change.
+
+        Changes made while it builds reach its update(), which queues them
+        until the build finishes. Call with the lock held.
+        """
+        self._live_indexes.append(index)
+        threading.Thread(target=index.build, args=(self.iter_stored(),), daemon=True).start()
+        return index
+
+    def search_index(self):
+        """Return the TaskSearchIndex over every stored task, starting its build on first use.
+
+        Until the build finishes its searches return None.
+        """
+        with self._lock:
+            if self._search_index is None:
+                self._search_index = self._start_index(TaskSearchIndex())
+            return self._search_index
+
+    def due_index(self):
+        """Return the DueIndex of the unfinished tasks, starting its build on first use (see upcoming)."""
+        with self._lock:
+            if self._due_index is None:
+                self._due_index = self._start_index(DueIndex())
+            return self._due_index
+
+    def upcoming(self, limit, after=None):
+        """Return up to `limit` (date_key, task) of the unfinished tasks due next, soonest first.
+
+        `after` is the due_index.due_key() of the last task of the previous
+        page, or None to start from now. Recurring occurrences are expanded
+        only up to the last other task of the page (AGENDA_HORIZON if the page
+        is not full). Return None while the due index is still being built.
+        """
+        if after is None:
+            after = (int(time.time()),)
+        page = self.due_index().page(after, limit)
+        if page is None:
+            return None
+        if self._rules:
+            first = date.fromtimestamp(after[0])
+            last_key = page[-1][0][1] if len(page) == limit else (first + AGENDA_HORIZON).isoformat()
+            with self._lock:
+                occurrences = self._occurrences(first.isoformat(), last_key)
+            for date_key, tasks in occurrences.items():
+                page += [(due_key(date_key, task), task) for task in tasks if is_pending(task)]
+            page = heapq.nsmallest(limit, (entry for entry in page if entry[0] > after), key=lambda entry: entry[0])
+        return [(key[1], task) for key, task in page]
+
+    def snapshot_cache(self):
+        """Return a shallow copy of the in-memory dates (all of them unless lazy)."""
+        with self._lock:
+            return dict(self._tasks)
+
+    @staticmethod
+    def _overlay(loaded, cached):
+        # Cached dates are never older than storage, which may still have writes pending
+        for key, tasks in cached.items():
+            if tasks:
+                loaded[key] = tasks
+            else:
+                loaded.pop(key, None)
+        return loaded
+
+    # Mutations
+    #
+    # Tasks are identified by the id of the task dict a query returned.
+    # Occurrences of a recurring task are recognised by their `occurrence` key.
+
+    @staticmethod
+    def _index_of(tasks, task):
+        task_id = task.get('id')
+        for index, candidate in enumerate(tasks):
+            if candidate is task or task_id is not None and candidate.get('id') == task_id:
+                return index
+        raise ValueError(f"Task {task.get('name')!r} no longer exists")
+
+    def _rule_of(self, task):
+        if 'occurrence' in task and task.get('series') in self._rules:
+            return self._rules[task['series']]
+        return None
+
+    def _set_exception(self, task, override):
+        """Record `override` for one occurrence (None deletes it, {} restores it)."""
+        start_key, rule_task = self._rule_of(task)
+        tasks = list(self._stored(start_key))
+        tasks[self._index_of(tasks, rule_task)] = recurrence.with_exception(rule_task, task['occurrence'], override)
+        self._commit({start_key: tasks})
+
+    def add_task(self, date_key, task):
+        self.add_tasks([(date_key, task)])
+
+    def add_tasks(self, dated_tasks):
+        """Add many (date_key, task) pairs with a single save."""
+        with self._mutating():
+            changed = {}
+            for date_key, task in dated_tasks:
+                if date_key not in changed:
+                    changed[date_key] = list(self._stored(date_key))
+                changed[date_key].append(self._upgrade_task(date_key, task) if task_schema.needs_upgrade(task) else task)
+            self._commit(changed)
+
+    def update_task(self, date_key, task, new_task):
+        with self._mutating():
+            rule = self._rule_of(task)
+            if rule:
+                override = recurrence.override_for(rule[1], new_task)
+                moved_to = (rule[1]['recurrence']['exceptions'].get(task['occurrence']) or {}).get('date')
+                if moved_to:
+                    override['date'] = moved_to
+                self._set_exception(task, override)
+                return
+
+            tasks = list(self._stored(date_key))
+            index = self._index_of(tasks, task)
+            tasks[index] = dict(new_task, id=tasks[index]['id'])  # An edit keeps the task's identity
+            self._commit({date_key: tasks})
+
+    def remove_task(self, date_key, task):
+        with self._mutating():
+            if self._rule_of(task):
+                self._set_exception(task, None)
+                return
+
+            tasks = list(self._stored(date_key))
+            del tasks[self._index_of(tasks, task)]
+            self._commit({date_key: tasks})
+
+    # Whole series. `task` is any occurrence of the series; its rule is found
+    # through the series index, and each operation rewrites only the rule.
+
+    def _series_edit(self, task, following, edit_rule):
+        """Replace the rule of `task`'s series with edit_rule(start_key, rule) -> rule or None, in one commit.
+
+        With `following`, only the occurrences from `task` on are edited: the
+        rule is split there and the tail becomes a new series.
+        """
+        with self._mutating():
+            rule = self._rule_of(task)
+            if rule is None:
+                raise ValueError(f"Task {task.get('name')!r} is not part of a series")
+            start_key, rule_task = rule
+            tasks = list(self._stored(start_key))
+            index = self._index_of(tasks, rule_task)
+            changed = {start_key: tasks}
+            if following and task['occurrence'] != start_key:
+                head, tail = recurrence.split(start_key, rule_task, task['occurrence'])
+                tasks[index] = head
+                tail = edit_rule(task['occurrence'], dict(tail, id=new_task_id()))
+                if tail is not None:
+                    changed[task['occurrence']] = list(self._stored(task['occurrence'])) + [tail]
+            else:
+                new_rule = edit_rule(start_key, rule_task)
+                if new_rule is None:
+                    del tasks[index]
+                else:
+                    tasks[index] = new_rule
+            self._commit(changed)
+
+    def update_series(self, task, new_task, following=False):
+        """Apply the edit of one occurrence (`task` -> `new_task`) to its whole series, with a single save.
+
+        Only the fields the edit changed are applied, replacing any
+        per-occurrence changes of those fields. With `following`, only this
+        and the later occurrences change.
+        """
+        changes = {key: new_task[key] for key in recurrence.OCCURRENCE_FIELDS
+                   if key != 'due' and key in new_task and new_task[key] != task.get(key)}
+        if task_schema.due_clock(new_task.get('due')) != task_schema.due_clock(task.get('due')):
+            changes['due'] = new_task.get('due')
+        self._series_edit(task, following, lambda start_key, rule: recurrence.with_changes(start_key, rule, changes))
+
+    def complete_series(self, task):
+        """Mark every occurrence of `task`'s series completed."""
+        changes = {'status': "Completed"}
+        self._series_edit(task, False, lambda start_key, rule: recurrence.with_changes(start_key, rule, changes))
+
+    def remove_series(self, task, following=False):
+        """Delete `task`'s series (with `following`, only this and the later occurrences)."""
+        self._series_edit(task, following, lambda start_key, rule: None)
+
+    def move_task(self, date_key, task, destination_key):
+        self.move_tasks([(date_key, task, destination_key)])
+
+    def move_tasks(self, moves, series=False):
+        """Move many (date_key, task, destination_key) with a single save.
+
+        A moved occurrence of a recurring task becomes an exception of its
+        rule; with `series`, its whole series moves instead, every occurrence
+        by as many days as the one given (from the date it is shown on).
+        """
+        with self._mutating():
+            changed = {}
+
+            def stored(date_key):
+                if date_key not in changed:
+                    changed[date_key] = list(self._stored(date_key))
+                return changed[date_key]
+
+            moved_series = set()
+            for date_key, task, destination_key in moves:
+                rule = self._rule_of(task)
+                if rule is None:
+                    source = stored(date_key)
+                    del source[self._index_of(source, task)]
+                    # Same time of day on the new date
+                    stored(destination_key).append(task if destination_key == date_key
+                                                   else task_schema.on_date(task, destination_key))
+                    continue
+
+                if series and task['series'] in moved_series:
+                    continue  # Moved along with an earlier occurrence
+                start_key, rule_task = rule
+                tasks = stored(start_key)
+                index = self._index_of(tasks, rule_task)
+                rule_task = tasks[index]  # As changed by earlier moves of this batch
+                if series:
+                    moved_series.add(task['series'])
+                    days = (date.fromisoformat(destination_key) - date.fromisoformat(date_key)).days
+                    if days:
+                        new_start = (date.fromisoformat(start_key) + timedelta(days=days)).isoformat()
+                        del tasks[index]
+                        stored(new_start).append(task_schema.on_date(recurrence.shifted(rule_task, days), new_start))
+                    continue
+
+                override = dict(rule_task['recurrence']['exceptions'].get(task['occurrence']) or {})
+                override['date'] = destination_key
+                if destination_key == task['occurrence']:
+                    del override['date']
+                tasks[index] = recurrence.with_exception(rule_task, task['occurrence'], override)
+            if changed:
+                self._commit(changed)
+
+    # Undo and redo. Each reverts one logged commit with a new commit, so it is
+    # saved and announced to listeners like any other change.
+
+    def _revert(self, step, log):
+        self._commit({key: revert(self._stored(key), change) for key, change in step.items()}, log)
+
+    def undo(self):
+        """Revert the last change made through the store; return False if there is nothing to undo."""
+        with self._mutating():
+            step = self.history.pop_undo()
+            if step is None:
+                return False
+            try:
+                self._revert(step, self.history.push_redo)
+            except Exception:
+                self.history.push_undo(step)  # Nothing was reverted; keep it
+                raise
+            return True
+
+    def redo(self):
+        """Make the last undone change again; return False if there is nothing to redo."""
+        with self._mutating():
+            step = self.history.pop_redo()
+            if step is None:
+                return False
+            try:
+                self._revert(step, self.history.push_undo)
+            except Exception:
+                self.history.push_redo(step)  # Nothing was redone; keep it
+                raise
+            return True
+
+    def _reload_lazy(self):
+        """Drop what a lazy store cached, as another process saved over it; dates are read again on demand.
+
+        Which dates changed is unknown, so listeners are told any may have.
+        """
+        self.storage.refresh()
+        self._tasks = {}
+        self._rules, self._rule_dates = {}, {}
+        self._load_rules()
+        self._live_indexes = []
+        if self._search_index is not None:
+            self._search_index = self._start_index(TaskSearchIndex())
+        if self._due_index is not None:
+            self._due_index = self._start_index(DueIndex())
+        self.history.clear()
+        self._notify((), True)
+
+    def reload_if_changed(self):
+        """Pick up external edits to the tasks file, replacing only the dates that differ.
+
+        A journal is read on from where it was last read, unless a compaction
+        means the files must be loaded again in full; a lazy store drops its
+        cache instead. The undo history is forgotten if anything changed.
+        """
+        self.flush()  # Our own pending writes must not be mistaken for, or lost to, external ones
+        with self._mutating():
+            if not self.storage.changed_on_disk():
+                return  # Unchanged, or the change was our own save
+            if self.lazy:
+                self._reload_lazy()
+                return
+
+            appended = self.storage.load_appended() if hasattr(self.storage, 'load_appended') else None
+            try:
+                loaded = self.storage.load() if appended is None else appended
+            except json.JSONDecodeError:
+                # Most likely caught mid-write; the watcher will fire again when it is done
+                print("Error decoding JSON. Keeping previously loaded tasks.")
+                return
+            migrated = self._upgrade(loaded)
+
+            changed = {key: tasks for key, tasks in loaded.items() if self._tasks.get(key) != tasks}
+            if appended is None:
+                changed.update((key, []) for key in self._tasks if key not in loaded)
+                self._tasks = loaded
+            else:
+                self._tasks.update(changed)
+
+            rules_changed = self._reindex(changed)
+            self._write_back(migrated)
+            if changed:
+                # Undoing a step could now revert the other process's work
+                self.history.clear()
+                self._notify(changed, rules_changed)
@@ -1,9 +1,17 @@
 import tkinter as tk
 from tkinter import messagebox
-from datetime import datetime, timedelta
+from datetime import datetime
+from date_picker import DatePicker
+from recurrence import RECURRENCE_OPTIONS, make_rule_task
+from task_list_view import TaskListView
+from task_schema import display_due_time, due_clock, due_timestamp
+import metrics
+from widget_util import UNDO_KEYS
+
+# How far an edit or delete of one occurrence of a recurring task reaches
+SERIES_SCOPES = ("This occurrence", "This and following", "All occurrences")
+
 
-# File to store tasks
-TASKS_FILE = 'tasks.json'
 class TaskWindow:
     def __init__(self, parent, year, month, day, calendar_app):
         self.top = tk.Toplevel(parent)
@@ -19,17 +27,10 @@ class TaskWindow:
         self.day = day
         self.date_key = f"{year}-{month:02d}-{day:02d}"
 
-        # Create a frame for the tasks list
-        self.task_frame = tk.Frame(self.top)
-        self.task_frame.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
-
-        # Create a scrollbar for the task list
-        self.scroll_y = tk.Scrollbar(self.task_frame, orient="vertical")
-        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.task_list = tk.Listbox(self.task_frame, yscrollcommand=self.scroll_y.set, selectmode=tk.SINGLE)
-        self.task_list.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
-        self.scroll_y.config(command=self.task_list.yview)
+        # Create the task list; only the visible rows are ever formatted and inserted.
+        # Several tasks can be selected, to move them together
+        self.task_list = TaskListView(self.top, self.format_task, multiple=True)
+        self.task_list.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
 
         # Create buttons for adding, editing, and removing tasks
         self.add_button = tk.Button(self.top, text="Add Task", command=self.add_task)
@@ -44,17 +45,38 @@ class TaskWindow:
         self.remove_button = tk.Button(self.top, text="Remove Task", command=self.remove_task)
         self.remove_button.pack(side=tk.LEFT, padx=10, pady=5)
 
+        self.move_button = tk.Button(self.top, text="Move Tasks", command=self.move_selected_tasks)
+        self.move_button.pack(side=tk.LEFT, padx=10, pady=5)
+
         # Load tasks into the listbox
         self.load_tasks()
 
+        # Follow changes made elsewhere (e.g. tasks.json edited outside the app)
+        self.calendar_app.store.subscribe(self.on_store_change)
+        self.top.bind("<Destroy>", self.on_destroy)
+
+        # Same undo and redo shortcuts as the calendar
+        for sequence in UNDO_KEYS:
+            self.top.bind(sequence, self.calendar_app.on_undo_key)
+
+    def format_task(self, index, task):
+        return f"{index + 1}. {task['name']} - {task['category']} - {task['status']} - Due: {display_due_time(task)}"
+
+    @metrics.timed('task_window.load')
     def load_tasks(self):
-        self.task_list.delete(0, tk.END)
-        if self.date_key in self.calendar_app.tasks:
-            tasks = self.calendar_app.tasks[self.date_key]
-            for index, task in enumerate(tasks):
-                if isinstance(task, dict):  # Ensure task is a dictionary
-                    task_info = f"{index + 1}. {task['name']} - {task['category']} - {task['status']} - Due: {task.get('due_time', 'No Time')}"
-                    self.task_list.insert(tk.END, task_info)
+        if not self.top.winfo_exists():
+            return  # Closed before a queued refresh ran
+        # Only rows that changed are touched, and the selection follows its task
+        self.task_list.set_tasks(self.calendar_app.store.get_tasks(self.date_key))
+
+    def on_store_change(self, changed):
+        # May be called from another thread; refresh on the Tk thread
+        if changed is None or self.date_key in changed:
+            self.top.after(0, self.load_tasks)
+
+    def on_destroy(self, event):
+        if event.widget is self.top:
+            self.calendar_app.store.unsubscribe(self.on_store_change)
 
     def add_task(self):
         # Create a single window for task addition
@@ -130,20 +152,16 @@ class TaskWindow:
             elif am_pm == "AM" and hour == 12:
                 hour = 0
 
-            due_time = f"{hour % 12 or 12}:{minute:02d} {am_pm}"
+            due = due_timestamp(self.date_key, hour, minute)
 
             new_task = {
                 "name": task_name,
                 "category": category,
                 "status": status,
-                "due_time": due_time
+                "due": due
             }
 
-            if self.date_key not in self.calendar_app.tasks:
-                self.calendar_app.tasks[self.date_key] = []
-
-            self.calendar_app.tasks[self.date_key].append(new_task)
-            self.calendar_app.save_tasks()
+            self.calendar_app.store.add_task(self.date_key, new_task)
             self.load_tasks()
             self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
             add_task_window.destroy()
@@ -199,7 +217,7 @@ class TaskWindow:
         tk.Label(recurring_task_window, text="Recurrence:").pack(pady=10)
 
         recurrence_var = tk.StringVar(value="Daily")
-        recurrence_options = ["Daily", "Every Other Day", "Weekly", "Every Other Week", "Monthly"]
+        recurrence_options = list(RECURRENCE_OPTIONS)
 
         recurrence_menu = tk.OptionMenu(recurring_task_window, recurrence_var, *recurrence_options)
         recurrence_menu.pack(pady=5)
@@ -250,35 +268,19 @@ class TaskWindow:
             elif am_pm == "AM" and hour == 12:
                 hour = 0
 
-            due_time = f"{hour % 12 or 12}:{minute:02d} {am_pm}"
+            due = due_timestamp(self.date_key, hour, minute)
 
-            # Convert start_date to date object (assuming self.date_key is a string)
-            try:
-                start_date = datetime.strptime(self.date_key, "%Y-%m-%d").date()  # Adjust this format if needed
-            except ValueError:
-                messagebox.showerror("Error", "Invalid start date format!")
-                return
+            new_task = {
+                "name": task_name,
+                "category": category,
+                "status": status,
+                "due": due
+            }
 
-            # Calculate recurring dates
-            recurrence_dates = self.get_recurrence_dates(start_date, end_date, recurrence)
-
-            # Add tasks for all recurring dates
-            for date in recurrence_dates:
-                new_task = {
-                    "name": task_name,
-                    "category": category,
-                    "status": status,
-                    "due_time": due_time
-                }
-
-                # Ensure the date exists in the task dictionary
-                date_key = date.strftime("%Y-%m-%d")
-                if date_key not in self.calendar_app.tasks:
-                    self.calendar_app.tasks[date_key] = []
-                self.calendar_app.tasks[date_key].append(new_task)
-
-            # Call the save function to persist changes
-            self.calendar_app.save_tasks()
+            # Store a single rule; occurrences are expanded only for the dates being viewed
+            frequency, interval = RECURRENCE_OPTIONS[recurrence]
+            rule_task = make_rule_task(new_task, frequency, interval, end=end_date.isoformat())
+            self.calendar_app.store.add_task(self.date_key, rule_task)
             self.load_tasks()
             self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
             recurring_task_window.destroy()
@@ -286,42 +288,16 @@ class TaskWindow:
         confirm_button=tk.Button(recurring_task_window, text="Add Task", command=confirm_add_recurring_tasks)
         confirm_button.pack(pady=20)
 
-    def get_recurrence_dates(self, start_date, end_date, recurrence):
-        """Generate a list of dates for the recurring task based on the recurrence pattern."""
-        dates = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            dates.append(current_date)
-
-            if recurrence == "Daily":
-                current_date += timedelta(days=1)
-            elif recurrence == "Every Other Day":
-                current_date += timedelta(days=2)
-            elif recurrence == "Weekly":
-                current_date += timedelta(weeks=1)
-            elif recurrence == "Every Other Week":
-                current_date += timedelta(weeks=2)
-            elif recurrence == "Monthly":
-                # Handle month changes
-                next_month = current_date.month % 12 + 1
-                year_adjust = current_date.year + (1 if next_month == 1 else 0)
-                current_date = current_date.replace(year=year_adjust, month=next_month)
-
-        return dates
-
     def edit_task(self):
-        selected_index = self.task_list.curselection()
-        if not selected_index:
+        task = self.task_list.selected_task()
+        if task is None:
             messagebox.showwarning("No Selection", "Please select a task to edit.")
             return
 
-        task_index = selected_index[0]
-        task = self.calendar_app.tasks[self.date_key][task_index]
-
         edit_task_window = tk.Toplevel(self.top)
         edit_task_window.title("Edit Task")
-        edit_task_window.geometry("500x500")  # Increased size for better visibility
+        # Increased size for better visibility, with room for the series options of a recurring task
+        edit_task_window.geometry("500x650" if 'occurrence' in task else "500x500")
 
         # Task Name
         tk.Label(edit_task_window, text="Task Name:").pack(pady=5)
@@ -338,9 +314,10 @@ class TaskWindow:
         # Time Input (Hour, Minute, AM/PM)
         tk.Label(edit_task_window, text="Select Time:").pack(pady=5)
 
-        hour_var = tk.IntVar(value=int(task['due_time'].split(':')[0]))
-        minute_var = tk.IntVar(value=int(task['due_time'].split(':')[1].split()[0]))
-        am_pm_var = tk.StringVar(value=task['due_time'].split()[-1])
+        hour, minute = due_clock(task.get('due')) or (12, 0)
+        hour_var = tk.IntVar(value=hour % 12 or 12)
+        minute_var = tk.IntVar(value=minute)
+        am_pm_var = tk.StringVar(value="PM" if hour >= 12 else "AM")
 
         time_frame = tk.Frame(edit_task_window)
         time_frame.pack(pady=5)
@@ -369,9 +346,23 @@ class TaskWindow:
         tk.Radiobutton(status_frame, text="Work in Progress", variable=status_var, value="Work in Progress").pack(anchor=tk.W)
         tk.Radiobutton(status_frame, text="Completed", variable=status_var, value="Completed").pack(anchor=tk.W)
 
+        # Occurrences of a recurring task can be edited for the rest of the series, or all of it
+        scope_var = tk.StringVar(value=SERIES_SCOPES[0])
+        if 'occurrence' in task:
+            tk.Label(edit_task_window, text="Apply To:").pack(pady=5)
+            tk.OptionMenu(edit_task_window, scope_var, *SERIES_SCOPES).pack(pady=5)
+
+            def complete_series():
+                self.calendar_app.store.complete_series(task)
+                self.load_tasks()
+                self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
+                self.close_all_windows_except_main()
+
+            tk.Button(edit_task_window, text="Mark Series Completed", command=complete_series).pack(pady=5)
+
         # Move Task Button
         def move_task():
-            self.open_calendar_for_move(task, task_index)
+            self.open_calendar_for_move([task])
 
         move_button = tk.Button(edit_task_window, text="Move Task", command=move_task)
         move_button.pack(pady=10)
@@ -395,17 +386,21 @@ class TaskWindow:
             elif am_pm == "AM" and hour == 12:
                 hour = 0
 
-            due_time = f"{hour % 12 or 12}:{minute:02d} {am_pm}"
+            due = due_timestamp(self.date_key, hour, minute)
 
             updated_task = {
                 "name": task_name,
                 "category": category,
                 "status": status,
-                "due_time": due_time
+                "due": due
             }
 
-            self.calendar_app.tasks[self.date_key][task_index] = updated_task
-            self.calendar_app.save_tasks()
+            scope = scope_var.get()
+            if scope == SERIES_SCOPES[0]:
+                self.calendar_app.store.update_task(self.date_key, task, updated_task)
+            else:
+                # One save for the whole series, however many occurrences it has
+                self.calendar_app.store.update_series(task, updated_task, following=scope == SERIES_SCOPES[1])
             self.load_tasks()
             self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
             self.close_all_windows_except_main()  # Close all windows except the main calendar window
@@ -413,34 +408,37 @@ class TaskWindow:
         confirm_button = tk.Button(edit_task_window, text="Save Changes", command=confirm_edit_task)
         confirm_button.pack(pady=20)
 
-    def open_calendar_for_move(self, task, task_index):
-        move_window = tk.Toplevel(self.top)
-        move_window.title("Select Date to Move Task")
-        move_window.geometry("900x600")
-
-        calendar_frame = tk.Frame(move_window)
-        calendar_frame.pack(expand=True, fill=tk.BOTH)
-
-        # Show calendar for the current month
-        from task_calendar import TaskCalendar
-        calendar_app = TaskCalendar(move_window)
-        calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
-
-        def on_date_select(year, month, day):
-            destination_date_key = f"{year}-{month:02d}-{day:02d}"
-            if messagebox.askyesno("Confirm Move", f"Are you sure you want to move this task to {day}/{month}/{year}?"):
-                if destination_date_key not in self.calendar_app.tasks:
-                    self.calendar_app.tasks[destination_date_key] = []
-                self.calendar_app.tasks[destination_date_key].append(task)
-                del self.calendar_app.tasks[self.date_key][task_index]
-                self.calendar_app.save_tasks()
+    def move_selected_tasks(self):
+        tasks = self.task_list.selected_tasks()
+        if not tasks:
+            messagebox.showwarning("No Selection", "Please select the tasks to move.")
+            return
+        self.open_calendar_for_move(tasks)
+
+    def open_calendar_for_move(self, tasks):
+        """Pick a date and move `tasks` there with a single save."""
+        series_var = tk.BooleanVar(value=False)
+
+        def on_date_select(destination_date_key):
+            year, month, day = map(int, destination_date_key.split("-"))
+            what = "this task" if len(tasks) == 1 else f"these {len(tasks)} tasks"
+            if series_var.get():
+                what += " (whole series)"
+            if messagebox.askyesno("Confirm Move", f"Are you sure you want to move {what} to {day}/{month}/{year}?"):
+                moves = [(self.date_key, task, destination_date_key) for task in tasks]
+                self.calendar_app.store.move_tasks(moves, series=series_var.get())
                 self.load_tasks()
                 self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
-                move_window.destroy()  # Ensure move window is closed
+                picker.top.destroy()  # Ensure move window is closed
                 self.close_all_windows_except_main()  # Ensure all other windows are closed
 
-        # Add functionality to the calendar buttons to move the task
-        calendar_app.open_task_window = lambda y, m, d: on_date_select(y, m, d)
+        # Reads the calendar's loaded tasks; nothing is reloaded from disk
+        picker = DatePicker(self.top, self.calendar_app, on_date_select,
+                            title="Select Date to Move Task" if len(tasks) == 1 else "Select Date to Move Tasks",
+                            year=self.year, month=self.month)
+        if any('occurrence' in task for task in tasks):
+            tk.Checkbutton(picker.footer, text="Move every occurrence of the series", variable=series_var).pack(
+                anchor=tk.W)
 
     def close_all_windows_except_main(self):
         # Close all Toplevel windows except the main task calendar window
@@ -450,14 +448,36 @@ class TaskWindow:
         self.top.destroy()  # Ensure the current task window is closed
 
     def remove_task(self):
-        selected_index = self.task_list.curselection()
-        if not selected_index:
+        task = self.task_list.selected_task()
+        if task is None:
             messagebox.showwarning("No Selection", "Please select a task to remove.")
             return
 
-        task_index = selected_index[0]
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this task?"):
-            del self.calendar_app.tasks[self.date_key][task_index]
-            self.calendar_app.save_tasks()
+        if 'occurrence' in task:
+            self.choose_series_scope("Delete Recurring Task", lambda scope: self.remove_occurrences(task, scope))
+        elif messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this task?"):
+            self.calendar_app.store.remove_task(self.date_key, task)
             self.load_tasks()
             self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
+
+    def remove_occurrences(self, task, scope):
+        if scope == SERIES_SCOPES[0]:
+            self.calendar_app.store.remove_task(self.date_key, task)
+        else:
+            self.calendar_app.store.remove_series(task, following=scope == SERIES_SCOPES[1])
+        self.load_tasks()
+        self.calendar_app.show_calendar(self.calendar_app.current_year, self.calendar_app.current_month)
+
+    def choose_series_scope(self, title, on_choice):
+        """Ask which occurrences of a recurring task an action applies to; calls on_choice(scope)."""
+        scope_window = tk.Toplevel(self.top)
+        scope_window.title(title)
+        tk.Label(scope_window, text="Apply to which occurrences?").pack(padx=10, pady=10)
+
+        for scope in SERIES_SCOPES:
+            def choose(scope=scope):
+                scope_window.destroy()
+                on_choice(scope)
+
+            tk.Button(scope_window, text=scope, command=choose).pack(fill=tk.X, padx=10, pady=2)
+        tk.Button(scope_window, text="Cancel", command=scope_window.destroy).pack(pady=10)
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import metrics
+
+# Seconds to wait after the last change before writing, so bursts share one write
+WRITE_DELAY = 0.5
+
+# Never hold back a change longer than this, even while edits keep arriving
+MAX_WRITE_DELAY = 5.0
+
+# A failed write is retried after `delay`, doubling with each further failure up to this many seconds
+MAX_RETRY_DELAY = 60.0
+
+
+class BackgroundWriter:
+    """Persist store changes on a dedicated thread, coalescing bursts into one write.
+
+    `submit` only records which dates changed; the newest task list of each date
+    wins. The writer thread calls `storage.write(snapshot(), changed)` once the
+    changes have settled. A failed write keeps its changes pending so they are
+    retried with the next one, with an exponential backoff while it keeps
+    failing. It is reported through `on_error(exception)`, each distinct error
+    once until a write succeeds.
+    """
+
+    def __init__(self, storage, snapshot, on_error=None, delay=WRITE_DELAY, max_delay=MAX_WRITE_DELAY,
+                 max_retry_delay=MAX_RETRY_DELAY):
+        self.storage = storage
+        self.snapshot = snapshot
+        self.on_error = on_error
+        self.delay = delay
+        self.max_delay = max_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._first_change = self._last_change = 0.0
+        self._writing = False
+        self._flush_requested = False
+        self._closing = False
+        self._failures = 0
+        self._failing = 0  # Failed writes since the last one that succeeded
+        self._retry_at = 0.0  # No write before this monotonic time while failing
+        self._reported = set()  # Errors reported since the last successful write
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, changed):
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_change = now
+            self._last_change = now
+            self._pending.update(changed)
+            self._cond.notify_all()
+
+    def flush(self):
+        """Block until everything submitted so far has been written (or a write failed)."""
+        with self._cond:
+            if self._failing:
+                return  # Writes are failing; the retry waits for its backoff
+            failures = self._failures
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._pending or self._writing) and self._failures == failures:
+                self._cond.wait()
+            self._flush_requested = False
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return  # Closing with nothing left to write
+
+                # Debounce: let a burst of edits settle before writing, and back off while writes fail
+                while not self._flush_requested and not self._closing:
+                    deadline = max(min(self._last_change + self.delay, self._first_change + self.max_delay),
+                                   self._retry_at)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                changed, self._pending = self._pending, {}
+                self._writing = True
+                metrics.count('writer.dates_written', len(changed))
+
+            # Taken after the pending changes, so it is at least as new as they are
+            tasks = self.snapshot()
+            try:
+                with metrics.timer('storage.write'):
+                    self.storage.write(tasks, changed)
+            except Exception as e:
+                with self._cond:
+                    # Retry with the next write, unless the date has changed again since
+                    for date_key, task_list in changed.items():
+                        self._pending.setdefault(date_key, task_list)
+                    self._failures += 1
+                    self._failing += 1
+                    backoff = min(self.delay * 2 ** (self._failing - 1), self.max_retry_delay)
+                    self._retry_at = time.monotonic() + backoff
+                    error = (type(e), str(e))
+                    report = error not in self._reported
+                    self._reported.add(error)
+                if report:
+                    if self.on_error:
+                        self.on_error(e)
+                    else:
+                        print(f"Failed to save tasks: {e}")
+                if self._closing:
+                    return
+            else:
+                with self._cond:
+                    self._failing = 0
+                    self._retry_at = 0.0
+                    self._reported.clear()
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+import recurrence
+from due_index import DueIndex, due_key
+from task_schema import ALL_DAY, due_timestamp
+from task_store import TaskStore
+
+
+def task(task_id, date_key, hour=None, status="Unfinished"):
+    task = {'id': task_id, 'name': task_id, 'status': status}
+    if hour is not None:
+        task['due'] = due_timestamp(date_key, hour, 0)
+    return task
+
+
+def ids(page):
+    return [entry[1]['id'] for entry in page]
+
+
+class DueIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = DueIndex()
+        self.index.build([
+            ('2024-05-11', task('late', '2024-05-11', 18)),
+            ('2024-05-10', task('all-day', '2024-05-10')),
+            ('2024-05-10', task('morning', '2024-05-10', 9)),
+            ('2024-05-10', task('done', '2024-05-10', 10, status="Completed")),
+        ])
+
+    def test_pages_in_due_order(self):
+        start = (due_timestamp('2024-05-10', 0, 0),)
+        self.assertEqual(ids(self.index.page(start, 10)), ['morning', 'all-day', 'late'])
+        first = self.index.page(start, 2)
+        self.assertEqual(ids(self.index.page(first[-1][0], 2)), ['late'])
+        self.assertEqual(ids(self.index.page((due_timestamp('2024-05-10', *ALL_DAY) + 1,), 10)), ['late'])
+
+    def test_update_replaces_a_date(self):
+        self.index.update({'2024-05-10': [task('morning', '2024-05-10', 9, status="Completed"),
+                                          task('evening', '2024-05-10', 20)]})
+        self.assertEqual(ids(self.index.page((0,), 10)), ['evening', 'late'])
+
+    def test_changes_during_the_build_are_queued(self):
+        index = DueIndex()
+        index.update({'2024-05-10': [task('new', '2024-05-10', 8)]})
+        self.assertIsNone(index.page((0,), 10))
+        index.build([('2024-05-10', task('old', '2024-05-10', 9))])
+        self.assertTrue(index.ready.is_set())
+        self.assertEqual(ids(index.page((0,), 10)), ['new'])  # The queued change replaced the date
+
+
+class UpcomingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = TaskStore(os.path.join(self.directory.name, 'tasks.json'))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_merges_recurring_occurrences(self):
+        today = date.today()
+        keys = [(today + timedelta(days=n)).isoformat() for n in range(4)]
+        self.store.add_tasks([(keys[1], task('one-off', keys[1], 12)),
+                              (keys[1], recurrence.make_rule_task(
+                                  {'name': "Gym", 'status': "Unfinished", 'due': due_timestamp(keys[1], 23, 0)}, 'daily'))])
+        self.store.due_index().ready.wait()
+        page = self.store.upcoming(3)
+        self.assertEqual([entry[1]['name'] for entry in page], ['one-off', "Gym", "Gym"])
+        self.assertEqual([entry[0] for entry in page], [keys[1], keys[1], keys[2]])
+        self.assertEqual(page, sorted(page, key=lambda entry: due_key(*entry)))
+
+
+if __name__ == '__main__':
+    unittest.main()
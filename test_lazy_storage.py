@@ -0,0 +1,151 @@
+import json
+import os
+import tempfile
+import unittest
+
+import recurrence
+from sharded_storage import MANIFEST_FILE, RECURRING_FILE, ShardedStorage, migrate_json_to_shards
+from sqlite_storage import SqliteStorage, migrate_json_to_sqlite
+from task_store import TaskStore
+
+TASKS = {
+    '2024-04-30': [{'id': 'a', 'name': "Taxes"}],
+    '2024-05-10': [{'id': 'b', 'name': "Report", 'due': 1715353500}, {'id': 'c', 'name': "Call", 'tags': ["x"]}],
+    '2024-05-11': [recurrence.make_rule_task({'id': 'd', 'name': "Gym"}, 'weekly')],
+    '2024-07-01': [{'id': 'e', 'name': "Trip"}],
+}
+
+
+class LazyStorageTest:
+    """Shared by the lazy backends: dates and ranges read back as written."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = self.open_storage()
+        self.storage.write(None, TASKS)
+
+    def tearDown(self):
+        self.storage.close()
+        self.directory.cleanup()
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = self.open_storage()
+
+    def test_reads_back_what_was_written(self):
+        self.reopen()
+        self.assertEqual(self.storage.load(), TASKS)
+        self.assertEqual(self.storage.load_date('2024-05-10'), TASKS['2024-05-10'])
+        self.assertEqual(self.storage.load_date('2024-05-12'), [])
+        self.assertEqual(self.storage.load_range('2024-05-01', '2024-06-30'),
+                         {key: TASKS[key] for key in ('2024-05-10', '2024-05-11')})
+        self.assertEqual(self.storage.load_recurring(), {'2024-05-11': TASKS['2024-05-11']})
+        self.assertEqual(list(self.storage.iter_tasks('2024-05-01', '2024-12-31')),
+                         [(key, task) for key in ('2024-05-10', '2024-05-11', '2024-07-01') for task in TASKS[key]])
+
+    def test_write_replaces_only_the_changed_dates(self):
+        self.storage.write(None, {'2024-05-10': [TASKS['2024-05-10'][1]], '2024-04-30': []})
+        self.reopen()
+        self.assertEqual(self.storage.load(), {'2024-05-10': [TASKS['2024-05-10'][1]], '2024-05-11': TASKS['2024-05-11'],
+                                               '2024-07-01': TASKS['2024-07-01']})
+
+    def test_migration(self):
+        path = os.path.join(self.directory.name, 'old.json')
+        with open(path, 'w') as f:
+            json.dump({'2024-05-10': [{'name': "Call", 'due_time': "9:05 PM"}]}, f)
+        self.assertEqual(self.migrate(path), 1)
+        store = TaskStore(storage=self.open_storage(self.migrated_path))
+        [task] = store.get_tasks('2024-05-10')
+        self.assertEqual((task['name'], len(task['id'])), ("Call", 32))
+        self.assertNotIn('due_time', task)
+        store.close()
+
+
+class SqliteStorageTest(LazyStorageTest, unittest.TestCase):
+    def open_storage(self, path=None):
+        return SqliteStorage(path or os.path.join(self.directory.name, 'tasks.db'))
+
+    def migrate(self, path):
+        self.migrated_path = os.path.join(self.directory.name, 'migrated.db')
+        return migrate_json_to_sqlite(path, self.migrated_path)
+
+
+class ShardedStorageTest(LazyStorageTest, unittest.TestCase):
+    def open_storage(self, path=None, cached_months=2):
+        return ShardedStorage(path or os.path.join(self.directory.name, 'tasks'), cached_months)
+
+    def migrate(self, path):
+        self.migrated_path = os.path.join(self.directory.name, 'migrated')
+        return migrate_json_to_shards(path, self.migrated_path)
+
+    def test_layout(self):
+        files = set(os.listdir(self.storage.path))
+        self.assertEqual(files, {MANIFEST_FILE, RECURRING_FILE, '2024-04.json', '2024-05.json', '2024-07.json'})
+        self.storage.write(None, {'2024-04-30': []})
+        self.assertNotIn('2024-04.json', os.listdir(self.storage.path))
+        with open(os.path.join(self.storage.path, MANIFEST_FILE)) as f:
+            self.assertEqual(json.load(f)['months'], ['2024-05', '2024-07'])
+
+    def test_recently_viewed_months_stay_cached(self):
+        self.reopen()
+        for date_key in ('2024-04-30', '2024-05-10', '2024-04-30', '2024-07-01'):
+            self.storage.load_date(date_key)
+        self.assertEqual(list(self.storage._months), ['2024-04', '2024-07'])
+
+    def test_iteration_does_not_evict_viewed_months(self):
+        self.reopen()
+        self.storage.load_date('2024-05-10')
+        list(self.storage.iter_tasks())
+        self.assertEqual(list(self.storage._months), ['2024-05'])
+
+
+class ChangeSignalTest:
+    """Shared by the lazy backends: a save by another process is seen and re-read."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = TaskStore(storage=self.open_storage())
+        self.store.add_task('2024-05-10', {'name': "Report"})
+        self.reader = TaskStore(storage=self.open_storage(), owner=False)
+        self.changes = []
+        self.reader.subscribe(self.changes.append)
+
+    def tearDown(self):
+        self.reader.close()
+        self.store.close()
+        self.directory.cleanup()
+
+    def names(self, store, date_key):
+        return [task['name'] for task in store.get_tasks(date_key)]
+
+    def test_own_saves_are_not_changes(self):
+        self.assertFalse(self.store.storage.changed_on_disk())
+        self.reader.add_task('2024-05-11', {'name': "Call"})
+        self.assertFalse(self.reader.storage.changed_on_disk())
+
+    def test_other_saves_are_read_again(self):
+        self.assertEqual(self.names(self.reader, '2024-05-10'), ["Report"])  # Now cached
+        report = self.store.get_tasks('2024-05-10')[0]
+        self.store.update_task('2024-05-10', report, dict(report, status="Completed"))
+        self.store.add_task('2024-06-01', {'name': "Trip"})
+
+        self.assertTrue(self.reader.storage.changed_on_disk())
+        self.reader.reload_if_changed()
+        self.assertEqual(self.changes, [None])  # Any date may have changed
+        self.assertEqual(self.reader.get_tasks('2024-05-10')[0]['status'], "Completed")
+        self.assertEqual(self.names(self.reader, '2024-06-01'), ["Trip"])
+        self.assertFalse(self.reader.storage.changed_on_disk())
+
+
+class SqliteChangeTest(ChangeSignalTest, unittest.TestCase):
+    def open_storage(self):
+        return SqliteStorage(os.path.join(self.directory.name, 'tasks.db'))
+
+
+class ShardedChangeTest(ChangeSignalTest, unittest.TestCase):
+    def open_storage(self):
+        return ShardedStorage(os.path.join(self.directory.name, 'tasks'))
+
+
+if __name__ == '__main__':
+    unittest.main()
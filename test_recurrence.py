@@ -0,0 +1,105 @@
+import unittest
+from datetime import date, datetime
+
+import recurrence
+from task_schema import due_timestamp
+
+
+def rule_task(frequency, interval=1, **limits):
+    task = {'name': "Gym", 'category': "Health", 'status': "Unfinished", 'due': due_timestamp('2024-01-31', 7, 30)}
+    return recurrence.make_rule_task(task, frequency, interval, **limits)
+
+
+def dates(start_key, task, first_key, last_key):
+    return [date_key for date_key, _ in recurrence.expand(start_key, task, first_key, last_key)]
+
+
+class OccurrenceDatesTest(unittest.TestCase):
+    def test_daily_and_weekly(self):
+        self.assertEqual(dates('2024-01-31', rule_task('daily', 2), '2024-02-03', '2024-02-08'),
+                         ['2024-02-04', '2024-02-06', '2024-02-08'])
+        self.assertEqual(dates('2024-01-31', rule_task('weekly', count=3), '2024-01-01', '2024-12-31'),
+                         ['2024-01-31', '2024-02-07', '2024-02-14'])
+
+    def test_monthly_skips_short_months(self):
+        self.assertEqual(dates('2024-01-31', rule_task('monthly', end='2024-06-30'), '2024-01-01', '2024-12-31'),
+                         ['2024-01-31', '2024-03-31', '2024-05-31'])
+        # Occurrences before the range still count against the limit
+        self.assertEqual(dates('2024-01-31', rule_task('monthly', count=3), '2024-04-01', '2024-12-31'), ['2024-05-31'])
+
+    def test_occurrences_keep_the_time_of_day(self):
+        [(date_key, occurrence)] = recurrence.expand('2024-01-31', rule_task('daily'), '2024-03-05', '2024-03-05')
+        self.assertEqual(datetime.fromtimestamp(occurrence['due']), datetime(2024, 3, 5, 7, 30))
+        self.assertEqual(occurrence['occurrence'], date_key)
+        self.assertEqual(occurrence['id'], recurrence.occurrence_id(occurrence, date_key))
+        self.assertNotIn('recurrence', occurrence)
+
+    def test_occurs_on(self):
+        rule = rule_task('weekly')['recurrence']
+        self.assertTrue(recurrence.occurs_on(date(2024, 1, 31), rule, date(2024, 2, 7)))
+        self.assertFalse(recurrence.occurs_on(date(2024, 1, 31), rule, date(2024, 2, 8)))
+
+
+class ExceptionTest(unittest.TestCase):
+    def setUp(self):
+        self.task = rule_task('daily')
+
+    def test_deleted_overridden_and_moved(self):
+        task = recurrence.with_exception(self.task, '2024-02-01', None)
+        task = recurrence.with_exception(task, '2024-02-02', {'status': "Completed"})
+        task = recurrence.with_exception(task, '2024-02-03', {'date': '2024-02-10'})
+        occurrences = dict(recurrence.expand('2024-01-31', task, '2024-01-31', '2024-02-04'))
+        self.assertEqual(sorted(occurrences), ['2024-01-31', '2024-02-02', '2024-02-04'])
+        self.assertEqual(occurrences['2024-02-02']['status'], "Completed")
+
+        [(date_key, moved)] = [(key, occurrence) for key, occurrence
+                               in recurrence.expand('2024-01-31', task, '2024-02-10', '2024-02-10')
+                               if occurrence['occurrence'] == '2024-02-03']
+        self.assertEqual(moved['id'], recurrence.occurrence_id(task, '2024-02-03'))
+        self.assertEqual(datetime.fromtimestamp(moved['due']), datetime(2024, 2, 10, 7, 30))
+        self.assertNotIn('date', moved)
+
+        restored = recurrence.with_exception(task, '2024-02-01', {})
+        self.assertIn('2024-02-01', dates('2024-01-31', restored, '2024-02-01', '2024-02-01'))
+
+    def test_override_for(self):
+        [(_, occurrence)] = recurrence.expand('2024-01-31', self.task, '2024-02-05', '2024-02-05')
+        edited = dict(occurrence, name="Swim", due=due_timestamp('2024-02-05', 7, 30))
+        self.assertEqual(recurrence.override_for(self.task, edited), {'name': "Swim"})
+        later = dict(occurrence, due=due_timestamp('2024-02-05', 18, 0))
+        self.assertEqual(recurrence.override_for(self.task, later), {'due': later['due']})
+
+
+class SeriesEditTest(unittest.TestCase):
+    def setUp(self):
+        task = rule_task('daily', count=10)
+        task = recurrence.with_exception(task, '2024-02-01', None)
+        self.task = recurrence.with_exception(task, '2024-02-05', {'name': "Swim", 'date': '2024-02-06'})
+
+    def test_split(self):
+        head, tail = recurrence.split('2024-01-31', self.task, '2024-02-03')
+        self.assertEqual(dates('2024-01-31', head, '2024-01-01', '2024-12-31'), ['2024-01-31', '2024-02-02'])
+        self.assertEqual(head['recurrence']['exceptions'], {'2024-02-01': None})
+        self.assertEqual(tail['recurrence']['count'], 7)
+        self.assertNotEqual(tail['series'], self.task['series'])
+        self.assertEqual(datetime.fromtimestamp(tail['due']), datetime(2024, 2, 3, 7, 30))
+        tail_dates = dates('2024-02-03', tail, '2024-01-01', '2024-12-31')
+        self.assertEqual(len(tail_dates), 7)  # The 5th is moved onto the 6th
+        self.assertEqual(tail_dates.count('2024-02-06'), 2)
+
+    def test_shifted(self):
+        task = recurrence.shifted(dict(self.task, recurrence=dict(self.task['recurrence'], end='2024-03-01')), 2)
+        self.assertEqual(task['recurrence']['end'], '2024-03-03')
+        self.assertEqual(task['recurrence']['exceptions'],
+                         {'2024-02-03': None, '2024-02-07': {'name': "Swim", 'date': '2024-02-08'}})
+
+    def test_with_changes(self):
+        task = recurrence.with_changes('2024-01-31', self.task, {'name': "Run", 'due': due_timestamp('2024-06-01', 6, 0)})
+        self.assertEqual(task['name'], "Run")
+        self.assertEqual(datetime.fromtimestamp(task['due']), datetime(2024, 1, 31, 6, 0))
+        # The name override gives way to the change; the move and the deletion stay
+        self.assertEqual(task['recurrence']['exceptions'], {'2024-02-01': None, '2024-02-05': {'date': '2024-02-06'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from deadline_scheduler import DeadlineScheduler
+from reminder_state import ReminderState
+
+
+class ReminderStateTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'reminders.state')
+        self.due = (datetime.now() + timedelta(days=1)).replace(microsecond=0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_survives_restart(self):
+        state = ReminderState(self.path)
+        state.record('a', self.due, 24)
+        state.record('b', self.due, 12)
+        state.discard('b')
+        state.close()
+
+        state = ReminderState(self.path)
+        self.assertEqual(state.notified('a', self.due), 24)
+        self.assertIsNone(state.notified('b', self.due))
+        self.assertIsNone(state.notified('a', self.due + timedelta(hours=1)))  # Due time changed
+
+    def test_corrupt_line_is_skipped(self):
+        state = ReminderState(self.path)
+        state.record('a', self.due, 24)
+        state.close()
+        with open(self.path, 'a') as f:
+            f.write("b\tnot-a-number\t12\n")
+            f.write("c\t1")  # Torn final line
+
+        state = ReminderState(self.path)
+        self.assertEqual(state.notified('a', self.due), 24)
+        self.assertIsNone(state.notified('b', self.due))
+
+    def test_past_due_entries_are_pruned(self):
+        state = ReminderState(self.path)
+        state.record('old', datetime.now() - timedelta(hours=1), 1)
+        state.close()
+        self.assertIsNone(ReminderState(self.path)._entries.get('old'))
+
+
+class SchedulerKeyTest(unittest.TestCase):
+    def test_tasks_are_tracked_by_id(self):
+        due = (datetime.now() + timedelta(days=3)).timestamp()
+        scheduler = DeadlineScheduler(lambda name, hours: None)
+        scheduler.sync({'2024-05-10': [{'id': '1', 'name': "Friday!", 'due': due},
+                                       {'id': '2', 'name': "Friday!", 'due': due}]})
+        self.assertEqual(set(scheduler._plans), {'1', '2'})
+
+    def test_completed_task_forgets_its_state(self):
+        due = datetime.now() + timedelta(hours=10)
+        state = ReminderState()
+        scheduler = DeadlineScheduler(lambda name, hours: None, state=state)
+        task = {'id': '1', 'name': "Report", 'due': due.timestamp()}
+        scheduler.sync({'2024-05-10': [task]})
+        state.record('1', datetime.fromtimestamp(task['due']), 12)
+        scheduler.sync({'2024-05-10': [dict(task, status="Completed")]})
+        self.assertNotIn('1', scheduler._plans)
+        self.assertIsNone(state.notified('1', datetime.fromtimestamp(task['due'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from task_cli import checked_task, import_tasks
+from task_formats import READERS, WRITERS, guess_format
+from task_schema import ALL_DAY, due_timestamp
+from task_storage import JournalStorage
+from task_store import TaskStore
+
+TASKS = [
+    ('2024-05-10', {'id': 'a', 'name': "Report; draft, v2", 'category': "Work,Home", 'status': "Completed",
+                    'due': due_timestamp('2024-05-10', 21, 5)}),
+    ('2024-05-11', {'id': 'b', 'name': "Gym", 'category': "Health", 'status': "Unfinished",
+                    'due': due_timestamp('2024-05-11', 7, 0), 'series': 'b',
+                    'recurrence': {'frequency': 'weekly', 'interval': 2, 'end': '2024-08-31',
+                                   'exceptions': {'2024-05-25': None}}}),
+]
+
+
+def round_trip(file_format, dated_tasks):
+    out = io.StringIO()
+    WRITERS[file_format](out, dated_tasks)
+    return list(READERS[file_format](io.StringIO(out.getvalue())))
+
+
+def read_ics(*lines):
+    text = "BEGIN:VCALENDAR\r\nBEGIN:VTODO\r\n" + ''.join(line + "\r\n" for line in lines) + "END:VTODO\r\nEND:VCALENDAR\r\n"
+    with contextlib.redirect_stderr(io.StringIO()):
+        return list(READERS['ics'](io.StringIO(text)))
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_jsonl(self):
+        self.assertEqual(round_trip('jsonl', TASKS), TASKS)
+
+    def test_csv(self):
+        for (date_key, task), (read_key, read) in zip(TASKS, round_trip('csv', TASKS)):
+            self.assertEqual(read_key, date_key)
+            self.assertEqual(checked_task(read_key, read, keep_ids=True), task)
+
+    def test_ics(self):
+        for (date_key, task), (read_key, read) in zip(TASKS, round_trip('ics', TASKS)):
+            self.assertEqual(read_key, date_key)
+            for field in ('name', 'category', 'status', 'due', 'recurrence'):
+                self.assertEqual(read.get(field), task.get(field), field)
+
+    def test_guess_format(self):
+        self.assertEqual(guess_format('backup.ICAL'), 'ics')
+        self.assertEqual(guess_format('tasks.json'), 'jsonl')
+        self.assertIsNone(guess_format('tasks.txt'))
+
+
+class IcsImportTest(unittest.TestCase):
+    def test_categories_are_joined(self):
+        [(_, task)] = read_ics("DUE;VALUE=DATE:20240510", "CATEGORIES:Work,Home", "CATEGORIES:Urgent")
+        self.assertEqual(task['category'], "Work,Home,Urgent")
+        self.assertEqual(task['due'], due_timestamp('2024-05-10', *ALL_DAY))
+
+    def test_by_parts_import_the_first_occurrence_only(self):
+        [(date_key, task)] = read_ics("DTSTART:20240506T090000", "RRULE:FREQ=WEEKLY;BYDAY=MO,WE,FR")
+        self.assertEqual(date_key, '2024-05-06')
+        self.assertNotIn('recurrence', task)
+
+    def test_folded_lines_and_exdates(self):
+        [(_, task)] = read_ics("DUE:20240510T090000", "SUMMARY:A very", "  long name",
+                               "RRULE:FREQ=DAILY;COUNT=5", "EXDATE:20240511T090000,20240512T090000")
+        self.assertEqual(task['name'], "A very long name")
+        self.assertEqual(task['recurrence'], {'frequency': 'daily', 'interval': 1, 'count': 5,
+                                              'exceptions': {'2024-05-11': None, '2024-05-12': None}})
+
+
+class CheckedTaskTest(unittest.TestCase):
+    def test_fills_in_defaults(self):
+        task = checked_task('2024-05-10', {'name': "Call", 'due_time': "9:05 PM", 'id': 'x'}, keep_ids=False)
+        self.assertEqual(task, {'name': "Call", 'category': '', 'status': 'Unfinished',
+                                'due': due_timestamp('2024-05-10', 21, 5)})
+
+    def test_moves_the_due_time_to_the_date(self):
+        task = checked_task('2024-06-01', {'name': "Call", 'due': due_timestamp('2024-05-10', 21, 5)}, keep_ids=True)
+        self.assertEqual(task['due'], due_timestamp('2024-06-01', 21, 5))
+
+    def test_rules_get_a_new_series(self):
+        task = checked_task('2024-05-10', dict(TASKS[1][1]), keep_ids=False)
+        self.assertNotEqual(task['series'], 'b')
+        self.assertNotIn('id', task)
+
+    def test_invalid_records(self):
+        for date_key, task in [('2024-13-01', {'name': "Call"}), ('2024-05-10', {'name': ""}),
+                               ('2024-05-10', {'name': "Call", 'due_time': "noon"}),
+                               ('2024-05-10', {'name': "Gym", 'recurrence': {'frequency': 'yearly'}})]:
+            with self.assertRaises(ValueError):
+                checked_task(date_key, dict(task), keep_ids=False)
+
+
+class ImportTest(unittest.TestCase):
+    def test_batches_are_not_kept_for_undo(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = TaskStore(storage=JournalStorage(os.path.join(directory, 'tasks.json')), undo_depth=0)
+            records = [('2024-05-10', {'name': f"Task {n}"}) for n in range(5)] + [('2024-05-11', {})]
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(import_tasks(store, iter(records), batch_size=2), (5, 1))
+            self.assertEqual(len(store.get_tasks('2024-05-10')), 5)
+            self.assertFalse(store.history.can_undo())
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import task_schema
+from task_storage import JournalStorage
+from task_store import TaskStore
+
+V1_TASKS = {
+    '2024-05-10': [
+        {'name': "Report", 'category': "Work", 'status': "Unfinished", 'due_time': "9:05 PM"},
+        {'name': "Call", 'category': "Home", 'status': "Unfinished", 'due_time': "sometime"},
+    ],
+}
+
+
+class DueTimeTest(unittest.TestCase):
+    def test_parse_and_format(self):
+        self.assertEqual(task_schema.parse_due_time("9:05 PM"), (21, 5))
+        self.assertEqual(task_schema.parse_due_time("12:00 a.m."), (0, 0))
+        self.assertEqual(task_schema.format_due_time(21, 5), "9:05 PM")
+        for text in ("13:00 PM", "9:60 AM", "noon", None):
+            with self.assertRaises(ValueError):
+                task_schema.parse_due_time(text)
+
+    def test_upgrade_task(self):
+        task = task_schema.upgrade_task('2024-05-10', V1_TASKS['2024-05-10'][0])
+        self.assertNotIn('due_time', task)
+        self.assertEqual(datetime.fromtimestamp(task['due']), datetime(2024, 5, 10, 21, 5))
+        self.assertEqual(task_schema.display_due_time(task), "9:05 PM")
+
+        unparsable = task_schema.upgrade_task('2024-05-10', V1_TASKS['2024-05-10'][1])
+        self.assertEqual(unparsable['due_text'], "sometime")
+        self.assertEqual(task_schema.display_due_time(unparsable), "sometime")
+
+    def test_exception_overrides_are_upgraded(self):
+        rule = {'name': "Gym", 'id': 'r', 'recurrence': {'frequency': 'daily', 'interval': 1,
+                                                         'exceptions': {'2024-05-11': {'due_time': "7:00 AM"}}}}
+        self.assertTrue(task_schema.needs_upgrade(rule))
+        override = task_schema.upgrade_task('2024-05-10', rule)['recurrence']['exceptions']['2024-05-11']
+        self.assertEqual(datetime.fromtimestamp(override['due']), datetime(2024, 5, 11, 7, 0))
+
+    def test_on_date_keeps_the_time_of_day(self):
+        task = {'due': task_schema.due_timestamp('2024-05-10', 21, 5)}
+        moved = task_schema.on_date(task, '2024-06-01')
+        self.assertEqual(datetime.fromtimestamp(moved['due']), datetime(2024, 6, 1, 21, 5))
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tasks.json')
+        with open(self.path, 'w') as f:
+            json.dump(V1_TASKS, f)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_store(self, owner):
+        return TaskStore(storage=JournalStorage(self.path, owner=owner), owner=owner)
+
+    def test_owner_writes_the_upgrade_back(self):
+        store = self.open_store(owner=True)
+        store.close()
+        self.assertTrue(os.path.getsize(self.path + '.journal'))
+        reopened = self.open_store(owner=True)
+        self.assertEqual([task['id'] for task in reopened.get_tasks('2024-05-10')],
+                         [task['id'] for task in store.get_tasks('2024-05-10')])
+        reopened.close()
+
+    def test_reader_upgrades_in_memory_only(self):
+        store = self.open_store(owner=False)
+        self.assertTrue(all('due_time' not in task and task['id'] for task in store.get_tasks('2024-05-10')))
+        store.close()
+        self.assertFalse(os.path.getsize(self.path + '.journal'))
+
+    def test_every_process_picks_the_same_ids(self):
+        reader = self.open_store(owner=False)
+        owner = self.open_store(owner=True)
+        self.assertEqual([task['id'] for task in reader.get_tasks('2024-05-10')],
+                         [task['id'] for task in owner.get_tasks('2024-05-10')])
+        reader.close()
+        owner.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
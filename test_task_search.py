@@ -0,0 +1,76 @@
+import unittest
+
+import recurrence
+from task_search import TaskSearchIndex, words
+
+GYM = dict(recurrence.make_rule_task({'name': "Gym session", 'category': "Health", 'status': "Unfinished"}, 'daily'),
+           id='gym')
+
+TASKS = [
+    ('2024-05-10', {'id': 'a', 'name': "Quarterly report", 'category': "Work", 'status': "Unfinished", 'due': 2}),
+    ('2024-05-10', {'id': 'b', 'name': "Call the plumber", 'category': "home", 'status': "Completed", 'due': 1}),
+    ('2024-05-12', {'id': 'c', 'name': "Report expenses", 'category': "Work", 'status': "Work in Progress"}),
+    ('2024-06-01', {'id': 'd', 'name': "Plan trip", 'category': "Home", 'status': "Unfinished"}),
+    ('2024-05-20', GYM),
+]
+
+
+def ids(results):
+    return [task['id'] for _, task in results.matches]
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TaskSearchIndex()
+        self.index.build(iter(TASKS))
+
+    def test_words(self):
+        self.assertEqual(words("Call the PLUMBER, now!"), {'call', 'the', 'plumber', 'now'})
+
+    def test_prefixes_of_every_word_must_match(self):
+        self.assertEqual(ids(self.index.search("rep")), ['a', 'c'])
+        self.assertEqual(ids(self.index.search("rep quart")), ['a'])
+        self.assertEqual(ids(self.index.search("pl")), ['b', 'd'])
+        self.assertEqual(ids(self.index.search("nothing")), [])
+
+    def test_filters_and_date_range(self):
+        self.assertEqual(ids(self.index.search(category="HOME")), ['b', 'd'])  # Categories ignore case
+        self.assertEqual(ids(self.index.search(category="work", status="Unfinished")), ['a'])
+        results = self.index.search(first_key='2024-05-11', last_key='2024-05-31')
+        self.assertEqual(ids(results), ['c', 'gym'])
+        self.assertEqual((results.total, results.dates), (2, {'2024-05-12', '2024-05-20'}))
+
+    def test_matches_are_in_date_and_due_order(self):
+        results = self.index.search(limit=3)
+        self.assertEqual(ids(results), ['b', 'a', 'c'])
+        self.assertEqual(results.total, 5)  # Counted past the limit
+
+    def test_rules_are_reported(self):
+        self.assertEqual(self.index.search("gym").rules, [('2024-05-20', GYM)])
+        self.assertEqual(self.index.search("report").rules, [])
+        # A rule starting after the range has no occurrences in it
+        self.assertEqual(self.index.search("gym", last_key='2024-05-19').rules, [])
+        self.assertEqual(self.index.search("gym", first_key='2024-06-01').rules, [('2024-05-20', GYM)])
+
+    def test_update(self):
+        report, plumber = TASKS[0][1], TASKS[1][1]
+        edited = dict(report, name="Annual report")
+        self.index.update({'2024-05-10': [edited]})  # The plumber call was deleted
+        self.index.update({'2024-05-15': [plumber]})  # and added again on another date
+        self.assertEqual(ids(self.index.search("quarterly")), [])
+        self.assertEqual(ids(self.index.search("annual")), ['a'])
+        self.assertEqual([date_key for date_key, _ in self.index.search("plumber").matches], ['2024-05-15'])
+        self.index.update({'2024-05-20': []})
+        self.assertEqual(self.index.search("gym").rules, [])
+
+    def test_changes_during_the_build_are_queued(self):
+        index = TaskSearchIndex()
+        index.update({'2024-05-10': [TASKS[0][1]]})
+        self.assertIsNone(index.search("report"))
+        index.build(iter(TASKS))
+        self.assertEqual(ids(index.search("report")), ['a', 'c'])
+        self.assertEqual(ids(index.search("plumber")), [])  # Removed by the queued change
+
+
+if __name__ == '__main__':
+    unittest.main()
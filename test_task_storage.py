@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from task_file_watcher import TaskFileWatcher
+from task_storage import JournalStorage
+from task_store import TaskStore
+
+
+def tasks(*names):
+    return [{'id': name, 'name': name} for name in names]
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tasks.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, owner=True, compact_after=1 << 20):
+        storage = JournalStorage(self.path, compact_after, owner=owner)
+        storage.load()
+        self.addCleanup(storage.close)
+        return storage
+
+    def test_records_replay_in_order(self):
+        storage = self.open()
+        storage.write({}, {'2024-05-10': tasks('a')})
+        storage.write({}, {'2024-05-10': tasks('a', 'b'), '2024-05-11': tasks('c')})
+        storage.write({}, {'2024-05-11': []})
+        storage.close()
+        self.assertEqual(self.open().load(), {'2024-05-10': tasks('a', 'b'), '2024-05-11': []})
+
+    def test_torn_append_is_dropped_by_the_owner_only(self):
+        storage = self.open()
+        storage.write({}, {'2024-05-10': tasks('a')})
+        storage.close()
+        with open(self.path + '.journal', 'a') as f:
+            f.write('{"d":"2024-05-11","t":[')
+        size = os.path.getsize(self.path + '.journal')
+
+        self.assertEqual(self.open(owner=False).load(), {'2024-05-10': tasks('a')})
+        self.assertEqual(os.path.getsize(self.path + '.journal'), size)  # May be an append in progress
+        self.assertEqual(self.open().load(), {'2024-05-10': tasks('a')})
+        self.assertLess(os.path.getsize(self.path + '.journal'), size)
+
+    def test_compaction_folds_the_journal_into_the_snapshot(self):
+        storage = self.open(compact_after=100)
+        data = {}
+        for day in range(10, 20):
+            data[f'2024-05-{day}'] = tasks(f'task {day}')
+            storage.write(dict(data), {f'2024-05-{day}': data[f'2024-05-{day}']})
+        storage.close()
+        self.assertFalse(os.path.exists(self.path + '.journal.1'))
+        with open(self.path) as f:
+            self.assertGreater(len(json.load(f)), 1)
+        self.assertEqual(self.open().load(), data)
+
+    def test_interrupted_compaction_is_finished_by_the_owner(self):
+        storage = self.open()
+        storage.write({}, {'2024-05-10': tasks('a')})
+        storage.close()
+        os.replace(self.path + '.journal', self.path + '.journal.1')  # Crash before the snapshot was written
+
+        self.assertEqual(self.open(owner=False).load(), {'2024-05-10': tasks('a')})
+        self.assertTrue(os.path.exists(self.path + '.journal.1'))
+        self.assertEqual(self.open().load(), {'2024-05-10': tasks('a')})
+        self.assertFalse(os.path.exists(self.path + '.journal.1'))
+
+
+class FollowTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tasks.json')
+        self.owner = JournalStorage(self.path, compact_after=1000)
+        self.owner.load()
+        self.owner.write({}, {'2024-05-10': tasks('a')})
+        self.reader = JournalStorage(self.path, owner=False)
+        self.reader.load()
+
+    def tearDown(self):
+        self.reader.close()
+        self.owner.close()
+        self.directory.cleanup()
+
+    def test_reads_only_the_appended_records(self):
+        self.assertFalse(self.reader.changed_on_disk())
+        self.owner.write({}, {'2024-05-11': tasks('b')})
+        self.assertTrue(self.reader.changed_on_disk())
+        self.assertEqual(self.reader.load_appended(), {'2024-05-11': tasks('b')})
+        self.assertFalse(self.reader.changed_on_disk())
+
+    def test_own_appends_are_not_changes_unless_others_came_first(self):
+        self.reader.write({}, {'2024-05-12': tasks('c')})
+        self.assertFalse(self.reader.changed_on_disk())
+
+        self.owner.write({}, {'2024-05-11': tasks('b')})
+        self.reader.write({}, {'2024-05-12': tasks('c', 'd')})
+        self.assertTrue(self.reader.changed_on_disk())
+        self.assertEqual(self.reader.load_appended(), {'2024-05-11': tasks('b'), '2024-05-12': tasks('c', 'd')})
+
+    def test_compaction_needs_a_full_load(self):
+        data = {'2024-05-10': tasks('a')}
+        for day in range(11, 30):
+            data[f'2024-05-{day}'] = tasks(f'task {day}')
+            self.owner.write(dict(data), {f'2024-05-{day}': data[f'2024-05-{day}']})
+        self.owner.close()
+        self.assertTrue(self.reader.changed_on_disk())
+        self.assertIsNone(self.reader.load_appended())
+        self.assertEqual(self.reader.load(), data)
+        self.assertFalse(self.reader.changed_on_disk())
+
+
+class StoreReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tasks.json')
+        self.store = TaskStore(storage=JournalStorage(self.path))
+        self.store.add_tasks([('2024-05-10', {'name': "Report"}), ('2024-05-11', {'name': "Call"})])
+        self.reader = TaskStore(storage=JournalStorage(self.path, owner=False), owner=False)
+        self.changes = []
+        self.reader.subscribe(self.changes.append)
+
+    def tearDown(self):
+        self.reader.close()
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_follows_the_journal_without_a_full_load(self):
+        call = self.store.get_tasks('2024-05-11')[0]
+        self.store.update_task('2024-05-11', call, dict(call, status="Completed"))
+        with mock.patch.object(self.reader.storage, 'load', side_effect=AssertionError("full load")):
+            self.reader.reload_if_changed()
+        self.assertEqual(list(self.changes), [{'2024-05-11': self.reader.get_tasks('2024-05-11')}])
+        self.assertEqual(self.reader.get_tasks('2024-05-11')[0]['status'], "Completed")
+        self.assertEqual([task['name'] for task in self.reader.get_tasks('2024-05-10')], ["Report"])
+
+    def test_external_rewrite_is_loaded_in_full(self):
+        with open(self.path, 'w') as f:
+            json.dump({'2024-06-01': [{'id': 'x', 'name': "Moved"}]}, f)
+        os.truncate(self.path + '.journal', 0)
+        self.reader.reload_if_changed()
+        self.assertEqual(self.reader.get_tasks('2024-05-10'), [])
+        self.assertEqual([task['name'] for task in self.reader.get_tasks('2024-06-01')], ["Moved"])
+
+
+class WatcherTest(unittest.TestCase):
+    def test_companions_are_watched(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tasks.json')
+            changes = []
+            watcher = TaskFileWatcher(path, lambda: changes.append(1), companions=[path + '.journal'])
+            watcher._check()
+            self.assertEqual(changes, [])
+            with open(path + '.journal', 'a') as f:
+                f.write('{}\n')
+            watcher._check()
+            watcher._check()
+            self.assertEqual(changes, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+import recurrence
+from task_store import TaskStore
+
+
+def daily(name):
+    return recurrence.make_rule_task({'name': name, 'category': "Work", 'status': "Unfinished"}, 'daily')
+
+
+class RuleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = TaskStore(os.path.join(self.directory.name, 'tasks.json'))
+        self.store.add_task('2024-05-10', daily("Standup"))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def names(self, date_key):
+        return [task['name'] for task in self.store.get_tasks(date_key)]
+
+    def test_series_move_undo_redo(self):
+        occurrence = self.store.get_tasks('2024-05-12')[0]
+        self.store.move_tasks([('2024-05-12', occurrence, '2024-05-09')], series=True)
+        self.assertEqual(self.names('2024-05-07'), ["Standup"])
+        self.assertEqual(self.names('2024-05-06'), [])
+
+        self.assertTrue(self.store.undo())
+        self.assertEqual(self.names('2024-05-09'), [])
+        self.assertEqual(self.names('2024-05-10'), ["Standup"])
+        self.assertEqual(self.names('2024-05-12'), ["Standup"])
+
+        self.assertTrue(self.store.redo())
+        self.assertEqual(self.names('2024-05-07'), ["Standup"])
+        self.assertEqual(self.names('2024-05-12'), ["Standup"])
+
+        self.assertTrue(self.store.undo())
+        self.assertEqual(self.names('2024-05-09'), [])
+        self.assertEqual(self.names('2024-05-10'), ["Standup"])
+
+    def test_reload_keeps_rule_moved_earlier(self):
+        # Another program moves the rule's start date back in tasks.json
+        with open(self.store.path) as f:
+            data = json.load(f)
+        data['2024-05-01'] = data.pop('2024-05-10')
+        with open(self.store.path + '.edit', 'w') as f:
+            json.dump(data, f)
+        os.replace(self.store.path + '.edit', self.store.path)
+
+        self.store.reload_if_changed()
+        self.assertEqual(self.names('2024-05-03'), ["Standup"])
+        self.assertEqual(self.names('2024-04-30'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import time
+import unittest
+
+from task_writer import BackgroundWriter
+
+
+class FailingStorage:
+    def __init__(self, failures):
+        self.failures = failures  # Writes that raise before they start to succeed
+        self.attempts = []
+        self.written = {}
+
+    def write(self, tasks, changed):
+        self.attempts.append(time.monotonic())
+        if len(self.attempts) <= self.failures:
+            raise OSError("No space left on device")
+        self.written.update(changed)
+
+
+class BackgroundWriterTest(unittest.TestCase):
+    def test_burst_is_written_once(self):
+        storage = FailingStorage(0)
+        writer = BackgroundWriter(storage, dict, delay=0.05)
+        for day in range(10):
+            writer.submit({f'2024-05-{day + 1:02d}': []})
+        writer.flush()
+        writer.close()
+        self.assertEqual(len(storage.attempts), 1)
+        self.assertEqual(len(storage.written), 10)
+
+    def test_failures_back_off_and_report_once(self):
+        storage = FailingStorage(10 ** 6)
+        errors = []
+        writer = BackgroundWriter(storage, dict, errors.append, delay=0.02, max_retry_delay=0.16)
+        writer.submit({'2024-05-01': []})
+        time.sleep(0.6)
+        attempts = list(storage.attempts)
+        writer.close()  # One last attempt, which fails too
+
+        gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+        self.assertLess(len(attempts), 9)  # 0.02, 0.04, 0.08, then every 0.16 s
+        self.assertGreater(gaps[2], gaps[0] * 3)
+        self.assertEqual(len(errors), 1)
+
+    def test_success_resets_backoff_and_reporting(self):
+        storage = FailingStorage(2)
+        errors = []
+        writer = BackgroundWriter(storage, dict, errors.append, delay=0.01)
+        writer.submit({'2024-05-01': []})
+        deadline = time.monotonic() + 2
+        while '2024-05-01' not in storage.written and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn('2024-05-01', storage.written)
+        self.assertEqual(writer._failing, 0)
+        self.assertEqual(len(errors), 1)
+        writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
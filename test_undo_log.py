@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from task_storage import JournalStorage
+from task_store import TaskStore
+from undo_log import UndoLog, diff, revert
+
+
+class DiffTest(unittest.TestCase):
+    def test_revert_undoes_a_diff(self):
+        a, b, c = {'id': 'a'}, {'id': 'b'}, {'id': 'c'}
+        old, new = [a, b], [a, dict(b, name="edited"), c]
+        change = diff(old, new)
+        self.assertEqual(change, ([(1, b)], [new[1], c]))
+        self.assertEqual(revert(new, change), old)
+        self.assertIsNone(diff(old, list(old)))
+
+    def test_depth_and_redo(self):
+        log = UndoLog(depth=2)
+        for step in (1, 2, 3):
+            log.record(step)
+        self.assertEqual(log.pop_undo(), 3)
+        log.push_redo(3)
+        self.assertTrue(log.can_redo())
+        log.record(4)  # A new change drops what was undone
+        self.assertFalse(log.can_redo())
+        self.assertEqual([log.pop_undo(), log.pop_undo(), log.pop_undo()], [4, 2, None])
+
+
+class StoreUndoTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'tasks.json')
+        self.store = TaskStore(storage=JournalStorage(self.path))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def names(self, date_key):
+        return [task['name'] for task in self.store.get_tasks(date_key)]
+
+    def test_undo_and_redo(self):
+        self.store.add_tasks([('2024-05-10', {'name': "Report"}), ('2024-05-11', {'name': "Call"})])
+        report = self.store.get_tasks('2024-05-10')[0]
+        self.store.update_task('2024-05-10', report, dict(report, name="Final report"))
+        self.store.move_task('2024-05-11', self.store.get_tasks('2024-05-11')[0], '2024-05-10')
+        self.assertEqual(self.names('2024-05-10'), ["Final report", "Call"])
+
+        self.assertTrue(self.store.undo())
+        self.assertEqual(self.names('2024-05-11'), ["Call"])
+        self.assertTrue(self.store.undo())
+        self.assertEqual(self.names('2024-05-10'), ["Report"])
+        self.assertTrue(self.store.redo())
+        self.assertEqual(self.names('2024-05-10'), ["Final report"])
+        self.assertTrue(self.store.undo())
+        self.assertTrue(self.store.undo())
+        self.assertEqual(self.names('2024-05-10') + self.names('2024-05-11'), [])
+        self.assertFalse(self.store.undo())
+
+    def test_external_change_clears_the_history(self):
+        self.store.add_task('2024-05-10', {'name': "Report"})
+        other = TaskStore(storage=JournalStorage(self.path, owner=False), owner=False)
+        other.add_task('2024-05-10', {'name': "Call"})
+        other.close()
+
+        self.store.reload_if_changed()
+        self.assertEqual(self.names('2024-05-10'), ["Report", "Call"])
+        self.assertFalse(self.store.undo())  # Must not revert the other process's work
+        self.assertEqual(self.names('2024-05-10'), ["Report", "Call"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+from collections import deque
+
+# Changes that can be undone; older ones are forgotten
+UNDO_DEPTH = int(os.environ.get('SUPERSCHEDULER_UNDO_DEPTH', 100))
+
+
+def diff(old, new):
+    """Return what replacing the task list `old` with `new` changed, as (removed, added), or None.
+
+    `removed` holds (position, task) for the tasks of `old` that are gone and
+    `added` the tasks of `new` that are new. Task lists are copied on write,
+    so an unchanged task is the same object in both and is not recorded.
+    """
+    new_objects = {id(task) for task in new}
+    old_objects = {id(task) for task in old}
+    removed = [(position, task) for position, task in enumerate(old) if id(task) not in new_objects]
+    added = [task for task in new if id(task) not in old_objects]
+    if not removed and not added:
+        return None
+    return removed, added
+
+
+def revert(tasks, change):
+    """Return a copy of the task list `tasks` with a diff() change undone."""
+    removed, added = change
+    added_ids = {task.get('id') for task in added}
+    tasks = [task for task in tasks if task.get('id') not in added_ids]
+    for position, task in removed:
+        tasks.insert(position, task)
+    return tasks
+
+
+class UndoLog:
+    """Undo and redo history of the store's commits.
+
+    A step is {date_key: diff()} for one commit, so it holds only the tasks
+    that commit replaced or added, never a copy of the task lists; a batched
+    change (a series edit, a multi-task move) is one step. At most `depth`
+    steps are kept each way. Undoing a step commits its inverse, whose own
+    diff becomes the redo step.
+    """
+
+    def __init__(self, depth=UNDO_DEPTH):
+        self._undo = deque(maxlen=depth)
+        self._redo = deque(maxlen=depth)
+
+    def record(self, step):
+        """Log a new change; it can be undone, and whatever was undone before can no longer be redone."""
+        self._undo.append(step)
+        self._redo.clear()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def pop_undo(self):
+        return self._undo.pop() if self._undo else None
+
+    def pop_redo(self):
+        return self._redo.pop() if self._redo else None
+
+    def push_undo(self, step):
+        self._undo.append(step)
+
+    def push_redo(self, step):
+        self._redo.append(step)
+
+    def clear(self):
+        """Forget every step, e.g. once the tasks were replaced by another process's copy."""
+        self._undo.clear()
+        self._redo.clear()
@@ -0,0 +1,21 @@
+import tkinter as tk
+
+# Undo and redo shortcuts, bound on each window; both cases, since Caps Lock changes the keysym
+UNDO_KEYS = ("<Control-z>", "<Control-Z>", "<Control-y>", "<Control-Y>")
+
+# Widgets that handle Ctrl+Z themselves while they have the focus
+TEXT_WIDGETS = (tk.Entry, tk.Spinbox, tk.Text)
+
+# Bit of Event.state set while Shift is held
+SHIFT_MASK = 0x1
+
+
+def configure_changed(widget, current, **options):
+    """Apply only the options of `widget` that differ from `current`, skipping the Tk call if none do.
+
+    `current` is the dict of options last applied to the widget; it is updated.
+    """
+    changed = {key: value for key, value in options.items() if current.get(key) != value}
+    if changed:
+        widget.config(**changed)
+        current.update(changed)
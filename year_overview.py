@@ -0,0 +1,216 @@
+import calendar
+import functools
+from datetime import date, datetime
+import tkinter as tk
+
+import metrics
+
+# Size of a day cell, the gap between months and the month name and weekday rows, in pixels
+CELL = 24
+MONTH_GAP = 16
+TITLE_HEIGHT = 22
+HEADER_HEIGHT = 16
+
+# View -> (months shown, months per row)
+LAYOUTS = {"Year": (12, 4), "Quarter": (3, 3)}
+
+# A day with at least this many tasks is drawn one shade darker than the last
+HEAT_LEVELS = (2, 4, 8)
+DARKEST = 0.5  # Fraction of the color taken away at the last level
+
+# RGB of the colors TaskCalendar.date_color uses
+BASE_RGB = {"red": (255, 0, 0), "orange": (255, 165, 0), "yellow": (255, 255, 0), "lightgrey": (211, 211, 211)}
+
+MONTH_WIDTH = 7 * CELL
+MONTH_HEIGHT = TITLE_HEIGHT + HEADER_HEIGHT + 6 * CELL
+
+
+@functools.lru_cache(maxsize=None)
+def heat_color(base, count):
+    """Return `base` darkened by how many tasks a day has: one task keeps the plain color."""
+    level = sum(1 for threshold in HEAT_LEVELS if count >= threshold)
+    if level == 0 or base not in BASE_RGB:
+        return base
+    scale = 1 - DARKEST * level / len(HEAT_LEVELS)
+    return "#%02x%02x%02x" % tuple(int(channel * scale) for channel in BASE_RGB[base])
+
+
+class YearOverview:
+    """A year or a quarter of the calendar drawn on one Canvas, shaded by tasks per day.
+
+    A day is a rectangle and a number on the canvas instead of a Button, so
+    a whole year costs two canvas items per day. The items are created once
+    per view and reused when moving between periods, and only those whose
+    color or text changed are reconfigured. A click is mapped to its day from
+    its coordinates. Store changes repaint only the days they touched.
+
+    Days are colored with the calendar's date_color rules (past due, today,
+    tomorrow, later), darker the more tasks they have.
+    """
+
+    def __init__(self, parent, calendar_app):
+        self.calendar_app = calendar_app
+        self.store = calendar_app.store
+        self.year = calendar_app.current_year
+        self.first_month = (calendar_app.current_month - 1) // 3 * 3 + 1  # Quarter shown in the quarter view
+
+        self.top = tk.Toplevel(parent)
+        self.top.title("Overview")
+
+        self.nav_frame = tk.Frame(self.top)
+        self.nav_frame.pack(fill=tk.X, pady=5)
+        tk.Button(self.nav_frame, text="<<", command=lambda: self.step(-1)).pack(side=tk.LEFT, padx=10)
+        self.label = tk.Label(self.nav_frame, text="", font=("Arial", 14))
+        self.label.pack(side=tk.LEFT, expand=True)
+        tk.Button(self.nav_frame, text=">>", command=lambda: self.step(1)).pack(side=tk.RIGHT, padx=10)
+        self.view_var = tk.StringVar(value="Year")
+        tk.OptionMenu(self.nav_frame, self.view_var, *LAYOUTS, command=lambda view: self.show()).pack(side=tk.RIGHT)
+
+        self.canvas = tk.Canvas(self.top, bg="white", highlightthickness=0)
+        self.canvas.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+        self.canvas.bind("<Button-1>", self.on_click)
+
+        self.view = None  # View the canvas items were created for
+        self.titles = []  # Month name item per month
+        self.cells = []  # (rectangle, text) items per day slot, 42 per month
+        self.cell_state = []  # (fill, text) last applied per slot
+        self.cell_dates = []  # Date shown in each slot, None if blank
+        self.slots = {}  # date key -> slot
+        self.counts = {}  # date key -> tasks on that day, for the days shown
+
+        self.show()
+
+        self.store.subscribe(self.on_store_change)
+        self.top.bind("<Destroy>", self.on_destroy)
+
+    def months(self):
+        """Return the (year, month) pairs of the period shown."""
+        count = LAYOUTS[self.view_var.get()][0]
+        first = self.first_month if count < 12 else 1
+        return [(self.year + (first - 1 + offset) // 12, (first - 1 + offset) % 12 + 1) for offset in range(count)]
+
+    def step(self, direction):
+        if self.view_var.get() == "Year":
+            self.year += direction
+        else:
+            months = self.year * 12 + self.first_month - 1 + 3 * direction
+            self.year, self.first_month = months // 12, months % 12 + 1
+        self.show()
+
+    def month_origin(self, index):
+        per_row = LAYOUTS[self.view][1]
+        return (MONTH_GAP + index % per_row * (MONTH_WIDTH + MONTH_GAP),
+                MONTH_GAP + index // per_row * (MONTH_HEIGHT + MONTH_GAP))
+
+    def build_view(self):
+        """Create the canvas items of the current view, once per view."""
+        self.view = self.view_var.get()
+        count, per_row = LAYOUTS[self.view]
+        self.canvas.delete("all")
+        self.titles, self.cells = [], []
+        for index in range(count):
+            x, y = self.month_origin(index)
+            self.titles.append(self.canvas.create_text(x + MONTH_WIDTH // 2, y + TITLE_HEIGHT // 2, text="",
+                                                       font=("Arial", 11, "bold")))
+            for column, weekday in enumerate("MTWTFSS"):
+                self.canvas.create_text(x + column * CELL + CELL // 2, y + TITLE_HEIGHT + HEADER_HEIGHT // 2,
+                                        text=weekday, fill="grey")
+            top = y + TITLE_HEIGHT + HEADER_HEIGHT
+            for slot in range(42):
+                left, upper = x + slot % 7 * CELL, top + slot // 7 * CELL
+                rectangle = self.canvas.create_rectangle(left + 1, upper + 1, left + CELL - 1, upper + CELL - 1,
+                                                         fill="white", outline="")
+                text = self.canvas.create_text(left + CELL // 2, upper + CELL // 2, text="", font=("Arial", 8))
+                self.cells.append((rectangle, text))
+        self.cell_state = [("white", "")] * len(self.cells)
+        rows = (count + per_row - 1) // per_row
+        self.canvas.config(width=MONTH_GAP + per_row * (MONTH_WIDTH + MONTH_GAP),
+                           height=MONTH_GAP + rows * (MONTH_HEIGHT + MONTH_GAP))
+
+    @metrics.timed('overview.show')
+    def show(self):
+        """Show the period of the current view, with one range query for all of its days."""
+        if self.view != self.view_var.get():
+            self.build_view()
+        months = self.months()
+        (first_year, first_month), (last_year, last_month) = months[0], months[-1]
+        if len(months) == 12:
+            self.label.config(text=str(first_year))
+        else:
+            self.label.config(text=f"{calendar.month_name[first_month]} - {calendar.month_name[last_month]} {last_year}")
+
+        first_key = f"{first_year}-{first_month:02d}-01"
+        last_key = f"{last_year}-{last_month:02d}-{calendar.monthrange(last_year, last_month)[1]:02d}"
+        self.counts = {key: summary.count for key, summary in self.store.day_summaries(first_key, last_key).items()}
+
+        self.cell_dates, self.slots = [], {}
+        cal = calendar.Calendar(firstweekday=0)
+        for index, (year, month) in enumerate(months):
+            self.canvas.itemconfig(self.titles[index], text=calendar.month_name[month])
+            days = list(cal.itermonthdays(year, month))
+            days += [0] * (42 - len(days))
+            for day in days:
+                if day:
+                    self.slots[f"{year}-{month:02d}-{day:02d}"] = len(self.cell_dates)
+                    self.cell_dates.append(date(year, month, day))
+                else:
+                    self.cell_dates.append(None)
+
+        today = datetime.today().date()
+        for slot in range(len(self.cells)):
+            self.paint(slot, today)
+
+    def paint(self, slot, today):
+        """Reconfigure a day's items if its color or number changed."""
+        day = self.cell_dates[slot]
+        if day is None:
+            state = ("white", "")
+        else:
+            count = self.counts.get(day.isoformat(), 0)
+            fill = heat_color(self.calendar_app.date_color(day, today), count) if count else "white"
+            state = (fill, str(day.day))
+        if state != self.cell_state[slot]:
+            rectangle, text = self.cells[slot]
+            if state[0] != self.cell_state[slot][0]:
+                self.canvas.itemconfig(rectangle, fill=state[0])
+            if state[1] != self.cell_state[slot][1]:
+                self.canvas.itemconfig(text, text=state[1])
+            self.cell_state[slot] = state
+
+    def day_at(self, x, y):
+        """Return the date drawn at canvas coordinates (x, y), or None."""
+        count, per_row = LAYOUTS[self.view]
+        column, x_in_month = divmod(x - MONTH_GAP, MONTH_WIDTH + MONTH_GAP)
+        row, y_in_month = divmod(y - MONTH_GAP - TITLE_HEIGHT - HEADER_HEIGHT, MONTH_HEIGHT + MONTH_GAP)
+        if not (0 <= column < per_row and 0 <= x_in_month < MONTH_WIDTH and 0 <= y_in_month < 6 * CELL):
+            return None
+        index = row * per_row + column
+        if not 0 <= index < count:
+            return None
+        return self.cell_dates[index * 42 + y_in_month // CELL * 7 + x_in_month // CELL]
+
+    def on_click(self, event):
+        day = self.day_at(int(self.canvas.canvasx(event.x)), int(self.canvas.canvasy(event.y)))
+        if day is not None:
+            self.calendar_app.open_day(day.isoformat())
+
+    def on_store_change(self, changed):
+        # May be called from another thread; repaint on the Tk thread
+        self.top.after(0, self.apply_changes, changed)
+
+    def apply_changes(self, changed):
+        if not self.top.winfo_exists():
+            return  # Closed before a queued repaint ran
+        if changed is None:
+            self.show()  # A recurring task changed; any day may have
+            return
+        today = datetime.today().date()
+        for date_key, tasks in changed.items():
+            slot = self.slots.get(date_key)
+            if slot is not None:
+                self.counts[date_key] = len(tasks)
+                self.paint(slot, today)
+
+    def on_destroy(self, event):
+        if event.widget is self.top:
+            self.store.unsubscribe(self.on_store_change)